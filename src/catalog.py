@@ -0,0 +1,356 @@
+"""
+Module for the local photo catalog.
+
+Every photo record the Unsplash API returns is kept in a SQLite database,
+together with what the app did with it: where it is cached, when it was
+shown and where it was saved. Selection, deduplication, history and saving
+are indexed queries on this table instead of API calls or directory scans.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from . import config, photo_filter
+
+logger = logging.getLogger(__name__)
+
+CATALOG_ENV = "WALLPAPER_CATALOG_FILE"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS photos (
+    id TEXT PRIMARY KEY,
+    category TEXT,
+    width INTEGER,
+    height INTEGER,
+    color TEXT,
+    blur_hash TEXT,
+    likes INTEGER,
+    description TEXT,
+    image_url TEXT,
+    cache_path TEXT,
+    added_at REAL NOT NULL,
+    shown_at REAL,
+    shown_count INTEGER NOT NULL DEFAULT 0,
+    saved_path TEXT,
+    luminance REAL,
+    contrast REAL,
+    sharpness REAL,
+    edge_density REAL
+);
+CREATE INDEX IF NOT EXISTS idx_photos_category ON photos (category, shown_at);
+CREATE INDEX IF NOT EXISTS idx_photos_shown ON photos (shown_at);
+CREATE INDEX IF NOT EXISTS idx_photos_size ON photos (width, height);
+CREATE INDEX IF NOT EXISTS idx_photos_color ON photos (color);
+CREATE INDEX IF NOT EXISTS idx_photos_cache ON photos (cache_path);
+CREATE INDEX IF NOT EXISTS idx_photos_saved ON photos (saved_path) WHERE saved_path IS NOT NULL;
+"""
+
+# Columns added after the first release, with their type, for migrating older catalogs
+_ADDED_COLUMNS = (('luminance', 'REAL'), ('contrast', 'REAL'), ('sharpness', 'REAL'), ('edge_density', 'REAL'))
+_ADDED_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_photos_luminance ON photos (luminance);
+CREATE INDEX IF NOT EXISTS idx_photos_sharpness ON photos (sharpness);
+"""
+
+# Columns filled from an API photo record; the rest track local state
+_METADATA_COLUMNS = ('category', 'width', 'height', 'color', 'blur_hash', 'likes', 'description', 'image_url')
+
+_default_catalog = None
+_default_lock = threading.Lock()
+
+
+def default_catalog_path() -> str:
+    """Get the catalog database used by default"""
+    return os.environ.get(CATALOG_ENV) or config.CATALOG_PATH
+
+
+def _photo_row(photo: Dict, category: Optional[str]) -> Optional[Dict]:
+    """Extract the catalog columns from an API photo record"""
+    if not isinstance(photo, dict) or not photo.get('id'):
+        return None
+    urls = photo.get('urls') or {}
+    return {
+        'id': str(photo['id']),
+        'category': category,
+        'width': photo.get('width'),
+        'height': photo.get('height'),
+        'color': photo.get('color'),
+        'blur_hash': photo.get('blur_hash'),
+        'likes': photo.get('likes'),
+        'description': photo.get('description') or photo.get('alt_description'),
+        'image_url': urls.get('raw') or urls.get('full') or urls.get('regular'),
+    }
+
+
+class PhotoCatalog:
+    """SQLite catalog of photo metadata and local state"""
+
+    def __init__(self, path=None):
+        self.path = path or default_catalog_path()
+        if self.path != ":memory:":
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        try:
+            self._conn = self._open(self.path)
+        except sqlite3.Error as e:
+            # The app keeps working, it just forgets everything on exit
+            logger.warning(f"Could not open photo catalog {self.path}: {e}. Using an in-memory catalog.")
+            self._conn = self._open(":memory:")
+
+    @staticmethod
+    def _open(path: str) -> sqlite3.Connection:
+        conn = sqlite3.connect(path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        with conn:
+            if path != ":memory:":
+                # Readers in other processes do not block the writer
+                conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            columns = {row['name'] for row in conn.execute("PRAGMA table_info(photos)")}
+            for column, column_type in _ADDED_COLUMNS:
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE photos ADD COLUMN {column} {column_type}")
+            conn.executescript(_ADDED_INDEXES)
+        return conn
+
+    def _execute(self, sql: str, params=(), many=False) -> List[sqlite3.Row]:
+        """Run a statement in its own transaction, logging database errors"""
+        try:
+            with self._lock, self._conn:
+                if many:
+                    self._conn.executemany(sql, params)
+                    return []
+                return self._conn.execute(sql, params).fetchall()
+        except sqlite3.Error as e:
+            logger.error(f"Photo catalog error: {e}")
+            return []
+
+    def record(self, photo: Dict, category: Optional[str] = None) -> Optional[str]:
+        """
+        Store the metadata of an API photo record.
+
+        Local state (cache path, shown and saved) of a known photo is kept.
+
+        Returns:
+            str: Photo id, or None if the record has no id
+        """
+        return self.record_many([photo], category)[0] if photo else None
+
+    def record_many(self, photos: Iterable[Dict], category: Optional[str] = None) -> List[Optional[str]]:
+        """
+        Store the metadata of several API photo records in one transaction.
+
+        The brightness of the dominant color stands in for the luminance of a
+        photo until its image is measured.
+        """
+        rows = [_photo_row(photo, category) for photo in photos]
+        valid = [row for row in rows if row is not None]
+        if valid:
+            now = time.time()
+            updates = ", ".join(f"{column} = COALESCE(excluded.{column}, {column})"
+                                for column in _METADATA_COLUMNS)
+            self._execute(
+                f"INSERT INTO photos (id, {', '.join(_METADATA_COLUMNS)}, luminance, added_at) "
+                f"VALUES (:id, {', '.join(':' + column for column in _METADATA_COLUMNS)}, :luminance, :added_at) "
+                f"ON CONFLICT(id) DO UPDATE SET {updates}, luminance = COALESCE(luminance, excluded.luminance)",
+                [dict(row, luminance=photo_filter.brightness(row['color']), added_at=now) for row in valid],
+                many=True
+            )
+        return [row['id'] if row else None for row in rows]
+
+    def get(self, photo_id: str) -> Optional[Dict]:
+        """Get the catalog entry of a photo"""
+        rows = self._execute("SELECT * FROM photos WHERE id = ?", (photo_id,))
+        return dict(rows[0]) if rows else None
+
+    def find_by_path(self, file_path: str) -> Optional[Dict]:
+        """Get the catalog entry of a cached file"""
+        rows = self._execute("SELECT * FROM photos WHERE cache_path = ? LIMIT 1",
+                             (os.path.abspath(file_path),))
+        return dict(rows[0]) if rows else None
+
+    def set_cache_path(self, photo_id: str, file_path: Optional[str]) -> None:
+        """Record where a photo is cached, or that it is no longer cached"""
+        self._execute("UPDATE photos SET cache_path = ? WHERE id = ?",
+                      (os.path.abspath(file_path) if file_path else None, photo_id))
+
+    def set_luminance(self, photo_id: str, luminance: float, contrast: float) -> None:
+        """Record the mean luminance and contrast measured on the image of a photo"""
+        self._execute("UPDATE photos SET luminance = ?, contrast = ? WHERE id = ?", (luminance, contrast, photo_id))
+
+    def unmeasured(self, limit: int = 50, column: str = "contrast") -> List[Dict]:
+        """
+        Get cached photos whose image has not been measured yet.
+
+        Args:
+            limit (int): Most photos to return
+            column (str): Measured column that is still NULL, "contrast" for the
+                luminance or "sharpness" for the sharpness scores
+        """
+        if column not in dict(_ADDED_COLUMNS):
+            raise ValueError(f"Not a measured column: {column}")
+        rows = self._execute(f"SELECT * FROM photos WHERE cache_path IS NOT NULL AND {column} IS NULL LIMIT ?",
+                             (limit,))
+        return [dict(row) for row in rows]
+
+    def set_sharpness(self, photo_id: str, sharpness: float, edge_density: float) -> None:
+        """Record the Laplacian variance and edge density measured on the image of a photo"""
+        self._execute("UPDATE photos SET sharpness = ?, edge_density = ? WHERE id = ?",
+                      (sharpness, edge_density, photo_id))
+
+    def mark_shown(self, photo_id: str, timestamp: Optional[float] = None) -> None:
+        """Record that a photo was set as the wallpaper"""
+        self._execute("UPDATE photos SET shown_at = ?, shown_count = shown_count + 1 WHERE id = ?",
+                      (timestamp if timestamp is not None else time.time(), photo_id))
+
+    def mark_saved(self, photo_id: str, saved_path: str) -> None:
+        """Record that a photo was saved to the saved wallpapers"""
+        self._execute("UPDATE photos SET saved_path = ? WHERE id = ?", (os.path.abspath(saved_path), photo_id))
+
+    def shown_ids(self, photo_ids: Iterable[str]) -> set:
+        """Get the ids among photo_ids that have been shown before"""
+        ids = list(photo_ids)
+        shown = set()
+        # Stay below SQLite's limit on query parameters
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            rows = self._execute(
+                f"SELECT id FROM photos WHERE shown_at IS NOT NULL AND id IN ({', '.join('?' * len(chunk))})",
+                chunk
+            )
+            shown.update(row['id'] for row in rows)
+        return shown
+
+    def select(self, category: Optional[str] = None, min_width: Optional[int] = None,
+               min_height: Optional[int] = None, luminance_range: Optional[Tuple] = None,
+               min_contrast: Optional[float] = None, min_sharpness: Optional[float] = None,
+               min_edge_density: Optional[float] = None, exclude: Iterable[str] = ()) -> Optional[Dict]:
+        """
+        Pick a cached photo, least recently shown first.
+
+        Args:
+            category (str, optional): Only photos fetched for this category or search term
+            min_width (int, optional): Only photos at least this wide
+            min_height (int, optional): Only photos at least this tall
+            luminance_range (tuple, optional): (min, max) luminance 0-255, either may be None
+            min_contrast (float, optional): Only photos measured to have at least this contrast
+            min_sharpness (float, optional): Skip photos measured to have a lower Laplacian variance
+            min_edge_density (float, optional): Skip photos measured to have a lower edge density
+            exclude (iterable, optional): Ids of photos not to pick
+
+        Returns:
+            dict: Catalog entry, or None if no cached photo matches
+        """
+        conditions, params = ["cache_path IS NOT NULL"], []
+        if category and category != "random":
+            conditions.append("category = ?")
+            params.append(category)
+        if min_width:
+            conditions.append("width >= ?")
+            params.append(min_width)
+        if min_height:
+            conditions.append("height >= ?")
+            params.append(min_height)
+        if luminance_range:
+            low, high = luminance_range
+            if low is not None:
+                conditions.append("luminance >= ?")
+                params.append(low)
+            if high is not None:
+                conditions.append("luminance <= ?")
+                params.append(high)
+        if min_contrast is not None:
+            conditions.append("contrast >= ?")
+            params.append(min_contrast)
+        # Photos that have not been scored yet are not held back
+        if min_sharpness is not None:
+            conditions.append("(sharpness IS NULL OR sharpness >= ?)")
+            params.append(min_sharpness)
+        if min_edge_density is not None:
+            conditions.append("(edge_density IS NULL OR edge_density >= ?)")
+            params.append(min_edge_density)
+        exclude = list(exclude)
+        if exclude:
+            conditions.append(f"id NOT IN ({', '.join('?' * len(exclude))})")
+            params.extend(exclude)
+        rows = self._execute(
+            f"SELECT * FROM photos WHERE {' AND '.join(conditions)} "
+            "ORDER BY shown_at IS NOT NULL, shown_at, RANDOM() LIMIT 1",
+            params
+        )
+        return dict(rows[0]) if rows else None
+
+    def ranked(self, category: Optional[str] = None, limit: int = 20) -> List[Dict]:
+        """Get scored cached photos, sharpest first"""
+        conditions, params = ["cache_path IS NOT NULL", "sharpness IS NOT NULL"], []
+        if category and category != "random":
+            conditions.append("category = ?")
+            params.append(category)
+        rows = self._execute(
+            f"SELECT * FROM photos WHERE {' AND '.join(conditions)} ORDER BY sharpness DESC LIMIT ?",
+            params + [limit]
+        )
+        return [dict(row) for row in rows]
+
+    def history(self, limit: int = 20) -> List[Dict]:
+        """Get the most recently shown photos, newest first"""
+        rows = self._execute("SELECT * FROM photos WHERE shown_at IS NOT NULL ORDER BY shown_at DESC LIMIT ?",
+                             (limit,))
+        return [dict(row) for row in rows]
+
+    def saved(self) -> List[Dict]:
+        """Get the photos that have been saved"""
+        rows = self._execute("SELECT * FROM photos WHERE saved_path IS NOT NULL ORDER BY saved_path")
+        return [dict(row) for row in rows]
+
+    def close(self) -> None:
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+
+
+def measure_cached(photo_catalog: PhotoCatalog, measure_photo: Callable, column: str, limit: int = 50) -> int:
+    """
+    Measure cached photos that have not been measured yet.
+
+    Args:
+        photo_catalog (PhotoCatalog): Catalog to update
+        measure_photo (callable): Called with (photo_id, file_path, photo_catalog) to
+            measure an image and record the result; returns None if it cannot be read
+        column (str): Measured column that is still NULL, see PhotoCatalog.unmeasured
+        limit (int): Most photos to measure
+
+    Returns:
+        int: Number of photos measured
+    """
+    measured = 0
+    for entry in photo_catalog.unmeasured(limit, column):
+        if measure_photo(entry['id'], entry['cache_path'], photo_catalog) is not None:
+            measured += 1
+        else:
+            # Unreadable or gone; keep it out of the next batch
+            photo_catalog.set_cache_path(entry['id'], None)
+    return measured
+
+
+def get_catalog() -> PhotoCatalog:
+    """Get the shared photo catalog, opening it on first use"""
+    global _default_catalog
+    if _default_catalog is None:
+        with _default_lock:
+            if _default_catalog is None:
+                _default_catalog = PhotoCatalog()
+    return _default_catalog
+
+
+def close_catalog() -> None:
+    """Close the shared photo catalog"""
+    global _default_catalog
+    with _default_lock:
+        if _default_catalog is not None:
+            _default_catalog.close()
+            _default_catalog = None
@@ -3,9 +3,15 @@
 import argparse
 import sys
 import random
+import time
 from .categories import get_categories
 from .logger import logger
-from . import config
+from . import catalog, config, wallpaper
+
+try:
+    from wallpaper_changer import thumbnails, transcoder
+except ImportError:
+    from src.wallpaper_changer import thumbnails, transcoder
 
 # Cache for imported functions to avoid circular imports
 _update_wallpaper = None
@@ -30,6 +36,12 @@ def parse_args():
     parser.add_argument("-f", "--featured", action="store_true", help="Get only featured photos")
     parser.add_argument("--save", action="store_true", help="Save a copy of the wallpaper")
     parser.add_argument("-l", "--list-categories", action="store_true", help="List available categories")
+    parser.add_argument("--history", type=int, nargs="?", const=10, default=None, metavar="N",
+                        help="Show the last N wallpapers that were set (default 10)")
+    parser.add_argument("--thumbnails", action="store_true",
+                        help="Update the thumbnails of the saved wallpapers")
+    parser.add_argument("--transcode-saved", nargs="?", const="", default=None, metavar="FORMAT",
+                        help="Transcode the saved wallpapers to webp or jpeg (default: SAVED_FORMAT or webp)")
     
     # Auto-update options
     parser.add_argument("-a", "--auto", action="store_true", help="Run in auto-update mode")
@@ -77,6 +89,42 @@ def display_categories():
     
     print("\n")
 
+def display_history(limit=10):
+    """Display the most recently shown wallpapers from the photo catalog"""
+    entries = catalog.get_catalog().history(limit)
+    if not entries:
+        print("\nNo wallpapers shown yet.\n")
+        return
+
+    print("\nRecently shown wallpapers:")
+    for entry in entries:
+        shown = time.strftime('%Y-%m-%d %H:%M', time.localtime(entry['shown_at']))
+        size = f"{entry['width']}x{entry['height']}" if entry['width'] and entry['height'] else "?"
+        saved = " (saved)" if entry['saved_path'] else ""
+        print(f"  {shown}  {entry['id']:<14} {entry['category'] or '':<14} {size:>11}{saved}")
+    print()
+
+def update_thumbnails():
+    """Bring the thumbnail pack of the saved wallpapers up to date"""
+    pack = thumbnails.ThumbnailPack(config.THUMBNAIL_PACK, config.THUMBNAIL_SIZE)
+    counts = pack.update(config.SAVED_DIR, workers=config.THUMBNAIL_WORKERS)
+    print(f"\nThumbnails in {config.THUMBNAIL_PACK}: {counts['added']} added, "
+          f"{counts['kept']} up to date, {counts['removed']} removed\n")
+    return counts
+
+def transcode_saved(fmt=None):
+    """Transcode the saved wallpapers and report the space saved"""
+    if fmt and fmt not in transcoder.FORMATS:
+        print(f"\nUnknown format '{fmt}', use one of: {', '.join(transcoder.FORMATS)}\n")
+        return None
+    counts = wallpaper.transcode_saved_library(fmt or None)
+    print(f"\nTranscoded {counts['transcoded']} saved wallpaper(s), "
+          f"{counts['bytes_saved'] / (1024 * 1024):.1f} MB saved")
+    if counts['skipped'] or counts['failed']:
+        print(f"Kept {counts['skipped']} without a known source URL, {counts['failed']} failed")
+    print()
+    return counts
+
 def update_wallpaper(*args, **kwargs):
     """Proxy for imported update_wallpaper function"""
     global _update_wallpaper
@@ -102,6 +150,18 @@ def run_cli():
         display_categories()
         return
     
+    if args.history is not None:
+        display_history(args.history)
+        return
+    
+    if args.thumbnails:
+        update_thumbnails()
+        return
+    
+    if args.transcode_saved is not None:
+        transcode_saved(args.transcode_saved)
+        return
+    
     # Handle auto mode
     if args.auto:
         try:
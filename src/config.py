@@ -5,10 +5,57 @@ ACCESS_KEY = "-nQCvLoZDU_1rvFtaeokiDSbo3miLHKJVnVPUWx6iBQ"
 API_URL = "https://api.unsplash.com/photos/random"
 
 # Wallpaper update settings
-RESERVED_FOR_MANUAL = 10       # Reserve 10 requests per hour for manual override
 MANUAL_COOLDOWN = 60           # Seconds to wait between manual updates
 DEFAULT_INTERVAL = 1.5         # Default fixed interval (in minutes)
 
+# Background prefetch settings
+PREFETCH_DEPTH = 3             # Number of wallpapers kept downloaded and ready
+PREFETCH_WAIT = 30             # Seconds to wait for the prefetcher when nothing is ready
+BLUR_PLACEHOLDER = False       # Show the blur hash of the downloading photo while nothing is ready
+
+# Wallpaper source settings
+EXTRA_SOURCES = []             # Local directories or manifest URLs queried alongside Unsplash
+OFFLINE_FALLBACK = True        # Fall back to images in the cache when no source delivers
+SOURCE_TIMEOUT = 20            # Seconds to wait for the sources before using the best result
+
+# Pre-download filter rules, checked against the API metadata (None disables a rule)
+FILTER_MIN_RESOLUTION = "screen"   # Smallest image as "WIDTHxHEIGHT", or "screen" for the display size
+FILTER_ASPECT_RANGE = (1.0, None)  # Allowed (min, max) width/height ratio; 1.0 rejects portrait images
+FILTER_BRIGHTNESS_RANGE = None     # Allowed (min, max) brightness 0-255 of the dominant color
+FILTER_COLOR = None                # Wanted dominant color such as "#0c2640"
+FILTER_COLOR_DISTANCE = 120        # Largest RGB distance from FILTER_COLOR
+
+# Theme-aware selection, on the dominant color before download and the measured luminance once cached
+THEME = None                       # "dark", "light", "auto" to follow the desktop, or None for no preference
+DARK_LUMINANCE_RANGE = (None, 90)  # (min, max) mean luminance 0-255 of wallpapers for a dark theme
+LIGHT_LUMINANCE_RANGE = (140, None)  # (min, max) mean luminance 0-255 of wallpapers for a light theme
+NIGHT_HOURS = (19, 7)              # Hours using the dark theme when "auto" cannot detect the desktop theme
+THEME_MIN_CONTRAST = None          # Skip cached images with a lower luminance standard deviation
+
+# Rejection of blurry or featureless images, scored on a 512 px grayscale copy. Off by default:
+# smooth categories such as minimalist, sky or abstract score low without being blurry
+MIN_SHARPNESS = None               # Lowest Laplacian variance accepted, e.g. 10.0; None accepts any
+MIN_EDGE_DENSITY = None            # Lowest share 0-1 of strong-gradient pixels accepted, e.g. 0.002; None accepts any
+
+# Near-duplicate suppression, on perceptual hashes of the downloaded images
+DUPLICATE_MAX_DISTANCE = 8     # Largest differing bits (of 64) counted as a duplicate; None disables
+DUPLICATE_HISTORY = 500        # Number of recent wallpapers a candidate is compared with
+
+# Image download settings
+SCREEN_RESOLUTION = None       # Target size such as "1920x1080"; None detects the screen
+IMAGE_QUALITY = 80             # JPEG quality requested from the image CDN
+IMAGE_FORMAT = "jpg"           # Image format requested from the image CDN
+
+# Multi-monitor settings
+MONITOR_LAYOUT = None          # None for one screen, "auto" to detect, or ["DP-1:2560x1440+0+0", ...]
+MONITOR_SPAN = False           # Stretch one image across all monitors instead of one per monitor
+FIT_MODE = "fill"              # How images are fitted to each monitor: fill, fit, stretch, center, tile
+SMART_CROP = True              # In fill mode, crop around the detail of the image instead of its center
+RENDER_WORKERS = None          # Processes rendering the monitors in parallel; None picks by CPU count, 0 disables
+
+# Image cache settings
+CACHE_MAX_BYTES = 500 * 1024 * 1024  # Byte budget of the image cache before LRU eviction
+
 # Logging settings
 LOG_LEVEL = "INFO"             # Options: DEBUG, INFO, WARN, ERROR
 
@@ -20,3 +67,34 @@ IMG_DIR = "img"
 
 # Directory where saved wallpapers are stored - now a subdirectory of IMG_DIR
 SAVED_DIR = "img/saved"
+
+# Storage of saved wallpapers; --transcode-saved converts the ones saved before
+SAVED_FORMAT = None            # "webp" or "jpeg" (progressive) to transcode saved wallpapers, None copies them
+SAVED_QUALITY = 85             # Encoder quality 1-100 of transcoded wallpapers
+SAVED_MAX_SIZE = "screen"      # Size transcoded wallpapers are shrunk to fill, "WIDTHxHEIGHT", "screen" or None
+SAVED_WORKERS = None           # Processes transcoding the saved library; None picks by CPU count, 0 disables
+
+# Packed thumbnails of the saved wallpapers, updated with --thumbnails
+THUMBNAIL_PACK = "img/thumbnails.pack"
+THUMBNAIL_SIZE = 256           # Longest side of a thumbnail in pixels
+THUMBNAIL_WORKERS = None       # Processes making thumbnails; None picks by CPU count, 0 disables
+
+# Directory of the content-addressed image cache
+CACHE_DIR = "img/cache"
+
+# Directory downloads and cached images that fail the integrity check are moved to
+QUARANTINE_DIR = "img/quarantine"
+
+# Directory of wallpapers rendered for each monitor
+RENDER_DIR = "img/rendered"
+
+# SQLite catalog of photo metadata, shown history and saved wallpapers
+CATALOG_PATH = "img/catalog.db"
+
+# Memory-mapped Bloom filter of shown photo ids, so photos are not repeated across restarts
+SEEN_FILTER_PATH = "img/seen.bloom"
+SEEN_FILTER_CAPACITY = 100_000          # Number of ids the filter is sized for (~180 KB at 0.1%)
+SEEN_FILTER_FALSE_POSITIVE_RATE = 0.001  # Share of new photos wrongly skipped as seen, at capacity
+
+# Directory of the perceptual hash indexes of recent and saved wallpapers
+HASH_DIR = "img/hashes"
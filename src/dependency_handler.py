@@ -22,6 +22,7 @@ REQUIRED_PACKAGES = {
     'pytest': 'pytest',
     'win32gui': 'pywin32',  # Maps module name to package name
     'PIL': 'pillow',
+    'numpy': 'numpy',
     'setuptools': 'setuptools',
 }
 
@@ -0,0 +1,196 @@
+"""
+Module for the on-disk image cache.
+
+Images are stored under a key (the Unsplash photo id, or a content hash for
+images without one) and evicted least-recently-used first once the cache
+grows past its byte budget. A file's modification time is its LRU clock, so
+the order survives restarts without a separate index.
+"""
+import hashlib
+import logging
+import os
+import re
+import shutil
+import threading
+from typing import List, Optional
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+CACHE_EXTENSION = ".jpg"
+_SAFE_KEY = re.compile(r'^[A-Za-z0-9_-]{1,128}$')
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def digest_key(hex_digest: str) -> str:
+    """Get the cache key of a file from its hex SHA-256."""
+    return f"sha256-{hex_digest[:40]}"
+
+
+def content_key(file_path: str) -> str:
+    """Compute a content-hash cache key for a file."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest_key(digest.hexdigest())
+
+
+class ImageCache:
+    """Size-bounded, content-addressed image cache with LRU eviction"""
+
+    def __init__(self, cache_dir=None, max_bytes=None):
+        self.cache_dir = cache_dir or config.CACHE_DIR
+        self.max_bytes = config.CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self._lock = threading.Lock()
+        self._pinned = {}
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def normalize_key(key: str) -> str:
+        """Turn an arbitrary key into a safe file name"""
+        if _SAFE_KEY.match(key):
+            return key
+        return "key-" + hashlib.sha256(key.encode('utf-8')).hexdigest()[:40]
+
+    def path_for(self, key: str) -> str:
+        """Get the file path an image with this key is stored at"""
+        return os.path.join(self.cache_dir, self.normalize_key(key) + CACHE_EXTENSION)
+
+    def temp_path(self, key: str) -> str:
+        """Get a temporary download path inside the cache directory"""
+        return self.path_for(key) + ".part"
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up an image and mark it as recently used.
+
+        Returns:
+            str: Path of the cached image, or None on a cache miss
+        """
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def contains(self, key: str) -> bool:
+        """Check if an image is cached without touching its LRU position"""
+        return os.path.isfile(self.path_for(key))
+
+    def put(self, key: Optional[str], file_path: str) -> str:
+        """
+        Move a downloaded file into the cache.
+
+        Args:
+            key (str, optional): Cache key; a content hash is used when missing
+            file_path (str): File to move into the cache
+
+        Returns:
+            str: Path of the cached image
+        """
+        if not key:
+            key = content_key(file_path)
+        path = self.path_for(key)
+        if os.path.abspath(file_path) != os.path.abspath(path):
+            os.replace(file_path, path)
+        os.utime(path)
+        self.evict()
+        return path
+
+    def add_copy(self, key: Optional[str], file_path: str) -> str:
+        """Copy an existing file into the cache, leaving the original in place"""
+        if not key:
+            key = content_key(file_path)
+        cached = self.get(key)
+        if cached:
+            return cached
+        temp_path = self.temp_path(key)
+        shutil.copyfile(file_path, temp_path)
+        return self.put(key, temp_path)
+
+    def pin(self, key: str) -> None:
+        """Protect an image from eviction while it is queued or shown"""
+        name = self.normalize_key(key)
+        with self._lock:
+            self._pinned[name] = self._pinned.get(name, 0) + 1
+
+    def unpin(self, key: str) -> None:
+        """Release a pin taken with pin()"""
+        name = self.normalize_key(key)
+        with self._lock:
+            count = self._pinned.get(name, 0) - 1
+            if count > 0:
+                self._pinned[name] = count
+            else:
+                self._pinned.pop(name, None)
+
+    def _entries(self):
+        """List (mtime, size, key, path) of every cached image"""
+        entries = []
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return entries
+        for name in names:
+            if not name.endswith(CACHE_EXTENSION):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name[:-len(CACHE_EXTENSION)], path))
+        return entries
+
+    def size(self) -> int:
+        """Get the total size of cached images in bytes"""
+        return sum(entry[1] for entry in self._entries())
+
+    def recent(self, limit: int = 10) -> List[str]:
+        """Get the keys of the most recently used images, newest first"""
+        entries = sorted(self._entries(), reverse=True)
+        return [entry[2] for entry in entries[:limit]]
+
+    def evict(self) -> int:
+        """
+        Delete least recently used images until the cache fits its budget.
+
+        Returns:
+            int: Number of bytes freed
+        """
+        entries = self._entries()
+        total = sum(entry[1] for entry in entries)
+        if total <= self.max_bytes:
+            return 0
+
+        freed = 0
+        with self._lock:
+            pinned = set(self._pinned)
+        for _, size, key, path in sorted(entries):
+            if total - freed <= self.max_bytes:
+                break
+            if key in pinned:
+                continue
+            try:
+                os.remove(path)
+                freed += size
+            except OSError as e:
+                logger.debug(f"Could not evict cached image {path}: {e}")
+        if freed:
+            logger.debug(f"Evicted {freed} bytes from the image cache")
+        return freed
+
+
+def get_cache() -> ImageCache:
+    """Get the shared image cache, creating it on first use"""
+    global _default_cache
+    if _default_cache is None:
+        with _default_lock:
+            if _default_cache is None:
+                _default_cache = ImageCache()
+    return _default_cache
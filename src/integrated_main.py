@@ -12,25 +12,22 @@ except ImportError:
     pass
 
 import argparse
-import json
 import logging
 import os
 import random
-import shutil
 import sys
 import threading
 import time
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
-
-import requests
+from typing import List, Optional
 
 # Import our special version of unsplash_api
 import src.unsplash_api as unsplash_api
+from src import catalog, perceptual_hash, photo_filter, prefetch, seen_filter
 
 # Import our modules after environment is set up
 from src.categories import CATEGORIES
-from src.wallpaper import save_current_wallpaper, set_wallpaper
+from src.wallpaper import save_current_wallpaper, set_wallpaper, store_saved_wallpaper
 
 # Fix the import to use the correct Config class
 try:
@@ -44,6 +41,12 @@ except ImportError:
         # Finally try importing the config module directly
         from src.wallpaper_changer.config import Config
 
+# Shared pooled HTTP session, resumable downloads and API quota
+try:
+    from wallpaper_changer import circuit_breaker, downloader, http_client, key_pool, renderer, scheduler
+except ImportError:
+    from src.wallpaper_changer import circuit_breaker, downloader, http_client, key_pool, renderer, scheduler
+
 # Add color support for logs
 import colorama
 
@@ -76,8 +79,10 @@ logger.handlers = [handler]  # Replace any existing handlers
 
 # Global variables
 current_wallpaper_url = None  # Track the current wallpaper URL
+current_wallpaper_path = None  # Local file of the current wallpaper
+current_wallpaper_id = None  # Catalog id of the current wallpaper
+prefetcher = None  # Background prefetcher used by the main loop
 last_manual_update = datetime.now() - timedelta(minutes=5)
-requests_log_file = os.path.join(os.path.expanduser("~"), ".wallpaper_requests.json")
 saved_wallpapers_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "img", "saved")
 
 # Create saved wallpapers directory if it doesn't exist
@@ -188,140 +193,90 @@ def is_desktop_foreground() -> bool:
         return False
 
 
-def read_requests_log() -> Tuple[int, datetime]:
-    """Read the requests log file to get the number of requests made and timestamp"""
-    try:
-        if not os.path.exists(requests_log_file):
-            return 0, datetime.now() - timedelta(hours=1)
-            
-        with open(requests_log_file, 'r') as f:
-            data = json.load(f)
-            timestamp = datetime.fromisoformat(data.get('timestamp', '2000-01-01T00:00:00'))
-            count = data.get('count', 0)
-            return count, timestamp
-    except Exception as e:
-        logger.error(f"Error reading requests log: {e}")
-        return 0, datetime.now() - timedelta(hours=1)
-
-
-def write_requests_log(count: int, timestamp: Optional[datetime] = None) -> None:
-    """Write the requests log to file"""
-    if timestamp is None:
-        timestamp = datetime.now()
-        
-    try:
-        data = {
-            'count': count,
-            'timestamp': timestamp.isoformat()
-        }
-        
-        with open(requests_log_file, 'w') as f:
-            json.dump(data, f)
-    except Exception as e:
-        logger.error(f"Error writing requests log: {e}")
-
-
-def update_rate_limits(headers: Dict) -> Tuple[int, int, int]:
-    """Update rate limits from response headers"""
-    try:
-        requests_limit = int(headers.get('X-Ratelimit-Limit', '50'))
-        requests_remaining = int(headers.get('X-Ratelimit-Remaining', '50'))
-        reset_timestamp = int(headers.get('X-Ratelimit-Reset', '0'))
-        
-        return requests_limit, requests_remaining, reset_timestamp
-    except (ValueError, TypeError):
-        logger.warning("Invalid rate limit headers. Using defaults.")
-        return 50, 45, int(time.time() + 3600)
-
-
-def compute_auto_interval(max_interval: int = 60) -> int:
-    """Compute auto interval based on API rate limits"""
-    requests_count, timestamp = read_requests_log()
-    
-    # If it's been more than an hour since last request, reset counter
-    if datetime.now() - timestamp > timedelta(hours=1):
-        requests_count = 0
-        write_requests_log(requests_count)
-    
-    total_requests = 50  # Default Unsplash API limit
-    remaining_requests = total_requests - requests_count
-    
-    # Ensure we leave some minimum number of requests available
-    usable_requests = max(0, remaining_requests - MIN_REQUESTS_LEFT)
-    
-    if usable_requests <= 0:
-        # Not enough requests left, use maximum interval
-        return max_interval
+def compute_auto_interval(max_interval: int = 60) -> float:
+    """Compute auto interval in seconds, spreading the API quota until it resets"""
+    interval = scheduler.get_scheduler().next_interval(queued=unsplash_api.queued_total(),
+                                                       per_request=unsplash_api.BATCH_SIZE)
     
-    # Calculate time remaining in the hour
-    seconds_remaining = 3600 - (datetime.now() - timestamp).total_seconds() % 3600
-    minutes_remaining = max(1, int(seconds_remaining / 60))
+    api_state = circuit_breaker.get_breaker().state
+    if api_state != circuit_breaker.CLOSED:
+        logger.warning(f"⚠️ Unsplash API unavailable (circuit {api_state}). Showing demo images meanwhile.")
     
-    # Calculate interval: divide remaining time by usable requests
-    interval = max(1, int(minutes_remaining / usable_requests))
-    
-    # Cap at max_interval
-    return min(interval, max_interval)
+    # Cap at max_interval minutes
+    return min(interval, max_interval * 60)
 
 
 def update_wallpaper(category: Optional[str] = None, save: bool = False, search: Optional[str] = None) -> bool:
     """Update the wallpaper with optional category and search term"""
-    global current_wallpaper_url  # Use global to update the variable
+    global current_wallpaper_url, current_wallpaper_path, current_wallpaper_id  # Use global to update the variables
     
     try:
-        # Fix the fetch_wallpaper call to handle both category and search parameters
-        if search:
-            # If search is provided, use it instead of category
-            image_url, headers = unsplash_api.fetch_wallpaper(search_term=search)
+        if prefetcher is not None and prefetcher.matches(category, search):
+            # Pop a wallpaper that the background worker already downloaded
+            item = prefetcher.take() or {}
+            image_url = item.get('source_url')
+            wallpaper_path = item.get('file_path')
+            photo_id = item.get('photo_id')
         else:
-            # Otherwise use category (which can be None for random)
-            image_url, headers = unsplash_api.fetch_wallpaper(category=category)
+            # Take the next wallpaper from the local batch queue, which is refilled
+            # with a single API call when it runs dry, and download it into the
+            # cache, where it is checked before it is set; a search term takes
+            # priority over the category (which can be None for random)
+            item = prefetch.fetch_wallpaper_file(category, search) or {}
+            image_url = item.get('source_url')
+            wallpaper_path = item.get('file_path')
+            photo_id = item.get('photo_id')
         
         if not image_url:
             logger.error("Failed to fetch wallpaper. No image URL received.")
             return False
         
-        logger.debug(f"Setting wallpaper from URL: {image_url}")
+        logger.debug(f"Setting wallpaper from {wallpaper_path} ({image_url})")
         
         # Set the wallpaper
-        status = set_wallpaper(image_url)
-        
-        # Update rate limits
-        requests_limit, requests_remaining, _ = update_rate_limits(headers)
-        
-        # Update request log
-        requests_count, timestamp = read_requests_log()
-        if datetime.now() - timestamp > timedelta(hours=1):
-            requests_count = 0
-        requests_count += 1
-        write_requests_log(requests_count)
+        status = set_wallpaper(wallpaper_path)
         
         # Store the current wallpaper URL
         if status:
             current_wallpaper_url = image_url  # Update the URL 
+            current_wallpaper_path = wallpaper_path
+            current_wallpaper_id = photo_id
+            if photo_id:
+                unsplash_api.mark_shown(photo_id)
             logger.debug(f"Stored current wallpaper URL: {current_wallpaper_url}")
         
         # Save the wallpaper if requested
         if save and current_wallpaper_url:
-            saved_path = save_wallpaper(current_wallpaper_url)
+            saved_path = save_wallpaper(current_wallpaper_url, current_wallpaper_path, current_wallpaper_id)
             if saved_path:
                 logger.info(f"✅ Wallpaper saved to {saved_path}")
             else:
                 logger.error("❌ Failed to save wallpaper")
         
         type_str = search if search else (category if category else 'random')
-        logger.info(f"✅ Wallpaper updated ('{type_str}'). Requests left: {requests_remaining}")
+        logger.info(f"✅ Wallpaper updated ('{type_str}'). Requests left: {key_pool.get_pool().remaining()}")
         return status
     except Exception as e:
         logger.error(f"❌ Error updating wallpaper: {e}")
         return False
 
-def save_wallpaper(url: str) -> Optional[str]:
-    """Save wallpaper to the saved directory with sequential naming"""
-    if not url:
+def save_wallpaper(url: str, file_path: Optional[str] = None, photo_id: Optional[str] = None) -> Optional[str]:
+    """Save wallpaper to the saved directory with sequential naming.
+    
+    When file_path points to a local copy (e.g. in the image cache), it is
+    copied instead of downloading the image again. A photo the catalog knows
+    to be saved already is not saved twice.
+    """
+    if not url and not file_path:
         logger.error("No URL provided to save")
         return None
     
+    photo_catalog = catalog.get_catalog()
+    entry = photo_catalog.get(photo_id) if photo_id else (photo_catalog.find_by_path(file_path) if file_path else None)
+    if entry and entry['saved_path'] and os.path.isfile(entry['saved_path']):
+        logger.info(f"Wallpaper already saved as {os.path.basename(entry['saved_path'])}")
+        return entry['saved_path']
+    
     # Create saved directory if it doesn't exist
     if not os.path.exists(saved_wallpapers_dir):
         try:
@@ -333,7 +288,7 @@ def save_wallpaper(url: str) -> Optional[str]:
     try:
         # Get next sequential number
         existing_files = [f for f in os.listdir(saved_wallpapers_dir) 
-                         if f.startswith('wallpaper-') and f.endswith(('.jpg', '.jpeg', '.png'))]
+                         if f.startswith('wallpaper-') and f.endswith(('.jpg', '.jpeg', '.png', '.webp'))]
         
         next_number = 1
         if existing_files:
@@ -354,19 +309,28 @@ def save_wallpaper(url: str) -> Optional[str]:
         filename = f"wallpaper-{next_number:03d}.jpg"
         filepath = os.path.join(saved_wallpapers_dir, filename)
         
-        # Download and save the image
+        # Copy the local file when we already have the image on disk
         logger.info(f"Saving wallpaper to {filepath}...")
-        response = requests.get(url, stream=True, timeout=10)
-        
-        if response.status_code != 200:
-            logger.error(f"Failed to download image: HTTP {response.status_code}")
-            return None
-            
-        with open(filepath, 'wb') as out_file:
-            response.raw.decode_content = True
-            shutil.copyfileobj(response.raw, out_file)
+        if file_path and os.path.isfile(file_path):
+            filepath = store_saved_wallpaper(file_path, filepath, url, entry)
+        else:
+            # Download the image next to its target, then store it like a local file
+            download_path = f"{filepath}.download"
+            if not downloader.download_file(url, download_path):
+                return None
+            try:
+                filepath = store_saved_wallpaper(download_path, filepath, url, entry)
+            finally:
+                if os.path.exists(download_path):
+                    os.remove(download_path)
+        filename = os.path.basename(filepath)
             
         logger.info(f"Wallpaper saved as {filename}")
+        if entry:
+            photo_catalog.mark_saved(entry['id'], filepath)
+        detector = perceptual_hash.get_detector()
+        if detector is not None:
+            detector.add_saved(filepath, entry['id'] if entry else None)
         return filepath
     except Exception as e:
         logger.error(f"Error saving wallpaper: {e}")
@@ -398,20 +362,21 @@ def process_key_press(e):
     cooldown_elapsed = (now - last_manual_update).total_seconds() >= REQUEST_COOLDOWN
     
     if key_name == 'n' and cooldown_elapsed:
-        # Update requests log to check if we have enough requests left
-        requests_count, _ = read_requests_log()
-        if requests_count >= 45:  # Leave some buffer
+        # Check the shared quota to see if we have enough requests left
+        pool = key_pool.get_pool()
+        if len(pool) and pool.remaining() <= MIN_REQUESTS_LEFT:  # Leave some buffer
             logger.warning("⚠️ Rate limit approaching. Manual update denied.")
             return
         
         logger.info("🔄 Manual wallpaper change requested")
+        scheduler.get_scheduler().record_manual()
         if update_wallpaper(category=None, save=False, search=None):  # Use random category
             last_manual_update = now
     
     elif key_name == 's':
         if current_wallpaper_url:
             logger.debug(f"Saving current wallpaper: {current_wallpaper_url}")
-            save_path = save_wallpaper(current_wallpaper_url)
+            save_path = save_wallpaper(current_wallpaper_url, current_wallpaper_path, current_wallpaper_id)
             if save_path:
                 logger.info(f"💾 Current wallpaper saved to {save_path}")
             else:
@@ -488,17 +453,23 @@ def main_loop(interval: int, category: Optional[str] = None, auto_mode: bool = F
         interval = 15  # Default to 15 minutes
     
     max_interval = interval if interval else 60  # Default max interval is 60 minutes
-    current_interval = interval  # Initialize current_interval here
+    
+    global prefetcher
     
     # Start keyboard listener in a separate thread
     override_thread = threading.Thread(target=manual_override_listener)
     override_thread.daemon = True
     override_thread.start()
     
+    # Keep the next wallpapers downloaded in the background so changes are instant
+    prefetcher = prefetch.WallpaperPrefetcher(category, search)
+    prefetcher.start()
+    
     # Change wallpaper immediately at startup
     success = update_wallpaper(category, save, search)
     if not success:
         logger.error("❌ Failed to update wallpaper on startup.")
+        prefetcher.stop()
         return 1  # Exit with error
     
     last_update = datetime.now()
@@ -507,13 +478,12 @@ def main_loop(interval: int, category: Optional[str] = None, auto_mode: bool = F
         while True:
             # Compute interval if in auto mode
             if auto_mode:
-                current_interval = compute_auto_interval(max_interval)
-                logger.info(f"⏱️ Auto interval: {current_interval} minute(s)")
+                seconds = compute_auto_interval(max_interval)
+                logger.info(f"⏱️ Auto interval: {seconds / 60:.1f} minute(s)")
             else:
-                current_interval = interval  # Use fixed interval
+                seconds = interval * 60  # Use fixed interval
                 
             # Wait until next update
-            seconds = current_interval * 60
             time.sleep(seconds)
             
             # Check if it's time to update again (in case of sleep interruptions)
@@ -524,19 +494,25 @@ def main_loop(interval: int, category: Optional[str] = None, auto_mode: bool = F
                 
     except KeyboardInterrupt:
         logger.info("👋 Keyboard interrupt detected. Exiting...")
+        http_client.log_connection_stats(logger)
+        photo_filter.log_filter_stats(logger)
+        perceptual_hash.log_duplicate_stats(logger)
         return 0
     except Exception as e:
         logger.error(f"❌ Error in main loop: {e}")
         return 1
+    finally:
+        prefetcher.stop()
+        renderer.shutdown_workers()
 
 
 def main():
     """Main entry point for the application"""
     try:
         # Check for API key
-        api_key = os.environ.get("UNSPLASH_ACCESS_KEY", "")
-        if api_key and api_key != "-nQCvLoZDU_1rvFtaeokiDSbo3miLHKJVnVPUWx6iBQ":
-            logger.info("🔑 Using configured Unsplash API key")
+        api_keys = [key for key in key_pool.load_keys() if key != "-nQCvLoZDU_1rvFtaeokiDSbo3miLHKJVnVPUWx6iBQ"]
+        if api_keys:
+            logger.info(f"🔑 Using {len(api_keys)} configured Unsplash API key(s)")
         else:
             logger.info("💡 Tip: Configure your Unsplash API key in .env for more image variety")
         
@@ -620,6 +596,11 @@ def main():
     except Exception as e:
         logger.error(f"❌ Error: {e}")
         return 1
+    finally:
+        # Hand unspent API requests back to other running instances
+        key_pool.close_pool()
+        catalog.close_catalog()
+        seen_filter.close_seen_filter()
 
 
 if __name__ == "__main__":
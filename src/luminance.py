@@ -0,0 +1,197 @@
+"""
+Module for matching wallpapers to a light or dark desktop.
+
+The mean luminance and contrast of a cached image are measured on a tiny
+draft-decoded grayscale copy, which takes a few milliseconds even for a
+full-size JPEG. Before a photo is downloaded, the brightness of the
+dominant color from the API stands in for its luminance. Selection prefers
+photos that match the theme among those already queued or cached, so it
+never costs an extra API call or download.
+"""
+import logging
+import platform
+import subprocess
+import time
+from typing import Dict, List, Optional, Tuple
+
+from . import catalog, config, photo_filter
+
+try:
+    from wallpaper_changer import image_loader
+except ImportError:
+    from src.wallpaper_changer import image_loader
+
+logger = logging.getLogger(__name__)
+
+# Side of the grayscale copy luminance is measured on
+MEASURE_SIZE = (64, 64)
+# Seconds a detected desktop theme is reused before asking the desktop again
+DETECT_TTL = 300
+
+# Theme implied by a category when config.THEME is not set
+CATEGORY_THEMES = {
+    "dark": "dark", "night": "dark", "black": "dark", "stars": "dark",
+    "light": "light", "white": "light",
+}
+
+_detected = None
+
+
+def measure(file_path: str) -> Optional[Tuple[float, float]]:
+    """
+    Measure an image.
+
+    Returns:
+        tuple: (mean luminance 0-255, contrast as the standard deviation of
+               the luminance), or None if the image could not be read
+    """
+    import numpy as np
+
+    img = image_loader.load_image(file_path, MEASURE_SIZE, mode="L")
+    if img is None:
+        return None
+    try:
+        pixels = np.asarray(img, dtype=np.float32)
+        return float(pixels.mean()), float(pixels.std())
+    except Exception as e:
+        logger.error(f"Error measuring {file_path}: {e}")
+        return None
+
+
+def measure_photo(photo_id: str, file_path: str, photo_catalog) -> Optional[Tuple[float, float]]:
+    """Measure the cached image of a photo and record the result in the catalog"""
+    values = measure(file_path)
+    if values is not None:
+        photo_catalog.set_luminance(photo_id, *values)
+    return values
+
+
+def measure_cached(photo_catalog, limit: int = 50) -> int:
+    """
+    Measure cached photos that have not been measured yet.
+
+    Returns:
+        int: Number of photos measured
+    """
+    measured = catalog.measure_cached(photo_catalog, measure_photo, "contrast", limit)
+    if measured:
+        logger.debug(f"Measured the luminance of {measured} cached photo(s)")
+    return measured
+
+
+def _gnome_dark_mode() -> Optional[bool]:
+    output = subprocess.run(['gsettings', 'get', 'org.gnome.desktop.interface', 'color-scheme'],
+                            capture_output=True, text=True, timeout=2).stdout
+    if not output.strip():
+        return None
+    return 'dark' in output
+
+
+def _macos_dark_mode() -> Optional[bool]:
+    result = subprocess.run(['defaults', 'read', '-g', 'AppleInterfaceStyle'],
+                            capture_output=True, text=True, timeout=2)
+    # The key is missing in light mode
+    return 'Dark' in result.stdout
+
+
+def _windows_dark_mode() -> Optional[bool]:
+    import winreg
+    with winreg.OpenKey(winreg.HKEY_CURRENT_USER,
+                        r"Software\Microsoft\Windows\CurrentVersion\Themes\Personalize") as key:
+        return winreg.QueryValueEx(key, "AppsUseLightTheme")[0] == 0
+
+
+def detect_dark_mode() -> Optional[bool]:
+    """
+    Check if the desktop uses a dark theme.
+
+    The answer is reused for DETECT_TTL seconds.
+
+    Returns:
+        bool: True for dark, False for light, None if it could not be detected
+    """
+    global _detected
+    now = time.monotonic()
+    if _detected is not None and now - _detected[1] < DETECT_TTL:
+        return _detected[0]
+    detectors = {
+        'Linux': _gnome_dark_mode,
+        'Darwin': _macos_dark_mode,
+        'Windows': _windows_dark_mode,
+    }
+    detector = detectors.get(platform.system())
+    dark = None
+    if detector is not None:
+        try:
+            dark = detector()
+        except Exception as e:
+            logger.debug(f"Could not detect the desktop theme: {e}")
+    _detected = (dark, now)
+    return dark
+
+
+def is_night(hour: Optional[int] = None) -> bool:
+    """Check if an hour (default: now) falls in config.NIGHT_HOURS"""
+    if hour is None:
+        hour = time.localtime().tm_hour
+    start, end = config.NIGHT_HOURS
+    if start <= end:
+        return start <= hour < end
+    return hour >= start or hour < end
+
+
+def current_theme(category: Optional[str] = None) -> Optional[str]:
+    """
+    Get the theme wallpapers should match.
+
+    config.THEME is "dark", "light", "auto" (the desktop theme, or the time
+    of day when that is unknown) or None, in which case a category like
+    "dark" or "night" sets the theme.
+
+    Returns:
+        str: "dark", "light" or None for no preference
+    """
+    theme = config.THEME
+    if theme == "auto":
+        dark = detect_dark_mode()
+        if dark is None:
+            dark = is_night()
+        return "dark" if dark else "light"
+    if theme in ("dark", "light"):
+        return theme
+    return CATEGORY_THEMES.get((category or "").lower())
+
+
+def theme_range(category: Optional[str] = None) -> Optional[Tuple[Optional[float], Optional[float]]]:
+    """Get the (min, max) luminance of wallpapers matching the current theme, or None"""
+    theme = current_theme(category)
+    if theme == "dark":
+        return config.DARK_LUMINANCE_RANGE
+    if theme == "light":
+        return config.LIGHT_LUMINANCE_RANGE
+    return None
+
+
+def in_range(value: Optional[float], luminance_range: Optional[Tuple[Optional[float], Optional[float]]]) -> bool:
+    """Check if a luminance lies in a (min, max) range; an unknown value never does"""
+    if luminance_range is None:
+        return True
+    if value is None:
+        return False
+    low, high = luminance_range
+    return (low is None or value >= low) and (high is None or value <= high)
+
+
+def preferred_index(photos: List[Dict], luminance_range) -> int:
+    """
+    Pick the first photo whose dominant color matches a luminance range.
+
+    Returns:
+        int: Index of the photo, 0 when none matches
+    """
+    if luminance_range is None:
+        return 0
+    for index, photo in enumerate(photos):
+        if in_range(photo_filter.brightness(photo.get('color')), luminance_range):
+            return index
+    return 0
@@ -61,13 +61,22 @@ win32gui = import_optional('win32gui')
 
 # Import remaining modules
 from . import config, cli, unsplash_api, wallpaper
-from . import init_dirs
+from . import catalog, init_dirs, perceptual_hash, photo_filter, prefetch, seen_filter
+
+# API quota shared with other wallpaper changer processes
+try:
+    from wallpaper_changer import circuit_breaker, http_client, key_pool, renderer, scheduler
+except ImportError:
+    from src.wallpaper_changer import circuit_breaker, http_client, key_pool, renderer, scheduler
 
 # Global state variables
-requests_remaining = config.RATE_LIMIT_PER_HOUR
-hour_start = None
 command_queue = queue.Queue()
 exit_flag = threading.Event()
+prefetcher = None          # Background prefetcher, created by run()
+current_wallpaper = None   # Dictionary with file_path, source_url and photo_id of the shown wallpaper
+
+# Seconds between checks of the command queue while waiting for the next update
+COMMAND_POLL_INTERVAL = 0.05
 
 # -----------------------------------------------------------------------------
 # Rate Limiting & Interval Management
@@ -77,53 +86,37 @@ def compute_auto_interval(remaining_requests=None, start_time=None, reserved_req
     """
     Compute the optimal interval between API calls based on rate limits.
     
+    The updates the remaining requests allow, each filling the photo queue
+    with a batch, and the photos already queued are spread evenly until the
+    server's rate limit window resets, holding back requests for the manual
+    overrides the user is expected to make.
+    
     Args:
-        remaining_requests (int, optional): Number of requests remaining in current hour
-        start_time (float, optional): Timestamp when the hour started 
-        reserved_requests (int, optional): Number of requests to reserve for manual actions
+        remaining_requests (int, optional): Number of requests remaining in current hour,
+            defaults to the shared rate limiter's estimate
+        start_time (float, optional): Timestamp when the hour started, defaults to
+            the reset time reported by the API
+        reserved_requests (int, optional): Number of requests to reserve for manual actions,
+            defaults to an estimate from the observed manual update rate
     
     Returns:
         float: Interval in seconds between wallpaper updates
     """
-    # Use global state or provided parameters
-    global hour_start, requests_remaining
-    
-    current_remaining = remaining_requests if remaining_requests is not None else requests_remaining
-    current_hour_start = start_time if start_time is not None else hour_start
-    reserved = reserved_requests if reserved_requests is not None else config.RESERVED_FOR_MANUAL
-    
-    # If hour hasn't started yet, use default interval
-    if current_hour_start is None:
-        return 90.0
-        
-    elapsed = time.time() - current_hour_start
-    
-    # If more than an hour has passed, reset the counter
-    if elapsed >= 3600:
-        if remaining_requests is None:  # Only update globals if not in test mode
-            hour_start = time.time()
-            requests_remaining = config.RATE_LIMIT_PER_HOUR
-        return 90.0
-        
-    # Calculate time remaining in the current hour
-    seconds_left = 3600 - elapsed
-    
-    # Calculate usable requests (total minus reserved)
-    usable = current_remaining - reserved
-    
-    # If no usable requests remaining, wait 10 minutes
-    if usable <= 0:
-        logger.warning("No usable requests left. Sleeping 10 minutes.")
-        return 600.0
-        
-    # Calculate interval to distribute remaining requests over the hour
-    interval = seconds_left / float(usable)
-    
-    # Enforce minimum interval
-    if interval < 30.0:
-        interval = 30.0
-        
-    logger.info(f"[Auto Interval] Next update in ~{int(interval)} second(s). Requests left: {current_remaining}")
+    seconds_left = None
+    if start_time is not None:
+        elapsed = time.time() - start_time
+        # If more than an hour has passed, the quota has been reset
+        if elapsed >= 3600:
+            return scheduler.DEFAULT_INTERVAL
+        seconds_left = 3600 - elapsed
+    
+    interval = scheduler.get_scheduler().next_interval(remaining_requests, seconds_left, reserved_requests,
+                                                       queued=unsplash_api.queued_total(),
+                                                       per_request=unsplash_api.BATCH_SIZE)
+    api_state = circuit_breaker.get_breaker().state
+    if api_state != circuit_breaker.CLOSED:
+        logger.warning(f"[Auto Interval] Unsplash API unavailable (circuit {api_state}).")
+    logger.info(f"[Auto Interval] Next update in ~{int(interval)} second(s).")
     return interval
 
 def update_rate_limits(response_headers):
@@ -136,23 +129,9 @@ def update_rate_limits(response_headers):
     Returns:
         int: Updated requests remaining count
     """
-    global requests_remaining, hour_start
-    
-    # Get rate limit header
-    rl = response_headers.get('X-Ratelimit-Remaining')
-    
-    if rl is not None:
-        try:
-            requests_remaining = int(rl)
-        except ValueError:
-            # Header exists but isn't a valid integer
-            pass
-        
-        # Initialize hour start time if not set
-        if hour_start is None:
-            hour_start = time.time()
-    
-    return requests_remaining
+    pool = key_pool.get_pool()
+    remaining = pool.observe(response_headers)
+    return remaining if remaining is not None else pool.remaining()
 
 # -----------------------------------------------------------------------------
 # Wallpaper Operations 
@@ -173,11 +152,8 @@ def fetch_wallpaper(query=None, featured=False):
         # This is a wrapper around unsplash_api.get_random_photo
         from . import unsplash_api
         # Pass the query as the positional argument that's expected
-        img_path, rl = unsplash_api.fetch_wallpaper(query)
-        
-        # Update rate limits
-        if rl is not None:
-            update_rate_limits({'X-Ratelimit-Remaining': rl})
+        # The API module records the rate limit headers itself
+        img_path, _ = unsplash_api.fetch_wallpaper(query)
         
         if img_path:
             # Return the expected dictionary format
@@ -222,35 +198,48 @@ def update_wallpaper_cmd(trigger_type, category):
     """
     Update wallpaper and handle rate limiting based on trigger type.
     
+    When a prefetcher is running, the next wallpaper is already downloaded
+    and only needs to be set.
+    
     Args:
         trigger_type (str): Type of trigger (auto/manual)
         category (str): Category to use for wallpaper
     """
-    global hour_start, requests_remaining
+    global current_wallpaper
     
-    # Call the API to fetch a new wallpaper
-    img_path, rl = unsplash_api.fetch_wallpaper(category)
-    
-    # Update rate limits
-    if rl is not None:
-        try:
-            requests_remaining = int(rl)
-        except ValueError:
-            pass
-        if hour_start is None:
-            hour_start = time.time()
+    if prefetcher is not None and prefetcher.matches(category):
+        # Pop a wallpaper that is already on disk
+        item = prefetcher.take() or {}
+        img_path, source_url, photo_id = item.get('file_path'), item.get('source_url'), item.get('photo_id')
+    else:
+        # Take the next wallpaper from the local batch queue (refilled with one API call when empty)
+        # and download it into the cache, where it is checked before it is set
+        item = prefetch.fetch_wallpaper_file(category) or {}
+        img_path, source_url, photo_id = item.get('file_path'), item.get('source_url'), item.get('photo_id')
     
+    # Queued and prefetched wallpapers carry the headers of an older API call, so
+    # the quota is only updated by the API module when a request is actually made
     # Set the wallpaper if fetched successfully
     if img_path:
         wallpaper.set_wallpaper(img_path)
-        logger.info(f"[✓] Wallpaper updated ({trigger_type}). Requests left: {requests_remaining}")
-        
-        # Reset hour start time for manual updates
-        if trigger_type == "manual":
-            hour_start = time.time()
+        current_wallpaper = {'file_path': img_path, 'source_url': source_url, 'photo_id': photo_id}
+        if photo_id:
+            unsplash_api.mark_shown(photo_id)
+        logger.info(f"[✓] Wallpaper updated ({trigger_type}). Requests left: {key_pool.get_pool().remaining()}")
     else:
         logger.error("Failed to update wallpaper.")
 
+def stop_prefetcher():
+    """
+    Stop the background prefetcher if one is running, along with the
+    render worker processes.
+    """
+    global prefetcher
+    if prefetcher is not None:
+        prefetcher.stop()
+        prefetcher = None
+    renderer.shutdown_workers()
+
 def display_categories():
     """
     Display available wallpaper categories
@@ -293,8 +282,6 @@ def process_key_press(key, last_manual_time=0.0, last_cooldown_print=0.0):
     Returns:
         tuple: (command, trigger_type, updated_last_manual_time, updated_last_cooldown_print)
     """
-    global requests_remaining
-    
     # Default return values (no command)
     command = None
     trigger_type = None
@@ -318,12 +305,13 @@ def process_key_press(key, last_manual_time=0.0, last_cooldown_print=0.0):
             return (None, None, last_manual_time, new_last_cooldown_print)
             
         # Check rate limits
-        if requests_remaining <= 0:
+        if key_pool.get_pool().exhausted():
             logger.warning("No requests left this hour. Can't do manual override.")
             return (None, None, last_manual_time, last_cooldown_print)
             
         # Process manual override
         logger.info("Manual override triggered! Changing wallpaper...")
+        scheduler.get_scheduler().record_manual(now)
         command = "update"
         trigger_type = "manual"
         new_last_manual_time = now
@@ -418,7 +406,11 @@ def process_commands():
             if cmd == "update":
                 update_wallpaper_cmd(trig, None)  # Category is None here - will need to be fixed
             elif cmd == "save":
-                wallpaper.save_current_wallpaper()
+                if current_wallpaper:
+                    wallpaper.save_current_wallpaper(current_wallpaper['file_path'], current_wallpaper['source_url'],
+                                                     current_wallpaper.get('photo_id'))
+                else:
+                    wallpaper.save_current_wallpaper()
             commands_processed = True
         except queue.Empty:
             break
@@ -450,6 +442,7 @@ def handle_auto_mode(auto_interval=None):
             time.sleep(interval)
     except KeyboardInterrupt:
         logger.info("Keyboard interrupt received, exiting auto mode")
+        renderer.shutdown_workers()
 
 def main_loop(auto_mode, fixed_interval, category):
     """
@@ -487,8 +480,8 @@ def main_loop(auto_mode, fixed_interval, category):
             # Process any commands while waiting
             process_commands()
                 
-            # Small sleep to prevent CPU spiking
-            time.sleep(0.5)
+            # Short sleep so manual commands are picked up quickly without spiking the CPU
+            time.sleep(COMMAND_POLL_INTERVAL)
 
 # -----------------------------------------------------------------------------
 # JSON Config Functions
@@ -533,6 +526,8 @@ def run():
     Main entry point function for the application.
     Returns exit code.
     """
+    global prefetcher
+    
     try:
         # Ensure required directories exist
         init_dirs.ensure_directories()
@@ -570,6 +565,9 @@ def run():
         # Start keyboard listener thread
         threading.Thread(target=manual_override_listener, args=(category,), daemon=True).start()
         
+        # Keep the next wallpapers downloaded in the background (starts on the first update)
+        prefetcher = prefetch.WallpaperPrefetcher(category)
+        
         # Run main application loop
         main_loop(auto_mode, fixed_interval, category)
         return 0
@@ -577,12 +575,20 @@ def run():
     except KeyboardInterrupt:
         logger.info("Keyboard interrupt detected. Exiting...")
         exit_flag.set()
+        http_client.log_connection_stats(logger)
+        photo_filter.log_filter_stats(logger)
+        perceptual_hash.log_duplicate_stats(logger)
         return 0
     except Exception as e:
         logger.error(f"Unhandled exception: {str(e)}")
         import traceback
         logger.error(traceback.format_exc())
         return 1
+    finally:
+        stop_prefetcher()
+        key_pool.close_pool()
+        catalog.close_catalog()
+        seen_filter.close_seen_filter()
 
 if __name__ == "__main__":
     sys.exit(run())
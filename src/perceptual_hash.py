@@ -0,0 +1,343 @@
+"""
+Module for suppressing near-duplicate wallpapers.
+
+Every fetched image gets a 64-bit perceptual hash (pHash: the signs of the
+low DCT frequencies of a 32x32 grayscale thumbnail). Visually similar images
+have hashes that differ in only a few bits, so a candidate is rejected when
+its Hamming distance to a recent wallpaper or a saved one is small.
+
+The hashes are kept in packed uint64 NumPy arrays and searched with one
+vectorized XOR and popcount, which takes about a millisecond per 100k hashes.
+"""
+import logging
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from . import config
+
+try:
+    from wallpaper_changer import image_loader
+except ImportError:
+    from src.wallpaper_changer import image_loader
+
+logger = logging.getLogger(__name__)
+
+HASH_DIR_ENV = "WALLPAPER_HASH_DIR"
+
+HASH_SIZE = 8      # The hash is the HASH_SIZE x HASH_SIZE lowest frequencies
+DCT_SIZE = 32      # Side of the grayscale thumbnail the DCT runs on
+INITIAL_CAPACITY = 1024
+MAX_PENDING = 64   # Checked images kept waiting for remember() before the oldest is dropped
+
+_default_detector = None
+_default_lock = threading.Lock()
+
+
+def _dct_matrix(size: int) -> np.ndarray:
+    """Orthonormal DCT-II matrix, so the 2D transform is M @ pixels @ M.T"""
+    n = np.arange(size)
+    matrix = np.cos(np.pi * (2 * n[None, :] + 1) * n[:, None] / (2 * size)) * np.sqrt(2 / size)
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+
+_DCT = _dct_matrix(DCT_SIZE)
+
+# Bits set in every byte value, for NumPy versions without bitwise_count
+_POPCOUNT_TABLE = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+
+def phash_pixels(pixels: np.ndarray) -> int:
+    """
+    Compute the perceptual hash of a DCT_SIZE x DCT_SIZE grayscale image.
+
+    Args:
+        pixels (ndarray): Grayscale values, shape (DCT_SIZE, DCT_SIZE)
+
+    Returns:
+        int: 64-bit hash
+    """
+    pixels = np.asarray(pixels, dtype=np.float64)
+    low = (_DCT @ pixels @ _DCT.T)[:HASH_SIZE, :HASH_SIZE].flatten()
+    # The DC term is the mean brightness and would dominate the median
+    bits = low > np.median(low[1:])
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def phash(file_path: str) -> Optional[int]:
+    """
+    Compute the perceptual hash of an image file.
+
+    Returns:
+        int: 64-bit hash, or None if Pillow is missing or the file cannot be decoded
+    """
+    img = image_loader.load_image(file_path, (DCT_SIZE * 4, DCT_SIZE * 4), mode='L')
+    if img is None:
+        return None
+    try:
+        from PIL import Image
+        return phash_pixels(np.asarray(img.resize((DCT_SIZE, DCT_SIZE), Image.BILINEAR)))
+    except Exception as e:
+        logger.debug(f"Could not hash {file_path}: {e}")
+        return None
+
+
+def hamming_distances(hashes: np.ndarray, value: int) -> np.ndarray:
+    """Get the number of differing bits between every hash and value"""
+    diff = hashes ^ np.uint64(value)
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(diff)
+    return _POPCOUNT_TABLE[diff.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+
+class HashIndex:
+    """Packed array of keyed 64-bit hashes, optionally persisted to a .npz file"""
+
+    def __init__(self, path: Optional[str] = None, capacity: Optional[int] = None):
+        """
+        Args:
+            path (str, optional): File the index is loaded from and saved to
+            capacity (int, optional): Keep only the newest hashes beyond this many
+        """
+        self.path = path
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._hashes = np.zeros(INITIAL_CAPACITY, dtype=np.uint64)
+        self._keys: List[str] = []
+        self._positions: Dict[str, int] = {}
+        if path and os.path.isfile(path):
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _load(self) -> None:
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                hashes, keys = data['hashes'].astype(np.uint64), [str(key) for key in data['keys']]
+        except Exception as e:
+            logger.warning(f"Could not load hash index {self.path}: {e}. Starting empty.")
+            return
+        if len(hashes) != len(keys):
+            logger.warning(f"Hash index {self.path} is inconsistent. Starting empty.")
+            return
+        with self._lock:
+            self._hashes = np.zeros(max(INITIAL_CAPACITY, len(hashes) * 2), dtype=np.uint64)
+            self._hashes[:len(hashes)] = hashes
+            self._keys = keys
+            self._positions = {key: position for position, key in enumerate(keys)}
+            self._trim()
+
+    def save(self) -> None:
+        """Write the index to its file, atomically"""
+        if not self.path:
+            return
+        with self._lock:
+            hashes = self._hashes[:len(self._keys)].copy()
+            keys = np.array(self._keys, dtype=str)
+        temp_path = f"{self.path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(temp_path, 'wb') as f:
+                np.savez(f, hashes=hashes, keys=keys)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Could not save hash index {self.path}: {e}")
+
+    def get(self, key: str) -> Optional[int]:
+        """Get the hash stored for a key"""
+        with self._lock:
+            position = self._positions.get(key)
+            return int(self._hashes[position]) if position is not None else None
+
+    def add(self, key: str, value: int) -> None:
+        """Store the hash of a key, replacing an older one"""
+        with self._lock:
+            position = self._positions.get(key)
+            if position is None:
+                position = len(self._keys)
+                if position == len(self._hashes):
+                    self._hashes = np.concatenate([self._hashes, np.zeros_like(self._hashes)])
+                self._keys.append(key)
+                self._positions[key] = position
+            self._hashes[position] = value
+            self._trim()
+
+    def _trim(self) -> None:
+        """Drop the oldest hashes beyond capacity. Called with the lock held."""
+        overflow = len(self._keys) - self.capacity if self.capacity else 0
+        if overflow <= 0:
+            return
+        count = len(self._keys)
+        self._hashes[:count - overflow] = self._hashes[overflow:count]
+        self._keys = self._keys[overflow:]
+        self._positions = {key: position for position, key in enumerate(self._keys)}
+
+    def nearest(self, value: int) -> Tuple[Optional[str], Optional[int]]:
+        """
+        Find the stored hash closest to value.
+
+        Returns:
+            tuple: (key, Hamming distance), or (None, None) if the index is empty
+        """
+        with self._lock:
+            count = len(self._keys)
+            if not count:
+                return None, None
+            distances = hamming_distances(self._hashes[:count], value)
+            position = int(distances.argmin())
+            return self._keys[position], int(distances[position])
+
+
+class DuplicateDetector:
+    """Rejects images that look like a recent wallpaper or a saved one"""
+
+    def __init__(self, recent: HashIndex, library: HashIndex, max_distance: int = 8):
+        """
+        Args:
+            recent (HashIndex): Hashes of the recently accepted wallpapers
+            library (HashIndex): Hashes of the saved wallpapers
+            max_distance (int): Largest Hamming distance counted as a duplicate
+        """
+        self.recent = recent
+        self.library = library
+        self.max_distance = max_distance
+        self._lock = threading.Lock()
+        self._checked = 0
+        self._rejected = 0
+        # Hashes of images that passed a check but are not remembered yet
+        self._pending = {}
+
+    def check(self, file_path: str, key: Optional[str] = None, remember: bool = True) -> Optional[str]:
+        """
+        Check an image against the recent and saved wallpapers, remembering it if it passes.
+
+        Images that cannot be hashed always pass.
+
+        Args:
+            file_path (str): Local image file
+            key (str, optional): Photo id or cache key, defaults to the file path
+            remember (bool): Add a passing image to the recent wallpapers; without it,
+                call remember() once the image is actually used
+
+        Returns:
+            str: Key of the wallpaper the image duplicates, or None if it is new
+        """
+        key = key or os.path.abspath(file_path)
+        value = self.recent.get(key)
+        if value is None:
+            value = phash(file_path)
+        if value is None:
+            return None
+
+        match = None
+        for index in (self.recent, self.library):
+            nearest, distance = index.nearest(value)
+            if nearest is not None and distance <= self.max_distance:
+                match = nearest
+                break
+
+        with self._lock:
+            self._checked += 1
+            self._rejected += match is not None
+        if match is not None:
+            logger.debug(f"Skipping {key}: near-duplicate of {match}")
+            return match
+        if remember:
+            self.recent.add(key, value)
+            self.recent.save()
+        else:
+            with self._lock:
+                self._pending[key] = value
+                # Results that were never used do not pile up
+                for old_key in list(self._pending)[:max(0, len(self._pending) - MAX_PENDING)]:
+                    del self._pending[old_key]
+        return None
+
+    def remember(self, file_path: str, key: Optional[str] = None) -> None:
+        """Add an image that passed check(remember=False) to the recent wallpapers"""
+        key = key or os.path.abspath(file_path)
+        with self._lock:
+            value = self._pending.pop(key, None)
+        if value is None:
+            value = phash(file_path)
+        if value is not None:
+            self.recent.add(key, value)
+            self.recent.save()
+
+    def add_saved(self, file_path: str, key: Optional[str] = None) -> None:
+        """Add a saved wallpaper to the library"""
+        key = key or os.path.abspath(file_path)
+        value = self.recent.get(key)
+        if value is None:
+            value = phash(file_path)
+        if value is not None:
+            self.library.add(key, value)
+            self.library.save()
+
+    def stats(self) -> Dict:
+        """
+        Get the detector counters.
+
+        Returns:
+            dict: Images 'checked' and 'rejected', and the hashes held in 'recent' and 'library'
+        """
+        with self._lock:
+            return {'checked': self._checked, 'rejected': self._rejected,
+                    'recent': len(self.recent), 'library': len(self.library)}
+
+
+def default_hash_dir() -> str:
+    """Get the directory the hash indexes are stored in"""
+    return os.environ.get(HASH_DIR_ENV) or config.HASH_DIR
+
+
+def _library_from_saved(library: HashIndex) -> None:
+    """Hash the images in the saved directory into an empty library"""
+    if len(library) or not os.path.isdir(config.SAVED_DIR):
+        return
+    for name in sorted(os.listdir(config.SAVED_DIR)):
+        if name.lower().endswith(('.jpg', '.jpeg', '.png', '.webp')):
+            file_path = os.path.abspath(os.path.join(config.SAVED_DIR, name))
+            value = phash(file_path)
+            if value is not None:
+                library.add(file_path, value)
+    if len(library):
+        logger.info(f"Hashed {len(library)} saved wallpaper(s) for duplicate detection")
+        library.save()
+
+
+def get_detector() -> Optional[DuplicateDetector]:
+    """
+    Get the shared detector, loading its indexes on first use.
+
+    Returns:
+        DuplicateDetector: The detector, or None if config.DUPLICATE_MAX_DISTANCE disables it
+    """
+    global _default_detector
+    if config.DUPLICATE_MAX_DISTANCE is None:
+        return None
+    if _default_detector is None:
+        with _default_lock:
+            if _default_detector is None:
+                hash_dir = default_hash_dir()
+                recent = HashIndex(os.path.join(hash_dir, "recent.npz"), capacity=config.DUPLICATE_HISTORY)
+                library = HashIndex(os.path.join(hash_dir, "library.npz"))
+                _library_from_saved(library)
+                _default_detector = DuplicateDetector(recent, library, config.DUPLICATE_MAX_DISTANCE)
+    return _default_detector
+
+
+def log_duplicate_stats(log: Optional[logging.Logger] = None) -> None:
+    """Log how many near-duplicates were skipped"""
+    detector = _default_detector
+    if detector is None:
+        return
+    stats = detector.stats()
+    (log or logger).info(
+        f"Duplicate detection: {stats['rejected']} of {stats['checked']} image(s) skipped as near-duplicates "
+        f"({stats['recent']} recent, {stats['library']} saved hashes)"
+    )
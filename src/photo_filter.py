@@ -0,0 +1,214 @@
+"""
+Module for filtering photo candidates on their API metadata.
+
+The Unsplash JSON already tells the size and dominant color of a photo, so
+candidates that are too small, the wrong shape or too bright or dark are
+rejected before a single image byte is downloaded. The filter keeps count
+of what it rejected and an estimate of the bandwidth that saved.
+"""
+import logging
+import math
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+# Average compressed size of a JPEG variant, used to estimate the bytes saved
+ESTIMATED_BYTES_PER_PIXEL = 0.3
+
+_default_filter = None
+_default_lock = threading.Lock()
+
+
+def parse_color(color: Optional[str]) -> Optional[Tuple[int, int, int]]:
+    """Parse a "#rrggbb" color into an RGB tuple"""
+    if not isinstance(color, str):
+        return None
+    value = color.strip().lstrip('#')
+    if len(value) == 3:
+        value = ''.join(c * 2 for c in value)
+    if len(value) != 6:
+        return None
+    try:
+        return int(value[0:2], 16), int(value[2:4], 16), int(value[4:6], 16)
+    except ValueError:
+        return None
+
+
+def brightness(color: Optional[str]) -> Optional[float]:
+    """Get the perceived brightness (0-255, Rec. 601 luma) of a "#rrggbb" color"""
+    rgb = parse_color(color)
+    if rgb is None:
+        return None
+    red, green, blue = rgb
+    return 0.299 * red + 0.587 * green + 0.114 * blue
+
+
+def estimated_bytes(photo: Dict, target_size: Optional[Tuple[int, int]] = None) -> int:
+    """
+    Estimate the download size of a photo.
+
+    With a target size, the screen-sized variant is estimated, otherwise the
+    full image.
+    """
+    width, height = photo.get('width'), photo.get('height')
+    if not width or not height:
+        return 0
+    if target_size:
+        scale = min(1.0, max(target_size[0] / width, target_size[1] / height))
+        width, height = math.ceil(width * scale), math.ceil(height * scale)
+    return int(width * height * ESTIMATED_BYTES_PER_PIXEL)
+
+
+class PhotoFilter:
+    """Metadata rules a photo must pass before it is downloaded"""
+
+    def __init__(self, min_size: Optional[Tuple[int, int]] = None,
+                 aspect_range: Optional[Tuple[Optional[float], Optional[float]]] = None,
+                 brightness_range: Optional[Tuple[Optional[float], Optional[float]]] = None,
+                 color: Optional[str] = None, color_distance: float = 120):
+        """
+        Args:
+            min_size (tuple, optional): Smallest (width, height) accepted
+            aspect_range (tuple, optional): (min, max) width/height ratio, either may be None
+            brightness_range (tuple, optional): (min, max) brightness of the dominant color
+            color (str, optional): Wanted dominant color as "#rrggbb"
+            color_distance (float): Largest RGB distance from the wanted color
+        """
+        self.min_size = min_size
+        self.aspect_range = aspect_range
+        self.brightness_range = brightness_range
+        self.color = parse_color(color)
+        self.color_distance = color_distance
+        self._lock = threading.Lock()
+        self._checked = 0
+        self._reasons: Dict[str, int] = {}
+        self._bytes_saved = 0
+
+    def check(self, photo: Dict) -> Optional[str]:
+        """
+        Check a photo record against the rules.
+
+        Missing metadata never rejects a photo.
+
+        Returns:
+            str: Name of the rule the photo failed, or None if it passes
+        """
+        width, height = photo.get('width'), photo.get('height')
+        if width and height:
+            if self.min_size and (width < self.min_size[0] or height < self.min_size[1]):
+                return "resolution"
+            if self.aspect_range:
+                low, high = self.aspect_range
+                aspect = width / height
+                if (low is not None and aspect < low) or (high is not None and aspect > high):
+                    return "aspect"
+
+        if self.brightness_range:
+            value = brightness(photo.get('color'))
+            low, high = self.brightness_range
+            if value is not None and ((low is not None and value < low) or (high is not None and value > high)):
+                return "brightness"
+
+        if self.color:
+            rgb = parse_color(photo.get('color'))
+            if rgb is not None:
+                # math.dist needs Python 3.8
+                distance = math.sqrt(sum((a - b) ** 2 for a, b in zip(rgb, self.color)))
+                if distance > self.color_distance:
+                    return "color"
+        return None
+
+    def apply(self, photos: Iterable[Dict], target_size: Optional[Tuple[int, int]] = None) -> List[Dict]:
+        """
+        Keep the photos that pass every rule, counting the rejected ones.
+
+        Args:
+            photos (iterable): API photo records
+            target_size (tuple, optional): Size the images would be downloaded at,
+                used to estimate the bandwidth saved
+
+        Returns:
+            list: Photos that passed
+        """
+        accepted, reasons, saved = [], {}, 0
+        photos = list(photos)
+        for photo in photos:
+            reason = self.check(photo)
+            if reason is None:
+                accepted.append(photo)
+                continue
+            reasons[reason] = reasons.get(reason, 0) + 1
+            saved += estimated_bytes(photo, target_size)
+            logger.debug(f"Skipping photo {photo.get('id')} before download ({reason})")
+
+        with self._lock:
+            self._checked += len(photos)
+            for reason, count in reasons.items():
+                self._reasons[reason] = self._reasons.get(reason, 0) + count
+            self._bytes_saved += saved
+        return accepted
+
+    def stats(self) -> Dict:
+        """
+        Get the filter counters.
+
+        Returns:
+            dict: Photos 'checked', 'rejected' in total and per rule in 'reasons',
+                  and the estimated 'bytes_saved'
+        """
+        with self._lock:
+            return {
+                'checked': self._checked,
+                'rejected': sum(self._reasons.values()),
+                'reasons': dict(self._reasons),
+                'bytes_saved': self._bytes_saved,
+            }
+
+
+def from_config(target_size: Optional[Tuple[int, int]] = None) -> PhotoFilter:
+    """
+    Create a filter from the FILTER_* settings in config.
+
+    Args:
+        target_size (tuple, optional): Screen size used when FILTER_MIN_RESOLUTION is "screen"
+    """
+    min_size = config.FILTER_MIN_RESOLUTION
+    if min_size == "screen":
+        min_size = target_size
+    elif isinstance(min_size, str):
+        try:
+            width, height = min_size.lower().split('x')
+            min_size = (int(width), int(height))
+        except ValueError:
+            logger.warning(f"Invalid FILTER_MIN_RESOLUTION: {min_size}")
+            min_size = None
+    return PhotoFilter(
+        min_size=min_size,
+        aspect_range=config.FILTER_ASPECT_RANGE,
+        brightness_range=config.FILTER_BRIGHTNESS_RANGE,
+        color=config.FILTER_COLOR,
+        color_distance=config.FILTER_COLOR_DISTANCE,
+    )
+
+
+def get_filter(target_size: Optional[Tuple[int, int]] = None) -> PhotoFilter:
+    """Get the shared filter, creating it from config on first use"""
+    global _default_filter
+    if _default_filter is None:
+        with _default_lock:
+            if _default_filter is None:
+                _default_filter = from_config(target_size)
+    return _default_filter
+
+
+def log_filter_stats(log: Optional[logging.Logger] = None) -> None:
+    """Log how many candidates the filter rejected and the bandwidth that saved"""
+    stats = get_filter().stats()
+    reasons = ", ".join(f"{count} {reason}" for reason, count in sorted(stats['reasons'].items()))
+    (log or logger).info(
+        f"Pre-download filter: {stats['rejected']} of {stats['checked']} photo(s) rejected"
+        f"{f' ({reasons})' if reasons else ''}, ~{stats['bytes_saved'] / (1024 * 1024):.1f} MB not downloaded"
+    )
@@ -0,0 +1,426 @@
+"""
+Module for prefetching wallpapers in the background.
+
+A worker thread keeps the next few wallpapers downloaded and validated in
+the image cache, so an update only has to pop a ready file and set it.
+Wallpapers come from a composite provider: Unsplash, any extra configured
+sources and, as a fallback, images already in the cache.
+"""
+import logging
+import os
+import queue
+import threading
+import uuid
+from typing import Dict, Optional
+
+from . import (catalog, config, image_cache, luminance, perceptual_hash, photo_filter, seen_filter, sharpness,
+               unsplash_api, wallpaper)
+
+try:
+    from wallpaper_changer import downloader, integrity, providers
+except ImportError:
+    from src.wallpaper_changer import downloader, integrity, providers
+
+logger = logging.getLogger(__name__)
+
+# Delay after a failed prefetch, doubled on every consecutive failure
+RETRY_DELAY = 5
+MAX_RETRY_DELAY = 300
+
+# Near-duplicate or blurry candidates skipped in a row before giving up on a fetch
+MAX_DUPLICATES = 5
+
+# Cached photos measured at a time while the prefetcher waits for room
+MEASURE_BATCH = 5
+
+# Photo record whose image is being downloaded, for placeholders
+_downloading = None
+_downloading_lock = threading.Lock()
+
+
+class InvalidDownload(Exception):
+    """A downloaded file was not a complete, valid image"""
+
+
+def download_image(url: str, file_path: str) -> Optional[str]:
+    """
+    Download an image to file_path, resuming interrupted transfers.
+
+    Downloads that are not a complete image are quarantined.
+
+    Args:
+        url (str): URL of the image
+        file_path (str): Final location of the image
+
+    Returns:
+        str: Hex SHA-256 of the image, or None if the download failed
+
+    Raises:
+        InvalidDownload: The server sent something that is not a complete image
+    """
+    rejected = []
+
+    def reject(path):
+        rejected.append(path)
+        quarantine(path)
+
+    digest = downloader.download_verified(url, file_path, validator=is_valid_image, on_invalid=reject)
+    if digest is None and rejected:
+        raise InvalidDownload(url)
+    return digest
+
+
+def is_valid_image(file_path: str) -> bool:
+    """Check that a file is a complete image that decodes, when Pillow is available."""
+    return integrity.is_valid_image(file_path)
+
+
+def quarantine(file_path: str) -> None:
+    """Move an invalid image to config.QUARANTINE_DIR"""
+    integrity.quarantine(file_path, config.QUARANTINE_DIR)
+
+
+def _cached_image(cache, photo_id: str) -> Optional[str]:
+    """Look up the cached image of a photo, quarantining it if it is damaged"""
+    file_path = cache.get(photo_id)
+    if file_path is None:
+        return None
+    # The cheap structural check; the file was fully decoded when it was downloaded
+    reason = integrity.validate_image(file_path, decode=False)
+    if reason is None:
+        return file_path
+    integrity.quarantine(file_path, config.QUARANTINE_DIR, reason)
+    return None
+
+
+def downloading_photo() -> Optional[Dict]:
+    """Get the API record of the photo whose image is being downloaded, if any"""
+    with _downloading_lock:
+        return _downloading
+
+
+def _previewable(photo: Dict) -> bool:
+    """Check that a photo passes the checks made before downloading, so a placeholder may show it"""
+    if photo_filter.get_filter().check(photo) is not None:
+        return False
+    # Shown photos are only served again when a whole batch was seen
+    return not photo.get('id') or photo['id'] not in seen_filter.get_seen_filter()
+
+
+def _set_downloading(photo: Optional[Dict]) -> None:
+    global _downloading
+    with _downloading_lock:
+        _downloading = photo
+
+
+def fetch_wallpaper_file(category=None, search_term=None, cache=None, remember=True) -> Optional[Dict]:
+    """
+    Get the next wallpaper as a local file, downloading it only on a cache miss.
+
+    Photos that look like a recent or saved wallpaper, blurry or featureless
+    photos, and photos whose download is not a valid image are skipped.
+
+    Args:
+        category (str, optional): Category to fetch
+        search_term (str, optional): Search term, takes priority over category
+        cache (ImageCache, optional): Cache to use, defaults to the shared cache
+        remember (bool): Add the photo to the recent wallpapers of the duplicate
+            detector; without it, call remember_wallpaper() once the photo is used
+
+    Returns:
+        dict: Dictionary with file_path, source_url, headers, cache_key and photo_id, or None
+    """
+    cache = cache or image_cache.get_cache()
+    detector = perceptual_hash.get_detector()
+    for _ in range(MAX_DUPLICATES + 1):
+        try:
+            item = _fetch_photo_file(category, search_term, cache)
+        except InvalidDownload as e:
+            logger.warning(f"Skipping damaged download of {e}")
+            continue
+        if item is None:
+            return None
+        scores = sharpness.photo_scores(item['photo_id'], item['file_path'])
+        if not sharpness.is_acceptable(scores):
+            logger.info(f"Skipping blurry or low-detail wallpaper {item['cache_key']} "
+                        f"(sharpness {scores[0]:.1f}, edge density {scores[1]:.4f})")
+            continue
+        if detector is None or detector.check(item['file_path'], item['photo_id'] or item['cache_key'],
+                                              remember=remember) is None:
+            return item
+    logger.warning(f"Skipped {MAX_DUPLICATES + 1} near-duplicate, blurry or damaged wallpapers in a row.")
+    return None
+
+
+def remember_wallpaper(item: Dict) -> None:
+    """Add a photo from fetch_wallpaper_file(remember=False) to the recent wallpapers"""
+    detector = perceptual_hash.get_detector()
+    if detector is not None:
+        detector.remember(item['file_path'], item.get('photo_id') or item.get('cache_key'))
+
+
+def _fetch_photo_file(category, search_term, cache) -> Optional[Dict]:
+    """Get the next photo from the API as a local file"""
+    photo, headers = unsplash_api.next_photo(category, search_term)
+    if not photo:
+        return None
+    image_url = unsplash_api.photo_image_url(photo)
+    photo_id = photo.get('id')
+
+    file_path = _cached_image(cache, photo_id) if photo_id else None
+    if file_path:
+        logger.debug(f"Serving cached image for photo {photo_id}")
+    else:
+        download_path = cache.path_for(photo_id or f"download-{uuid.uuid4().hex}")
+        _set_downloading(photo if _previewable(photo) else None)
+        try:
+            digest = download_image(image_url, download_path)
+            if not digest:
+                return None
+        finally:
+            _set_downloading(None)
+        # Photos without an id are keyed by the hash computed while downloading
+        file_path = cache.put(photo_id or image_cache.digest_key(digest), download_path)
+        if photo_id:
+            photo_catalog = catalog.get_catalog()
+            photo_catalog.set_cache_path(photo_id, file_path)
+            luminance.measure_photo(photo_id, file_path, photo_catalog)
+
+    cache_key = os.path.splitext(os.path.basename(file_path))[0]
+    return {'file_path': file_path, 'source_url': image_url, 'headers': headers, 'cache_key': cache_key,
+            'photo_id': photo_id}
+
+
+class UnsplashProvider(providers.Provider):
+    """Unsplash photos, served from the batch queue and the image cache"""
+
+    name = "unsplash"
+
+    def __init__(self, cache=None):
+        self.cache = cache
+
+    def available(self) -> bool:
+        return not unsplash_api.is_exhausted()
+
+    def fetch(self, category=None, search_term=None) -> Optional[Dict]:
+        # A composite may drop the result, so it is only remembered once used
+        item = fetch_wallpaper_file(category, search_term, self.cache, remember=False)
+        if item is not None:
+            item['provider'] = self.name
+        return item
+
+    def accept(self, result: Dict) -> None:
+        remember_wallpaper(result)
+
+
+class CatalogProvider(providers.Provider):
+    """
+    Cached photos of the category that were shown least recently.
+
+    Photos scored as blurry are skipped. With a theme set, photos matching it
+    are picked first.
+    """
+
+    name = "catalog"
+
+    def __init__(self, photo_catalog=None):
+        self._catalog = photo_catalog
+
+    def fetch(self, category=None, search_term=None) -> Optional[Dict]:
+        photo_catalog = self._catalog or catalog.get_catalog()
+        query = search_term or category
+        luminance_range = luminance.theme_range(query)
+        quality = {'min_sharpness': config.MIN_SHARPNESS, 'min_edge_density': config.MIN_EDGE_DENSITY}
+        # Photos found missing are never picked twice, even if the catalog cannot be updated
+        tried = set()
+        while True:
+            entry = None
+            if luminance_range is not None:
+                entry = photo_catalog.select(query, luminance_range=luminance_range,
+                                             min_contrast=config.THEME_MIN_CONTRAST, exclude=tried, **quality)
+            if entry is None:
+                entry = photo_catalog.select(query, exclude=tried, **quality)
+            if entry is None:
+                return None
+            file_path = entry['cache_path']
+            if os.path.isfile(file_path):
+                cache_key = os.path.splitext(os.path.basename(file_path))[0]
+                return self._result(file_path, entry['image_url'], cache_key=cache_key, photo_id=entry['id'])
+            # Evicted from the image cache since it was cataloged
+            tried.add(entry['id'])
+            photo_catalog.set_cache_path(entry['id'], None)
+
+
+def measure_cached_photos(category=None, search_term=None, photo_catalog=None, limit: int = MEASURE_BATCH) -> int:
+    """
+    Measure a batch of photos that were cached before they could be measured.
+
+    New downloads are measured as they arrive; this catches up on older
+    cache entries so CatalogProvider can rank them and match them to the theme.
+
+    Returns:
+        int: Number of photos measured, 0 once the cache is caught up
+    """
+    photo_catalog = photo_catalog or catalog.get_catalog()
+    measured = sharpness.measure_cached(photo_catalog, limit)
+    if luminance.theme_range(search_term or category) is not None:
+        measured += luminance.measure_cached(photo_catalog, limit)
+    return measured
+
+
+def default_provider(cache=None) -> providers.CompositeProvider:
+    """
+    Build the provider used for scheduled updates.
+
+    Args:
+        cache (ImageCache, optional): Cache to use, defaults to the shared cache
+
+    Returns:
+        CompositeProvider: Unsplash first, then config.EXTRA_SOURCES, then the
+            catalog and the rest of the offline cache when config.OFFLINE_FALLBACK is set
+    """
+    cache = cache or image_cache.get_cache()
+    sources = [UnsplashProvider(cache)]
+    for source in config.EXTRA_SOURCES:
+        provider = providers.provider_for_source(source, cache.cache_dir, validator=is_valid_image)
+        if provider is not None:
+            sources.append(provider)
+    if config.OFFLINE_FALLBACK:
+        sources.extend([CatalogProvider(), providers.CacheProvider(cache)])
+    return providers.CompositeProvider(sources, timeout=config.SOURCE_TIMEOUT)
+
+
+class WallpaperPrefetcher:
+    """Keeps the next wallpapers for a category or search term ready on disk"""
+
+    def __init__(self, category=None, search_term=None, depth=None, cache=None, provider=None):
+        self.category = category
+        self.search_term = search_term
+        self.depth = max(1, depth or config.PREFETCH_DEPTH)
+        self.cache = cache or image_cache.get_cache()
+        self.provider = provider or default_provider(self.cache)
+        self._ready = queue.Queue(maxsize=self.depth)
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._current = None
+
+    def matches(self, category=None, search_term=None) -> bool:
+        """Check if this prefetcher serves the given category or search term"""
+        if search_term:
+            return search_term == self.search_term
+        return category is None or (category == self.category and not self.search_term)
+
+    def start(self) -> None:
+        """Start the background worker if it is not already running"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="wallpaper-prefetch", daemon=True)
+            self._thread.start()
+            logger.debug(f"Prefetcher started (depth={self.depth})")
+
+    def stop(self) -> None:
+        """Stop the worker and release wallpapers that were never shown"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        while True:
+            try:
+                self._discard(self._ready.get_nowait())
+            except queue.Empty:
+                break
+        if isinstance(self.provider, providers.CompositeProvider):
+            self.provider.log_stats(logger)
+        self.provider.close()
+
+    def ready_count(self) -> int:
+        """Get the number of wallpapers ready to be shown"""
+        return self._ready.qsize()
+
+    def take(self, timeout: Optional[float] = None) -> Optional[Dict]:
+        """
+        Pop the next ready wallpaper.
+
+        With config.BLUR_PLACEHOLDER set, the blur hash of the photo being
+        downloaded is shown as the wallpaper while waiting for it. If nothing
+        is ready in time, the wallpaper shown before is set again.
+
+        Args:
+            timeout (float, optional): Seconds to wait for the worker when nothing
+                is ready. Defaults to config.PREFETCH_WAIT.
+
+        Returns:
+            dict: Dictionary with file_path, source_url, headers and cache_key, or None
+        """
+        self.start()
+        wait = config.PREFETCH_WAIT if timeout is None else timeout
+        placeholder = False
+        if config.BLUR_PLACEHOLDER and wait > 0 and self._ready.empty():
+            placeholder = wallpaper.set_placeholder(downloading_photo())
+        try:
+            item = self._ready.get(timeout=wait) if wait > 0 else self._ready.get_nowait()
+        except queue.Empty:
+            logger.warning("No prefetched wallpaper ready.")
+            if placeholder:
+                self._restore_current()
+            return None
+
+        # The previously shown wallpaper may now be evicted from the cache
+        if self._current is not None:
+            self._discard(self._current)
+        self._current = item
+        return item
+
+    def _restore_current(self) -> None:
+        """Set the last wallpaper taken again, replacing a placeholder"""
+        if self._current is not None and os.path.isfile(self._current['file_path']):
+            wallpaper.set_wallpaper(self._current['file_path'])
+
+    def _run(self) -> None:
+        """Worker loop: fetch, download and queue wallpapers until stopped"""
+        delay = RETRY_DELAY
+        while not self._stop_event.is_set():
+            item = self._prefetch_one()
+            if item is None:
+                self._stop_event.wait(delay)
+                delay = min(delay * 2, MAX_RETRY_DELAY)
+                continue
+            delay = RETRY_DELAY
+
+            # Block until there is room for the new wallpaper, measuring the cache meanwhile
+            measuring = True
+            while not self._stop_event.is_set():
+                try:
+                    self._ready.put(item, timeout=0.5)
+                    break
+                except queue.Full:
+                    if measuring:
+                        measuring = self._measure_cached() > 0
+            else:
+                self._discard(item)
+
+    def _measure_cached(self) -> int:
+        """Measure a batch of cached photos, outside of any provider deadline"""
+        try:
+            return measure_cached_photos(self.category, self.search_term)
+        except Exception as e:
+            logger.debug(f"Could not measure cached photos: {e}")
+            return 0
+
+    def _prefetch_one(self) -> Optional[Dict]:
+        """Fetch a single wallpaper from the provider and pin it in the cache"""
+        item = self.provider.fetch(self.category, self.search_term)
+        if item is None:
+            return None
+        if item.get('cache_key'):
+            self.cache.pin(item['cache_key'])
+        logger.debug(f"Prefetched wallpaper from {item.get('provider', 'unknown source')} to {item['file_path']}")
+        return item
+
+    def _discard(self, item: Dict) -> None:
+        """Release a prefetched wallpaper so the cache may evict it"""
+        if item.get('cache_key'):
+            self.cache.unpin(item['cache_key'])
@@ -0,0 +1,190 @@
+"""
+Module for remembering which photos have been shown.
+
+A Bloom filter of shown photo ids lives in a small memory-mapped file, so
+the fetch path can drop photos it has shown before, even across restarts,
+with a few hash lookups and without a database query. The filter never
+forgets an id; in exchange a configurable fraction of new ids is wrongly
+reported as seen.
+"""
+import hashlib
+import logging
+import math
+import mmap
+import os
+import struct
+import threading
+from typing import Iterable, Optional
+
+from . import catalog, config
+
+logger = logging.getLogger(__name__)
+
+SEEN_FILTER_ENV = "WALLPAPER_SEEN_FILE"
+
+# Magic, format version, number of bits, number of hash functions, ids added
+_HEADER = struct.Struct("<4sIQIQ")
+_MAGIC = b"WCBF"
+_VERSION = 1
+
+_default_seen_filter = None
+_default_lock = threading.Lock()
+
+
+def filter_size(capacity: int, false_positive_rate: float):
+    """
+    Get the optimal Bloom filter parameters.
+
+    Args:
+        capacity (int): Number of ids the filter is sized for
+        false_positive_rate (float): Wanted false positive rate at capacity
+
+    Returns:
+        tuple: (number of bits, number of hash functions)
+    """
+    capacity = max(1, capacity)
+    num_bits = math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2)
+    num_bits = (num_bits + 7) // 8 * 8
+    num_hashes = max(1, round(num_bits / capacity * math.log(2)))
+    return num_bits, num_hashes
+
+
+class SeenFilter:
+    """Bloom filter of photo ids, memory-mapped from a file when a path is given"""
+
+    def __init__(self, path: Optional[str] = None, capacity: int = 100_000,
+                 false_positive_rate: float = 0.001):
+        """
+        Args:
+            path (str, optional): File the filter is kept in; in memory only when None
+            capacity (int): Number of ids the filter is sized for
+            false_positive_rate (float): Wanted false positive rate at capacity
+        """
+        self.path = path
+        self.capacity = capacity
+        self.num_bits, self.num_hashes = filter_size(capacity, false_positive_rate)
+        self._lock = threading.Lock()
+        self._file = None
+        self._bits = None
+        self.count = 0
+        self.created = False
+        if path:
+            try:
+                self._open(path)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not open seen filter {path}: {e}. Using an in-memory filter.")
+                self._close_file()
+        if self._bits is None:
+            self._bits = bytearray(_HEADER.size + self.num_bits // 8)
+            self._write_header()
+            self.created = True
+
+    def _open(self, path: str) -> None:
+        size = _HEADER.size + self.num_bits // 8
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'r+b' if os.path.exists(path) else 'w+b')
+        header = self._file.read(_HEADER.size)
+        if len(header) == _HEADER.size:
+            magic, version, num_bits, num_hashes, count = _HEADER.unpack(header)
+            if (magic, version, num_bits, num_hashes) == (_MAGIC, _VERSION, self.num_bits, self.num_hashes):
+                self._bits = mmap.mmap(self._file.fileno(), size)
+                self.count = count
+                return
+            logger.info(f"Seen filter {path} was sized differently, starting a new one")
+
+        # New file, or the capacity or false positive rate changed: drop the old bits
+        self._file.seek(0)
+        self._file.truncate(0)
+        self._file.truncate(size)
+        self._bits = mmap.mmap(self._file.fileno(), size)
+        self._write_header()
+        self.created = True
+
+    def _write_header(self) -> None:
+        self._bits[:_HEADER.size] = _HEADER.pack(_MAGIC, _VERSION, self.num_bits, self.num_hashes, self.count)
+
+    def _positions(self, photo_id: str):
+        """Bit positions of an id, by double hashing one digest"""
+        digest = hashlib.blake2b(str(photo_id).encode('utf-8'), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, photo_id: str) -> None:
+        """Remember an id"""
+        with self._lock:
+            added = False
+            for position in self._positions(photo_id):
+                offset = _HEADER.size + position // 8
+                mask = 1 << (position % 8)
+                if not self._bits[offset] & mask:
+                    self._bits[offset] |= mask
+                    added = True
+            if added:
+                self.count += 1
+                self._write_header()
+                if self.count == self.capacity + 1:
+                    logger.warning(f"Seen filter holds more than {self.capacity} ids; "
+                                   "its false positive rate is rising. Increase SEEN_FILTER_CAPACITY.")
+
+    def add_many(self, photo_ids: Iterable[str]) -> None:
+        """Remember several ids"""
+        for photo_id in photo_ids:
+            self.add(photo_id)
+
+    def __contains__(self, photo_id: str) -> bool:
+        with self._lock:
+            return all(self._bits[_HEADER.size + position // 8] & (1 << (position % 8))
+                       for position in self._positions(photo_id))
+
+    def flush(self) -> None:
+        """Write the filter to its file"""
+        with self._lock:
+            if isinstance(self._bits, mmap.mmap):
+                self._bits.flush()
+
+    def _close_file(self) -> None:
+        if isinstance(self._bits, mmap.mmap):
+            self._bits.close()
+            self._bits = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def close(self) -> None:
+        """Flush and close the file"""
+        self.flush()
+        with self._lock:
+            self._close_file()
+
+
+def default_seen_filter_path() -> str:
+    """Get the seen filter file used by default"""
+    return os.environ.get(SEEN_FILTER_ENV) or config.SEEN_FILTER_PATH
+
+
+def get_seen_filter() -> SeenFilter:
+    """
+    Get the shared seen filter, opening it on first use.
+
+    A new filter is filled with the photos the catalog has shown.
+    """
+    global _default_seen_filter
+    if _default_seen_filter is None:
+        with _default_lock:
+            if _default_seen_filter is None:
+                seen = SeenFilter(default_seen_filter_path(), config.SEEN_FILTER_CAPACITY,
+                                  config.SEEN_FILTER_FALSE_POSITIVE_RATE)
+                if seen.created:
+                    seen.add_many(entry['id'] for entry in catalog.get_catalog().history(limit=seen.capacity))
+                _default_seen_filter = seen
+    return _default_seen_filter
+
+
+def close_seen_filter() -> None:
+    """Close the shared seen filter"""
+    global _default_seen_filter
+    with _default_lock:
+        if _default_seen_filter is not None:
+            _default_seen_filter.close()
+            _default_seen_filter = None
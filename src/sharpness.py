@@ -0,0 +1,113 @@
+"""
+Module for scoring the sharpness and detail of wallpapers.
+
+Soft-focus and nearly featureless photos look bad stretched over a desktop.
+Two cheap scores are computed on a grayscale copy scaled to MEASURE_SIDE
+pixels, which libjpeg decodes in draft mode in a few tens of milliseconds:
+the variance of the Laplacian, which is low when the image has no crisp
+edges, and the edge density, the share of pixels with a strong gradient,
+which is low for images with little detail. Scores are stored in the
+catalog, so a photo is never decoded twice to be judged or ranked.
+"""
+import logging
+from typing import Optional, Tuple
+
+from . import catalog, config
+
+try:
+    from wallpaper_changer import image_loader
+except ImportError:
+    from src.wallpaper_changer import image_loader
+
+logger = logging.getLogger(__name__)
+
+# Longest side of the grayscale copy scores are measured on; scores depend on the scale
+MEASURE_SIDE = 512
+# Gradient magnitude, on the 0-255 scale, a pixel needs to count as an edge
+EDGE_GRADIENT = 24
+
+
+def measure(file_path: str) -> Optional[Tuple[float, float]]:
+    """
+    Score an image.
+
+    Returns:
+        tuple: (variance of the Laplacian, share 0-1 of edge pixels), or None
+               if the image could not be read
+    """
+    import numpy as np
+
+    img = image_loader.load_image(file_path, (MEASURE_SIDE, MEASURE_SIDE), mode="L")
+    if img is None:
+        return None
+    try:
+        # Scores are only comparable between images measured at the same scale
+        img.thumbnail((MEASURE_SIDE, MEASURE_SIDE))
+        pixels = np.asarray(img, dtype=np.float32)
+        if min(pixels.shape) < 3:
+            return 0.0, 0.0
+        laplacian = (pixels[:-2, 1:-1] + pixels[2:, 1:-1] + pixels[1:-1, :-2] + pixels[1:-1, 2:]
+                     - 4 * pixels[1:-1, 1:-1])
+        gradient_x = pixels[1:-1, 2:] - pixels[1:-1, :-2]
+        gradient_y = pixels[2:, 1:-1] - pixels[:-2, 1:-1]
+        # Central differences span two pixels, twice the per-pixel gradient
+        edges = np.hypot(gradient_x, gradient_y) > 2 * EDGE_GRADIENT
+        return float(laplacian.var()), float(edges.mean())
+    except Exception as e:
+        logger.error(f"Error measuring the sharpness of {file_path}: {e}")
+        return None
+
+
+def is_acceptable(scores: Optional[Tuple[float, float]]) -> bool:
+    """
+    Check scores against config.MIN_SHARPNESS and config.MIN_EDGE_DENSITY.
+
+    Unknown scores are accepted; a threshold of None is not checked.
+    """
+    if scores is None:
+        return True
+    sharpness, edge_density = scores
+    if config.MIN_SHARPNESS is not None and sharpness < config.MIN_SHARPNESS:
+        return False
+    if config.MIN_EDGE_DENSITY is not None and edge_density < config.MIN_EDGE_DENSITY:
+        return False
+    return True
+
+
+def measure_photo(photo_id: str, file_path: str, photo_catalog) -> Optional[Tuple[float, float]]:
+    """Score the cached image of a photo and record the result in the catalog"""
+    scores = measure(file_path)
+    if scores is not None:
+        photo_catalog.set_sharpness(photo_id, *scores)
+    return scores
+
+
+def photo_scores(photo_id: Optional[str], file_path: str, photo_catalog=None) -> Optional[Tuple[float, float]]:
+    """
+    Get the scores of an image, from the catalog when the photo was scored before.
+
+    Images without a photo id are measured every time.
+
+    Args:
+        photo_catalog (PhotoCatalog, optional): Catalog to use, the shared one by default
+    """
+    if not photo_id:
+        return measure(file_path)
+    photo_catalog = photo_catalog or catalog.get_catalog()
+    entry = photo_catalog.get(photo_id)
+    if entry and entry.get('sharpness') is not None:
+        return entry['sharpness'], entry['edge_density']
+    return measure_photo(photo_id, file_path, photo_catalog)
+
+
+def measure_cached(photo_catalog, limit: int = 50) -> int:
+    """
+    Score cached photos that have not been scored yet.
+
+    Returns:
+        int: Number of photos scored
+    """
+    measured = catalog.measure_cached(photo_catalog, measure_photo, "sharpness", limit)
+    if measured:
+        logger.debug(f"Scored the sharpness of {measured} cached photo(s)")
+    return measured
@@ -2,18 +2,26 @@
 Module for interacting with the Unsplash API.
 """
 import logging
+import math
 import os
 import random
+import threading
 import time
 import urllib.parse
-from typing import Dict, List, Optional, Tuple
-
-import requests
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
 
 # Import categories directly from our module
 # To prevent circular imports, include categories list directly
+from src import catalog, config, luminance, photo_filter, seen_filter
 from src.categories import CATEGORIES
 
+# Shared pooled HTTP session, API quota, failure handling and screen detection
+try:
+    from wallpaper_changer import circuit_breaker, display, http_client, key_pool
+except ImportError:
+    from src.wallpaper_changer import circuit_breaker, display, http_client, key_pool
+
 logger = logging.getLogger(__name__)
 
 # Try to load environment variables from .env file
@@ -24,15 +32,33 @@ try:
 except ImportError:
     logger.debug("dotenv package not available, skipping .env loading")
 
-# API configuration - Check for the API key in environment variables
-UNSPLASH_ACCESS_KEY = os.environ.get("UNSPLASH_ACCESS_KEY", "")
-if not UNSPLASH_ACCESS_KEY:
+# API configuration - Check for API keys in environment variables
+# (UNSPLASH_ACCESS_KEYS for a pool of keys, UNSPLASH_ACCESS_KEY for a single one)
+UNSPLASH_ACCESS_KEYS = key_pool.load_keys()
+if not UNSPLASH_ACCESS_KEYS:
     logger.warning("No Unsplash API key found. Using demo mode.")
 
-# Use demo mode if explicitly requested or no key provided
-DEMO_MODE = os.environ.get("USE_DEMO_MODE", "").lower() in ("true", "1", "yes", "y") or not UNSPLASH_ACCESS_KEY
+# Use demo mode if explicitly requested, no key is provided or every key is rejected.
+# Transient failures only serve demo images while the circuit breaker is open.
+DEMO_MODE = os.environ.get("USE_DEMO_MODE", "").lower() in ("true", "1", "yes", "y") or not UNSPLASH_ACCESS_KEYS
 UNSPLASH_API_URL = "https://api.unsplash.com/photos/random"
 
+# Batched mode: number of photos requested per API call (Unsplash allows up to 30)
+MAX_BATCH_SIZE = 30
+try:
+    BATCH_SIZE = int(os.environ.get("UNSPLASH_BATCH_SIZE", MAX_BATCH_SIZE))
+except ValueError:
+    BATCH_SIZE = MAX_BATCH_SIZE
+BATCH_SIZE = max(1, min(BATCH_SIZE, MAX_BATCH_SIZE))
+
+# Local per-category queues of photo records returned by batched calls
+_photo_queues: Dict[str, Deque[Dict]] = {}
+_queue_headers: Dict[str, Dict] = {}
+_queue_lock = threading.Lock()
+
+# Number of API requests made by this process
+api_calls_made = 0
+
 # Demo images to use when demo mode is enabled
 DEMO_IMAGES = [
     "https://images.unsplash.com/photo-1470770841072-f978cf4d019e",
@@ -46,101 +72,394 @@ DEMO_IMAGES = [
 ]
 
 
+def _base_params() -> Dict[str, str]:
+    """Build the query parameters shared by every random photo request."""
+    return {
+        "featured": "true",
+        "orientation": "landscape",
+    }
+
+
+def _resolve_query(category: Optional[str] = None, search_term: Optional[str] = None) -> str:
+    """Resolve the search query for a category or search term."""
+    if search_term:
+        # If search term is provided, use search query
+        logger.info(f"🔍 Searching for wallpapers with term: {search_term}")
+        return search_term
+    if category and category != "random":
+        logger.info(f"🏷️ Using category: {category}")
+        return category
+    # Choose a random category from the list
+    random_category = random.choice(CATEGORIES)
+    if category:
+        logger.info(f"🎲 Random category selected: {random_category}")
+    else:
+        logger.info(f"🏷️ No category specified. Using random category: {random_category}")
+    return random_category
+
+
+def _batch_query(category: Optional[str] = None, search_term: Optional[str] = None) -> Optional[str]:
+    """
+    Resolve the search query of a batch request.
+
+    A random batch is requested without a query, so its photos vary as much
+    as one random category per wallpaper did, instead of all coming from a
+    single category drawn for the whole batch.
+    """
+    if search_term or (category and category != "random"):
+        return _resolve_query(category, search_term)
+    logger.info("🎲 Random batch, not limited to a category")
+    return None
+
+
+def _request_photos(params: Dict[str, str]):
+    """
+    Send a request to the random photo endpoint.
+
+    The request is made with the pooled key that has the most budget left.
+    A key that is rejected with 401 is dropped and the request is retried
+    with the next one; the 401 response is only returned once no key is left.
+
+    Returns None without sending anything when the circuit breaker is open or
+    every key's quota is spent. The outcome is reported to the breaker.
+    """
+    global api_calls_made
+    breaker = circuit_breaker.get_breaker()
+    if not breaker.allow_request():
+        return None
+    pool = key_pool.get_pool()
+    while True:
+        key = pool.acquire()
+        if key is None:
+            breaker.release()
+            return None
+        headers = {
+            "Accept-Version": "v1",
+            "Authorization": f"Client-ID {key}"
+        }
+        logger.debug(f"Making API request with key {key_pool.fingerprint(key)}...")
+        api_calls_made += 1
+        try:
+            response = http_client.get(UNSPLASH_API_URL, headers=headers, params=params, timeout=10)
+        except Exception:
+            breaker.record_failure()
+            raise
+        pool.observe(response.headers, key)
+        if response.status_code == 401:
+            pool.remove(key)
+            if len(pool):
+                continue
+        if _is_server_failure(response.status_code):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        return response
+
+
+def _is_server_failure(status_code) -> bool:
+    """Check if a status code means the API is down or overloaded, not that the request was wrong."""
+    return isinstance(status_code, int) and (status_code >= 500 or status_code == 429)
+
+
+def _use_demo() -> bool:
+    """Check if demo images should be served instead of calling the API."""
+    return DEMO_MODE or not circuit_breaker.get_breaker().is_available()
+
+
+def get_target_size() -> Optional[Tuple[int, int]]:
+    """Get the configured or detected size wallpapers are shown at."""
+    return display.parse_resolution(config.SCREEN_RESOLUTION) or display.get_screen_size()
+
+
+def sized_image_url(raw_url: str, photo: Dict, target_size: Tuple[int, int]) -> str:
+    """
+    Build a URL for a variant of the raw image that just covers the target size.
+
+    The aspect ratio is kept, so the image can still be fitted locally.
+    Images are never upscaled by the CDN.
+    """
+    target_width, target_height = target_size
+    width, height = photo.get("width"), photo.get("height")
+    if width and height:
+        # Smallest width whose height still covers the screen
+        scale = max(target_width / width, target_height / height)
+        variant_width = min(width, math.ceil(width * scale))
+    else:
+        variant_width = max(target_width, target_height)
+
+    parts = urllib.parse.urlsplit(raw_url)
+    query = dict(urllib.parse.parse_qsl(parts.query))
+    query.update({
+        "w": str(variant_width),
+        "fit": "max",
+        "q": str(config.IMAGE_QUALITY),
+        "fm": config.IMAGE_FORMAT,
+    })
+    return urllib.parse.urlunsplit(parts._replace(query=urllib.parse.urlencode(query)))
+
+
+def _passes_filter(photos: List[Dict]) -> List[Dict]:
+    """Drop photos whose metadata fails the pre-download filter."""
+    target_size = get_target_size()
+    return photo_filter.get_filter(target_size).apply(photos, target_size)
+
+
+def _has_image_url(photo: Dict) -> bool:
+    """Check if a photo record has any image URL."""
+    urls = photo.get("urls") if isinstance(photo, dict) else None
+    return bool(urls and (urls.get("full") or urls.get("regular") or urls.get("raw")))
+
+
+def _select_image_url(photo: Dict) -> Optional[str]:
+    """Pick the image URL to download from a photo record."""
+    urls = photo.get("urls") if isinstance(photo, dict) else None
+    if not urls:
+        return None
+    # Request a variant sized for the screen when we know its resolution
+    target_size = get_target_size()
+    if urls.get("raw") and target_size:
+        return sized_image_url(urls["raw"], photo, target_size)
+    # Otherwise try full resolution first, then fall back to others
+    return urls.get("full") or urls.get("regular") or urls.get("raw")
+
+
+def _demo_wallpaper(category: Optional[str] = None, search_term: Optional[str] = None) -> Tuple[str, Dict]:
+    """Pick a demo image, with dummy rate limit headers."""
+    logger.info("🧪 Using demo mode with local images.")
+    # Return a random demo image
+    image_url = random.choice(DEMO_IMAGES)
+    # Add category info to URL for better tracking
+    if category:
+        image_url += f"?cat={category}"
+    elif search_term:
+        image_url += f"?search={urllib.parse.quote(search_term)}"
+    else:
+        image_url += "?cat=random"
+        
+    # Return dummy headers
+    dummy_headers = {
+        'X-Ratelimit-Limit': '50',
+        'X-Ratelimit-Remaining': '49',
+        'X-Ratelimit-Reset': str(int(time.time()) + 3600)
+    }
+    return image_url, dummy_headers
+
+
 def fetch_wallpaper(category: Optional[str] = None, search_term: Optional[str] = None) -> Tuple[Optional[str], Dict]:
     """Fetch a random wallpaper from Unsplash with optional category or search term."""
     # Declare that we'll use the global DEMO_MODE variable
     global DEMO_MODE
     
-    # Check if we're in demo mode
-    if DEMO_MODE:
-        logger.info("🧪 Using demo mode with local images.")
-        # Return a random demo image
-        image_url = random.choice(DEMO_IMAGES)
-        # Add category info to URL for better tracking
-        if category:
-            image_url += f"?cat={category}"
-        elif search_term:
-            image_url += f"?search={urllib.parse.quote(search_term)}"
-        else:
-            image_url += "?cat=random"
-            
-        # Return dummy headers
-        dummy_headers = {
-            'X-Ratelimit-Limit': '50',
-            'X-Ratelimit-Remaining': '49',
-            'X-Ratelimit-Reset': str(int(time.time()) + 3600)
-        }
-        return image_url, dummy_headers
+    # Check if we're in demo mode or the API is known to be down
+    if _use_demo():
+        return _demo_wallpaper(category, search_term)
     
     # Build parameters for the API request
-    params = {
-        "featured": "true",
-        "orientation": "landscape",
-    }
-    
-    headers = {
-        "Accept-Version": "v1",
-        "Authorization": f"Client-ID {UNSPLASH_ACCESS_KEY}"
-    }
+    params = _base_params()
     
     try:
         # Handle category vs search priority
-        if search_term:
-            # If search term is provided, use search query
-            params["query"] = search_term
-            logger.info(f"🔍 Searching for wallpapers with term: {search_term}")
-        elif category:
-            # If category is provided, use it
-            # Handle "random" category specially
-            if category == "random" or not category:
-                # Choose a random category from the list
-                random_category = random.choice(CATEGORIES)
-                params["query"] = random_category
-                logger.info(f"🎲 Random category selected: {random_category}")
-            else:
-                params["query"] = category
-                logger.info(f"🏷️ Using category: {category}")
-        else:
-            # Default to a random category if nothing specified
-            random_category = random.choice(CATEGORIES)
-            params["query"] = random_category
-            logger.info(f"🏷️ No category specified. Using random category: {random_category}")
+        params["query"] = _resolve_query(category, search_term)
 
         # Make API request
-        logger.debug(f"Making API request with key: {UNSPLASH_ACCESS_KEY[:5] if UNSPLASH_ACCESS_KEY else 'None'}...")
-        response = requests.get(UNSPLASH_API_URL, headers=headers, params=params, timeout=10)
+        response = _request_photos(params)
+        if response is None:
+            # Circuit opened by another caller in the meantime, or quota spent
+            return _demo_wallpaper(category, search_term) if _use_demo() else (None, {})
         
         # Check for successful response
         if response.status_code == 200:
             data = response.json()
             
+            # Keep the metadata of the photo, not just its URL
+            catalog.get_catalog().record(data, params["query"])
+            if not _passes_filter([data]):
+                logger.info("Photo rejected by the pre-download filter")
+                return None, {}
+
             # Get image URL for the appropriate resolution
-            if "urls" in data:
-                # Try full resolution first, then fall back to others
-                image_url = data["urls"].get("full") or data["urls"].get("regular") or data["urls"].get("raw")
-                
-                if image_url:
-                    logger.debug(f"Successfully retrieved image: {image_url[:50]}...")
-                    return image_url, response.headers
+            image_url = _select_image_url(data)
+            if image_url:
+                logger.debug(f"Successfully retrieved image: {image_url[:50]}...")
+                return image_url, response.headers
             
             logger.error("Invalid response format from Unsplash API")
         else:
             logger.error(f"API error: {response.status_code} - {response.text}")
-            # If unauthorized, try again with demo mode
+            # Rejected keys will not start working again, use demo mode for this session
             if response.status_code == 401:
-                logger.warning("API authentication failed. Switching to demo mode.")
-                # Set demo mode for this session
+                logger.warning("API authentication failed for every key. Switching to demo mode.")
                 DEMO_MODE = True
-                # Try again in demo mode
-                return fetch_wallpaper(category, search_term)
+            if _use_demo():
+                return _demo_wallpaper(category, search_term)
         
         return None, {}
         
     except Exception as e:
         logger.error(f"Error fetching wallpaper: {e}")
-        # Fall back to demo mode on error
-        logger.warning("Error occurred. Switching to demo mode.")
-        # Set demo mode for this session
-        DEMO_MODE = True
-        # Try again in demo mode
-        return fetch_wallpaper(category, search_term)
+        # Serve a demo image for now; the circuit breaker decides when to try the API again
+        return _demo_wallpaper(category, search_term)
+
+
+def _queue_key(category: Optional[str] = None, search_term: Optional[str] = None) -> str:
+    """Get the key of the local photo queue for a category or search term."""
+    if search_term:
+        return f"search:{search_term}"
+    return category or "random"
+
+
+def fetch_photo_batch(category: Optional[str] = None, search_term: Optional[str] = None,
+                      count: Optional[int] = None) -> Tuple[List[Dict], Dict]:
+    """
+    Fetch a batch of random photo records with a single API call.
+
+    Args:
+        category (str, optional): Category to search for
+        search_term (str, optional): Search term, takes priority over category
+        count (int, optional): Number of photos to request, capped at MAX_BATCH_SIZE
+
+    Returns:
+        tuple: (list of photo records, response headers)
+    """
+    global DEMO_MODE
+
+    params = _base_params()
+    params["count"] = str(max(1, min(count or BATCH_SIZE, MAX_BATCH_SIZE)))
+
+    try:
+        query = _batch_query(category, search_term)
+        if query:
+            params["query"] = query
+        response = _request_photos(params)
+        if response is None:
+            return [], {}
+
+        if response.status_code == 200:
+            data = response.json()
+            if isinstance(data, dict):
+                data = [data]
+            if isinstance(data, list):
+                photos = [photo for photo in data if _has_image_url(photo)]
+                catalog.get_catalog().record_many(photos, query)
+                photos = _passes_filter(photos)
+                logger.debug(f"Fetched a batch of {len(photos)} photo(s)")
+                return photos, response.headers
+
+            logger.error("Invalid response format from Unsplash API")
+        else:
+            logger.error(f"API error: {response.status_code} - {response.text}")
+            if response.status_code == 401:
+                logger.warning("API authentication failed for every key. Switching to demo mode.")
+                DEMO_MODE = True
+
+        return [], {}
+
+    except Exception as e:
+        # The circuit breaker has recorded the failure and decides when to retry
+        logger.error(f"Error fetching wallpaper batch: {e}")
+        return [], {}
+
+
+def _demo_photo(category: Optional[str] = None, search_term: Optional[str] = None) -> Tuple[Optional[Dict], Dict]:
+    """Build a photo record for a demo image."""
+    image_url, headers = _demo_wallpaper(category, search_term)
+    photo_id = urllib.parse.urlparse(image_url).path.rsplit("/", 1)[-1]
+    raw_url = urllib.parse.urlsplit(image_url)._replace(query="").geturl()
+    return {"id": photo_id, "urls": {"raw": raw_url, "full": image_url}}, headers
+
+
+def _unseen(photos: List[Dict]) -> List[Dict]:
+    """Drop photos that have already been shown, unless that would drop them all."""
+    seen = seen_filter.get_seen_filter()
+    fresh = [photo for photo in photos if not photo.get("id") or photo["id"] not in seen]
+    if len(fresh) < len(photos):
+        logger.debug(f"Skipping {len(photos) - len(fresh)} photo(s) that were already shown")
+    return fresh or photos
+
+
+def mark_shown(photo_id: str) -> None:
+    """Record that a photo was set as the wallpaper, so it is not fetched again."""
+    catalog.get_catalog().mark_shown(photo_id)
+    seen_filter.get_seen_filter().add(photo_id)
+
+
+def next_photo(category: Optional[str] = None, search_term: Optional[str] = None) -> Tuple[Optional[Dict], Dict]:
+    """
+    Get the next photo record, serving it from the local batch queue.
+
+    The queue for the category or search term is refilled with one batched
+    API call when it runs dry, so a single request covers up to
+    MAX_BATCH_SIZE wallpaper changes. With a theme set, the first queued
+    photo whose dominant color matches it is served ahead of the others.
+
+    Returns:
+        tuple: (photo record or None, headers of the API call that filled the queue)
+    """
+    if DEMO_MODE:
+        return _demo_photo(category, search_term)
+
+    key = _queue_key(category, search_term)
+    with _queue_lock:
+        photos = _photo_queues.setdefault(key, deque())
+        # Photos already queued are still served while the API is down
+        if not photos and circuit_breaker.get_breaker().is_available():
+            batch, headers = fetch_photo_batch(category, search_term)
+            photos.extend(_unseen(batch))
+            _queue_headers[key] = headers
+
+        luminance_range = luminance.theme_range(search_term or category)
+        while photos:
+            index = luminance.preferred_index(photos, luminance_range)
+            photo = photos[index]
+            del photos[index]
+            if _has_image_url(photo):
+                logger.debug(f"Serving queued photo ({len(photos)} left for '{key}')")
+                return photo, _queue_headers.get(key, {})
+
+    # The refill may have switched us to demo mode or opened the circuit
+    if _use_demo():
+        return _demo_photo(category, search_term)
+    return None, {}
+
+
+def next_wallpaper(category: Optional[str] = None, search_term: Optional[str] = None) -> Tuple[Optional[str], Dict]:
+    """
+    Get the next wallpaper URL, serving it from the local batch queue.
+
+    Returns:
+        tuple: (image URL or None, headers of the API call that filled the queue)
+    """
+    photo, headers = next_photo(category, search_term)
+    return (_select_image_url(photo) if photo else None), headers
+
+
+def photo_image_url(photo: Dict) -> Optional[str]:
+    """Get the image URL to download for a photo record."""
+    return _select_image_url(photo)
+
+
+def queued_count(category: Optional[str] = None, search_term: Optional[str] = None) -> int:
+    """Get the number of photos waiting in the queue for a category or search term."""
+    with _queue_lock:
+        return len(_photo_queues.get(_queue_key(category, search_term), ()))
+
+
+def queued_total() -> int:
+    """Get the number of photos waiting in all queues."""
+    with _queue_lock:
+        return sum(len(photos) for photos in _photo_queues.values())
+
+
+def is_exhausted() -> bool:
+    """Check if no photo is queued and no API request can be made until the quota resets."""
+    with _queue_lock:
+        if any(_photo_queues.values()):
+            return False
+    return not DEMO_MODE and key_pool.get_pool().exhausted()
+
+
+def clear_photo_queues() -> None:
+    """Drop all queued photo records."""
+    with _queue_lock:
+        _photo_queues.clear()
+        _queue_headers.clear()
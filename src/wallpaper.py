@@ -8,8 +8,17 @@ import logging
 import platform
 import subprocess
 import re
+import json
 from .logger import logger
-from . import config
+from . import catalog, config, perceptual_hash
+
+try:
+    from wallpaper_changer import blurhash, display, monitors, renderer, transcoder
+except ImportError:
+    from src.wallpaper_changer import blurhash, display, monitors, renderer, transcoder
+
+# Saved wallpapers that may be transcoded
+_SAVED_IMAGE = re.compile(r'^wallpaper-\d+\.(jpe?g|png|bmp|webp)$', re.IGNORECASE)
 
 # Try to import the custom logger, fall back to standard logging if it fails
 try:
@@ -38,8 +47,142 @@ except ImportError:
 def set_wallpaper(image_path):
     """
     Set the desktop wallpaper across platforms.
+    
+    When config.MONITOR_LAYOUT describes more than one monitor, every monitor
+    gets the image rendered for its own size (or its part of the image, with
+    config.MONITOR_SPAN).
     """
     abs_path = os.path.abspath(image_path)
+    layout = monitors.get_layout(config.MONITOR_LAYOUT)
+    if len(layout) > 1 and os.path.isfile(abs_path):
+        return set_layout_wallpaper(abs_path, layout)
+    if config.FIT_MODE == "fill" and os.path.isfile(abs_path):
+        abs_path = render_for_screen(abs_path)
+    return _apply_wallpaper(abs_path)
+
+def render_for_screen(abs_path):
+    """
+    Get a copy of an image cropped to fill the screen, so the crop follows
+    config.SMART_CROP rather than the desktop's own centered crop.
+    
+    Returns:
+        str: Absolute path of the rendered copy, or abs_path if the screen size
+             is unknown or the image could not be rendered
+    """
+    screen_size = display.parse_resolution(config.SCREEN_RESOLUTION) or display.get_screen_size()
+    if not screen_size:
+        return abs_path
+    cache = renderer.RenderCache(config.RENDER_DIR, smart_crop=config.SMART_CROP)
+    rendered = cache.render(abs_path, screen_size, "fill")
+    return os.path.abspath(rendered) if rendered else abs_path
+
+def set_layout_wallpaper(image_paths, layout):
+    """
+    Set the wallpaper of every monitor of a layout.
+    
+    Outputs are rendered in parallel worker processes and cached, so after a
+    hotplug only monitors whose size changed are rendered again. All outputs
+    are then applied with one call to the desktop where it supports that.
+    
+    Args:
+        image_paths (str or list): Image for all monitors, or one image per monitor
+        layout (list): Monitors, as returned by monitors.get_layout()
+        
+    Returns:
+        bool: True if the wallpaper was set
+    """
+    cache = renderer.RenderCache(config.RENDER_DIR, max_entries=renderer.MAX_RENDERED * len(layout),
+                                 smart_crop=config.SMART_CROP)
+    outputs = renderer.render_outputs(image_paths, layout, cache, config.FIT_MODE,
+                                      span=config.MONITOR_SPAN, workers=config.RENDER_WORKERS)
+    if outputs is None:
+        logger.warning("Could not render the monitor layout, setting the image as it is")
+        first = image_paths if isinstance(image_paths, str) else image_paths[0]
+        return _apply_wallpaper(os.path.abspath(first))
+    
+    outputs = [(monitor, os.path.abspath(path)) for monitor, path in outputs]
+    system = platform.system()
+    try:
+        if system == 'Linux':
+            desktop = os.environ.get('XDG_CURRENT_DESKTOP', '').lower()
+            if 'kde' in desktop:
+                # One script assigns every screen its image
+                script = (
+                    f"var images = {json.dumps([path for _, path in outputs])};"
+                    "var all = desktops();"
+                    "for (var i = 0; i < all.length; i++) {"
+                    "  var d = all[i];"
+                    "  if (d.screen < 0 || d.screen >= images.length) continue;"
+                    "  d.wallpaperPlugin = 'org.kde.image';"
+                    "  d.currentConfigGroup = ['Wallpaper', 'org.kde.image', 'General'];"
+                    "  d.writeConfig('Image', 'file://' + images[d.screen]);"
+                    "}"
+                )
+                subprocess.run(['qdbus', 'org.kde.plasmashell', '/PlasmaShell',
+                                'org.kde.PlasmaShell.evaluateScript', script], check=True)
+                return True
+            if 'xfce' in desktop:
+                for monitor, path in outputs:
+                    subprocess.run(['xfconf-query', '-c', 'xfce4-desktop', '-p',
+                                    f'/backdrop/screen0/monitor{monitor.name}/workspace0/last-image',
+                                    '--create', '-t', 'string', '-s', path], check=True)
+                return True
+            if 'gnome' not in desktop and 'unity' not in desktop:
+                # feh gives the images to the screens in order
+                subprocess.run(['feh', '--bg-fill'] + [path for _, path in outputs], check=True)
+                return True
+        elif system == 'Darwin':
+            lines = "\n".join(f'set picture of desktop {index} to "{path}"'
+                              for index, (_, path) in enumerate(outputs, start=1))
+            script = f'tell application "System Events"\n{lines}\nend tell'
+            subprocess.run(['osascript', '-e', script], check=True)
+            return True
+        
+        # Windows and GNOME take one image, spanned across all monitors
+        composite = renderer.compose_layout(outputs, cache)
+        if composite is None:
+            return False
+        if system == 'Windows':
+            import winreg
+            with winreg.OpenKey(winreg.HKEY_CURRENT_USER, "Control Panel\\Desktop", 0,
+                                winreg.KEY_SET_VALUE) as key:
+                winreg.SetValueEx(key, "WallpaperStyle", 0, winreg.REG_SZ, "22")  # Span
+                winreg.SetValueEx(key, "TileWallpaper", 0, winreg.REG_SZ, "0")
+        elif system == 'Linux':
+            subprocess.run(['gsettings', 'set', 'org.gnome.desktop.background',
+                            'picture-options', 'spanned'], check=True)
+        return _apply_wallpaper(os.path.abspath(composite))
+    except Exception as e:
+        logger.error(f"Failed to set wallpaper: {str(e)}")
+        return False
+
+def set_placeholder(photo):
+    """
+    Set the blur hash of a photo as a placeholder wallpaper.
+    
+    The placeholder is decoded from the API metadata alone, so it can be
+    shown while the image itself is still downloading.
+    
+    Args:
+        photo (dict): API photo record with a blur_hash
+        
+    Returns:
+        bool: True if the placeholder was set
+    """
+    blur_hash = (photo or {}).get('blur_hash')
+    if not blur_hash:
+        return False
+    screen_size = display.parse_resolution(config.SCREEN_RESOLUTION) or display.get_screen_size() or (1920, 1080)
+    aspect = photo['width'] / photo['height'] if photo.get('width') and photo.get('height') else None
+    placeholder_path = os.path.abspath(os.path.join(config.IMG_DIR, "placeholder.jpg"))
+    os.makedirs(os.path.dirname(placeholder_path), exist_ok=True)
+    if not blurhash.render_placeholder(blur_hash, screen_size, placeholder_path, aspect):
+        return False
+    logger.debug(f"Showing the blur hash of photo {photo.get('id')} while it downloads")
+    return _apply_wallpaper(placeholder_path)
+
+def _apply_wallpaper(abs_path):
+    """Set one image as the wallpaper with the desktop's own API."""
     system = platform.system()
     try:
         if system == 'Windows':
@@ -100,13 +243,16 @@ def set_wallpaper(image_path):
         logger.error(f"Failed to set wallpaper: {str(e)}")
         return False
 
-def save_current_wallpaper(file_path=None, source_url=None):
+def save_current_wallpaper(file_path=None, source_url=None, photo_id=None):
     """
     Save the current wallpaper to the saved directory with sequential naming.
     
+    A photo the catalog knows to be saved already is not copied again.
+    
     Args:
         file_path (str, optional): Path to the file to save. If None, tries to detect current wallpaper.
         source_url (str, optional): Source URL of the wallpaper, for metadata.
+        photo_id (str, optional): Catalog id of the photo, looked up by file path if not given.
         
     Returns:
         str: Path to the saved file if successful, None otherwise.
@@ -124,27 +270,177 @@ def save_current_wallpaper(file_path=None, source_url=None):
         logger.error("No current wallpaper found to save.")
         return None
     
+    photo_catalog = catalog.get_catalog()
+    entry = photo_catalog.get(photo_id) if photo_id else photo_catalog.find_by_path(source_file)
+    if entry and entry['saved_path'] and os.path.isfile(entry['saved_path']):
+        logger.info(f"[✓] Wallpaper already saved as '{os.path.basename(entry['saved_path'])}'")
+        return entry['saved_path']
+    
     # Generate the next available filename for saved wallpapers
     next_filename = get_next_filename(config.SAVED_DIR)
     
     try:
-        # Copy the file
-        shutil.copy2(source_file, next_filename)
+        # Copy or transcode the file, with its metadata
+        next_filename = store_saved_wallpaper(source_file, next_filename, source_url, entry)
         logger.info(f"[✓] Wallpaper saved as '{os.path.basename(next_filename)}'")
-        
-        # Optionally save metadata if source_url is provided
-        if source_url:
-            name_parts = os.path.splitext(next_filename)
-            metadata_path = f"{name_parts[0]}.txt"
-            with open(metadata_path, 'w') as f:
-                f.write(f"Source URL: {source_url}\n")
-                f.write(f"Saved on: {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
+        if entry:
+            photo_catalog.mark_saved(entry['id'], next_filename)
+        detector = perceptual_hash.get_detector()
+        if detector is not None:
+            detector.add_saved(next_filename, entry['id'] if entry else None)
             
         return next_filename
     except Exception as e:
         logger.error(f"Failed to save wallpaper: {str(e)}")
         return None
 
+def saved_max_size():
+    """Get the size saved wallpapers are shrunk to fill, from config.SAVED_MAX_SIZE"""
+    if config.SAVED_MAX_SIZE == "screen":
+        return display.parse_resolution(config.SCREEN_RESOLUTION) or display.get_screen_size()
+    return display.parse_resolution(config.SAVED_MAX_SIZE)
+
+def store_wallpaper(source_file, target, transcode=True):
+    """
+    Write a wallpaper to the saved directory.
+    
+    With config.SAVED_FORMAT set, the image is transcoded and stored with
+    the extension of that format instead of target's. Otherwise, or if
+    transcoding fails, the file is copied unchanged.
+    
+    Args:
+        source_file (str): Wallpaper to store
+        target (str): Path to store it at
+        transcode (bool): False to always copy the file unchanged
+        
+    Returns:
+        tuple: (path the wallpaper was stored at, True if it was transcoded)
+    """
+    fmt = config.SAVED_FORMAT if transcode else None
+    if fmt and fmt not in transcoder.FORMATS:
+        logger.warning(f"Unknown SAVED_FORMAT '{fmt}', saving the original")
+    elif fmt:
+        stored = os.path.splitext(target)[0] + transcoder.extension_for(fmt)
+        if transcoder.transcode(source_file, stored, fmt, config.SAVED_QUALITY, saved_max_size()):
+            return stored, True
+        logger.warning("Could not transcode the wallpaper, saving the original")
+    shutil.copy2(source_file, target)
+    return target, False
+
+def store_saved_wallpaper(source_file, target, source_url=None, entry=None):
+    """
+    Store a wallpaper with store_wallpaper and write its metadata file.
+    
+    Args:
+        source_file (str): Wallpaper to store
+        target (str): Path to store it at
+        source_url (str, optional): Source URL of the wallpaper
+        entry (dict, optional): Catalog entry of the photo, whose image URL is
+            used when source_url is missing
+        
+    Returns:
+        str: Path the wallpaper was stored at
+    """
+    if not source_url and entry:
+        source_url = entry['image_url']
+    
+    # A transcoded copy needs the source URL to get the original back
+    if config.SAVED_FORMAT and not source_url:
+        logger.info("No source URL known for the wallpaper, saving the original")
+    target, transcoded = store_wallpaper(source_file, target, transcode=bool(source_url))
+    
+    if source_url:
+        metadata = {"Source URL": source_url, "Saved on": time.strftime('%Y-%m-%d %H:%M:%S')}
+        if transcoded:
+            metadata["Stored as"] = f"{config.SAVED_FORMAT}, quality {config.SAVED_QUALITY}"
+        write_metadata(target, metadata)
+    return target
+
+def read_metadata(image_path):
+    """
+    Read the metadata file saved next to a wallpaper.
+    
+    Returns:
+        dict: Fields such as "Source URL", empty if there is no metadata file
+    """
+    metadata = {}
+    try:
+        with open(f"{os.path.splitext(image_path)[0]}.txt") as f:
+            for line in f:
+                key, sep, value = line.partition(": ")
+                if sep:
+                    metadata[key.strip()] = value.strip()
+    except OSError:
+        pass
+    return metadata
+
+def write_metadata(image_path, metadata):
+    """Write the metadata file of a wallpaper, one "Key: value" line per field"""
+    with open(f"{os.path.splitext(image_path)[0]}.txt", 'w') as f:
+        for key, value in metadata.items():
+            f.write(f"{key}: {value}\n")
+
+def transcode_saved_library(fmt=None, workers=None):
+    """
+    Transcode the saved wallpapers that are not stored in a format yet.
+    
+    The images are transcoded in worker processes. An original is only
+    replaced when its source URL is known, from its metadata file or the
+    catalog, so it can always be downloaded again.
+    
+    Args:
+        fmt (str, optional): Storage format, defaults to config.SAVED_FORMAT or "webp"
+        workers (int, optional): Worker processes to use, defaults to config.SAVED_WORKERS
+        
+    Returns:
+        dict: Number of wallpapers 'transcoded', 'skipped' for lack of a source
+              URL and 'failed', and the 'bytes_saved'
+    """
+    fmt = fmt or config.SAVED_FORMAT or "webp"
+    counts = {'transcoded': 0, 'skipped': 0, 'failed': 0, 'bytes_saved': 0}
+    if fmt not in transcoder.FORMATS:
+        logger.error(f"Unknown storage format '{fmt}'")
+        return counts
+    if not os.path.isdir(config.SAVED_DIR):
+        return counts
+    extension = transcoder.extension_for(fmt)
+    
+    photo_catalog = catalog.get_catalog()
+    entries = {entry['saved_path']: entry for entry in photo_catalog.saved()}
+    jobs, pending = [], []
+    for name in sorted(os.listdir(config.SAVED_DIR)):
+        if not _SAVED_IMAGE.match(name):
+            continue
+        source = os.path.join(config.SAVED_DIR, name)
+        metadata = read_metadata(source)
+        if metadata.get("Stored as", "").startswith(fmt) or (extension != ".jpg" and name.lower().endswith(extension)):
+            continue
+        entry = entries.get(os.path.abspath(source))
+        source_url = metadata.get("Source URL") or (entry['image_url'] if entry else None)
+        if not source_url:
+            logger.warning(f"Keeping {name} as is, its source URL is unknown")
+            counts['skipped'] += 1
+            continue
+        target = os.path.splitext(source)[0] + extension
+        jobs.append((source, target))
+        pending.append((entry, metadata, source_url, os.path.getsize(source)))
+    
+    results = transcoder.transcode_many(jobs, fmt, config.SAVED_QUALITY, saved_max_size(),
+                                        config.SAVED_WORKERS if workers is None else workers)
+    for (source, target), (entry, metadata, source_url, size), ok in zip(jobs, pending, results):
+        if not ok:
+            counts['failed'] += 1
+            continue
+        if target != source:
+            os.remove(source)
+        metadata.update({"Source URL": source_url, "Stored as": f"{fmt}, quality {config.SAVED_QUALITY}"})
+        write_metadata(target, metadata)
+        if entry:
+            photo_catalog.mark_saved(entry['id'], target)
+        counts['transcoded'] += 1
+        counts['bytes_saved'] += size - os.path.getsize(target)
+    return counts
+
 def get_next_filename(save_dir):
     """
     Generate the next sequential filename for saved wallpapers.
@@ -163,7 +459,7 @@ def get_next_filename(save_dir):
     
     # Find the highest number used in existing wallpaper files
     highest_num = 0
-    pattern = re.compile(r'wallpaper-(\d+)\.jpg')
+    pattern = re.compile(r'wallpaper-(\d+)\.')
     
     for filename in existing_files:
         match = pattern.match(filename)
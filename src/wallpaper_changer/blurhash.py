@@ -0,0 +1,120 @@
+"""
+BlurHash Module
+Decodes BlurHash strings into placeholder images.
+
+A blur hash is a handful of DCT components of a photo, packed into a short
+base-83 string that the Unsplash API returns with every photo. Decoding it
+gives a smooth gradient with the colors of the photo, which can be shown
+as a placeholder while the real image downloads.
+"""
+import logging
+import math
+import os
+from typing import Optional, Tuple
+
+from . import renderer
+
+logger = logging.getLogger(__name__)
+
+_BASE83 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~"
+_BASE83_VALUES = {char: value for value, char in enumerate(_BASE83)}
+
+DECODE_WIDTH = 32          # Width a blur hash is decoded at before it is scaled up
+PLACEHOLDER_QUALITY = 70   # JPEG quality of placeholder images
+
+
+def _decode83(value: str) -> int:
+    result = 0
+    for char in value:
+        try:
+            result = result * 83 + _BASE83_VALUES[char]
+        except KeyError:
+            raise ValueError(f"Invalid blur hash character '{char}'")
+    return result
+
+
+def _srgb_to_linear(value):
+    import numpy as np
+
+    value = np.asarray(value, dtype=np.float64) / 255
+    return np.where(value <= 0.04045, value / 12.92, ((value + 0.055) / 1.055) ** 2.4)
+
+
+def _linear_to_srgb(value):
+    import numpy as np
+
+    value = np.clip(value, 0, 1)
+    srgb = np.where(value <= 0.0031308, value * 12.92, 1.055 * value ** (1 / 2.4) - 0.055)
+    return (srgb * 255 + 0.5).astype(np.uint8)
+
+
+def decode(blur_hash: str, width: int, height: int, punch: float = 1.0):
+    """
+    Decode a blur hash.
+
+    Args:
+        blur_hash (str): The hash
+        width (int): Width of the decoded image
+        height (int): Height of the decoded image
+        punch (float): Contrast boost of the color components
+
+    Returns:
+        numpy.ndarray: (height, width, 3) uint8 RGB pixels
+
+    Raises:
+        ValueError: If the hash is malformed
+    """
+    import numpy as np
+
+    if not blur_hash or len(blur_hash) < 6:
+        raise ValueError("Blur hash is too short")
+    size_flag = _decode83(blur_hash[0])
+    components_y, components_x = size_flag // 9 + 1, size_flag % 9 + 1
+    if len(blur_hash) != 4 + 2 * components_x * components_y:
+        raise ValueError(f"Blur hash length {len(blur_hash)} does not match {components_x}x{components_y} components")
+
+    max_value = (_decode83(blur_hash[1]) + 1) / 166 * punch
+    colors = np.empty((components_x * components_y, 3))
+    dc = _decode83(blur_hash[2:6])
+    colors[0] = _srgb_to_linear([dc >> 16, (dc >> 8) & 255, dc & 255])
+    ac = np.array([_decode83(blur_hash[4 + 2 * index:6 + 2 * index])
+                   for index in range(1, components_x * components_y)], dtype=np.int64)
+    quantized = np.stack([ac // (19 * 19), (ac // 19) % 19, ac % 19], axis=1)
+    normalized = (quantized - 9) / 9
+    colors[1:] = np.sign(normalized) * normalized ** 2 * max_value
+
+    # Component (i, j) is stored at index i + j * components_x
+    colors = colors.reshape(components_y, components_x, 3)
+    basis_x = np.cos(math.pi * np.outer(np.arange(width), np.arange(components_x)) / width)
+    basis_y = np.cos(math.pi * np.outer(np.arange(height), np.arange(components_y)) / height)
+    pixels = np.einsum('yj,xi,jic->yxc', basis_y, basis_x, colors)
+    return _linear_to_srgb(pixels)
+
+
+def render_placeholder(blur_hash: str, screen_size: Tuple[int, int], target: str,
+                       aspect: Optional[float] = None) -> bool:
+    """
+    Write a screen-sized placeholder image for a blur hash.
+
+    Args:
+        blur_hash (str): The hash
+        screen_size (tuple): (width, height) of the placeholder
+        target (str): JPEG file to write
+        aspect (float, optional): Width/height ratio of the photo, the screen's if None
+
+    Returns:
+        bool: True if the placeholder was written
+    """
+    from PIL import Image
+
+    aspect = aspect or screen_size[0] / screen_size[1]
+    try:
+        pixels = decode(blur_hash, DECODE_WIDTH, max(1, round(DECODE_WIDTH / aspect)))
+        img = renderer.render_image(Image.fromarray(pixels), screen_size, "fill")
+        temp_path = f"{target}.tmp"
+        img.save(temp_path, "JPEG", quality=PLACEHOLDER_QUALITY)
+        os.replace(temp_path, target)
+        return True
+    except Exception as e:
+        logger.error(f"Error rendering the blur hash placeholder: {e}")
+        return False
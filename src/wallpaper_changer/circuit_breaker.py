@@ -0,0 +1,120 @@
+"""
+Circuit Breaker Module
+Stops calling the Unsplash API while it is failing and probes it again
+after a jittered, exponentially growing delay.
+
+States:
+    closed     Requests flow normally.
+    open       Requests are refused until the backoff delay has passed.
+    half-open  A single probe request is let through; its outcome closes
+               the circuit again or reopens it with a longer delay.
+"""
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+FAILURE_THRESHOLD = 3      # Consecutive failures that open the circuit
+BASE_DELAY = 10.0          # Seconds the circuit stays open after the first trip
+MAX_DELAY = 900.0          # Upper bound of the backoff delay
+
+_default_breaker = None
+_default_lock = threading.Lock()
+
+
+class CircuitBreaker:
+    """Circuit breaker with jittered exponential backoff and half-open probing"""
+
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, base_delay=BASE_DELAY, max_delay=MAX_DELAY):
+        self.failure_threshold = max(1, failure_threshold)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0         # Consecutive failures while closed
+        self._trips = 0            # Consecutive times the circuit opened
+        self._open_until = 0.0
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        """Get the current state, moving from open to half-open once the delay has passed"""
+        with self._lock:
+            if self._state == OPEN and time.time() >= self._open_until:
+                self._state = HALF_OPEN
+                self._probing = False
+            return self._state
+
+    def is_available(self) -> bool:
+        """Check if a request would currently be let through"""
+        state = self.state
+        return state == CLOSED or (state == HALF_OPEN and not self._probing)
+
+    def allow_request(self) -> bool:
+        """
+        Ask to send a request.
+
+        In the half-open state only one caller gets True; it must report the
+        outcome with record_success(), record_failure() or release().
+        """
+        state = self.state
+        with self._lock:
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._probing:
+                logger.info("Probing the Unsplash API...")
+                self._probing = True
+                return True
+            return False
+
+    def release(self) -> None:
+        """Give back a probe slot that was not used to send a request"""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self) -> None:
+        """Report a request that reached the API; closes the circuit"""
+        with self._lock:
+            if self._state != CLOSED:
+                logger.info("Unsplash API is reachable again. Back to live mode.")
+            self._state = CLOSED
+            self._failures = 0
+            self._trips = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        """Report a failed request; opens the circuit after enough failures"""
+        with self._lock:
+            self._failures += 1
+            if self._state == CLOSED and self._failures < self.failure_threshold:
+                return
+            self._trips += 1
+            delay = min(self.max_delay, self.base_delay * 2 ** (self._trips - 1))
+            # Jitter keeps several instances from probing at the same moment
+            delay = random.uniform(delay / 2, delay)
+            self._state = OPEN
+            self._open_until = time.time() + delay
+            self._probing = False
+            logger.warning(f"Unsplash API unavailable. Using demo images, retrying in {delay:.0f}s.")
+
+    def retry_after(self) -> float:
+        """Get the seconds until a request will be let through again"""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self._open_until - time.time())
+
+
+def get_breaker() -> CircuitBreaker:
+    """Get the shared circuit breaker for the Unsplash API, creating it on first use"""
+    global _default_breaker
+    if _default_breaker is None:
+        with _default_lock:
+            if _default_breaker is None:
+                _default_breaker = CircuitBreaker()
+    return _default_breaker
@@ -13,11 +13,12 @@ class Config:
     
     DEFAULT_CONFIG = {
         "interval": 30,  # minutes
-        "source": "wallpapers",  # local directory
+        "source": "wallpapers",  # local directory, image file, image URL, manifest URL or a list of them
         "random": True,
         "save_downloaded": True,
         "download_folder": "wallpapers",
-        "fit_mode": "fill"  # options: fill, fit, stretch, center, tile
+        "fit_mode": "fill",  # options: fill, fit, stretch, center, tile
+        "smart_crop": True  # in fill mode, crop around the detail of the image instead of its center
     }
     
     def __init__(self, config_file='settings.json'):
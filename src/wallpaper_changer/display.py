@@ -0,0 +1,97 @@
+"""
+Display Module
+Detects the resolution of the screen wallpapers are shown on.
+"""
+import logging
+import platform
+import re
+import subprocess
+from typing import Optional, Tuple
+
+from . import monitors
+
+logger = logging.getLogger(__name__)
+
+_RESOLUTION = re.compile(r'^\s*(\d+)\s*[xX×]\s*(\d+)\s*$')
+
+_detected_size = None
+_detection_done = False
+
+
+def parse_resolution(value) -> Optional[Tuple[int, int]]:
+    """Parse a resolution such as "1920x1080" or (1920, 1080)"""
+    if not value:
+        return None
+    if isinstance(value, (tuple, list)) and len(value) == 2:
+        width, height = int(value[0]), int(value[1])
+    else:
+        match = _RESOLUTION.match(str(value))
+        if not match:
+            logger.warning(f"Invalid screen resolution: {value}")
+            return None
+        width, height = int(match.group(1)), int(match.group(2))
+    if width <= 0 or height <= 0:
+        return None
+    return width, height
+
+
+def _detect_windows() -> Optional[Tuple[int, int]]:
+    import ctypes
+    user32 = ctypes.windll.user32
+    try:
+        # Report physical pixels rather than DPI-scaled ones
+        user32.SetProcessDPIAware()
+    except Exception:
+        pass
+    return user32.GetSystemMetrics(0), user32.GetSystemMetrics(1)
+
+
+def _detect_linux() -> Optional[Tuple[int, int]]:
+    # The "current" size xrandr reports is the virtual screen spanning every monitor
+    primary = monitors.primary_monitor(monitors.detect_monitors())
+    return primary.size if primary else None
+
+
+def _detect_macos() -> Optional[Tuple[int, int]]:
+    output = subprocess.run(['system_profiler', 'SPDisplaysDataType'], capture_output=True,
+                            text=True, timeout=10, check=True).stdout
+    match = re.search(r'Resolution: (\d+) x (\d+)', output)
+    if match:
+        return int(match.group(1)), int(match.group(2))
+    return None
+
+
+def get_screen_size(refresh: bool = False) -> Optional[Tuple[int, int]]:
+    """
+    Detect the resolution of the primary screen.
+
+    The result is cached; pass refresh=True to detect it again.
+
+    Returns:
+        tuple: (width, height) in pixels, or None if it could not be detected
+    """
+    global _detected_size, _detection_done
+    if _detection_done and not refresh:
+        return _detected_size
+
+    detectors = {
+        'Windows': _detect_windows,
+        'Linux': _detect_linux,
+        'Darwin': _detect_macos,
+    }
+    detector = detectors.get(platform.system())
+    _detection_done = True
+    if detector is None:
+        _detected_size = None
+        return None
+
+    try:
+        size = parse_resolution(detector())
+    except Exception as e:
+        logger.debug(f"Could not detect screen resolution: {e}")
+        size = None
+
+    if size:
+        logger.debug(f"Detected screen resolution {size[0]}x{size[1]}")
+    _detected_size = size
+    return size
@@ -0,0 +1,175 @@
+"""
+Downloader Module
+Streams files to disk through a temporary file, resuming interrupted
+transfers with HTTP Range requests and renaming atomically on success.
+The SHA-256 of the file is computed while it is written, so callers that
+need a content hash do not have to read the file a second time.
+"""
+import hashlib
+import logging
+import os
+import re
+import time
+from typing import Callable, Optional
+
+import requests
+
+from . import http_client
+
+logger = logging.getLogger(__name__)
+
+DOWNLOAD_ATTEMPTS = 4      # Attempts per download, resuming after the first
+RETRY_DELAY = 1.0          # Seconds before the first retry, doubled each time
+CHUNK_SIZE = 64 * 1024
+PART_SUFFIX = ".part"
+
+_CONTENT_RANGE = re.compile(r'bytes (\d+)-(\d+)/(\d+|\*)')
+
+
+def _expected_total(response, offset: int) -> Optional[int]:
+    """Get the full size of the file from Content-Range or Content-Length"""
+    if response.status_code == 206:
+        match = _CONTENT_RANGE.match(response.headers.get('Content-Range', ''))
+        if not match or int(match.group(1)) != offset:
+            raise ValueError("Server returned an unexpected range")
+        return int(match.group(3)) if match.group(3) != '*' else None
+
+    length = response.headers.get('Content-Length')
+    if length and str(length).isdigit() and not response.headers.get('Content-Encoding'):
+        return int(length)
+    return None
+
+
+def _hash_file(file_path: str):
+    """Hash the bytes already in a file, to continue hashing after them"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest
+
+
+def download_file(url: str, dest_path: str, validator: Optional[Callable[[str], bool]] = None,
+                  attempts: int = DOWNLOAD_ATTEMPTS) -> bool:
+    """
+    Download url to dest_path atomically.
+
+    See download_verified for the arguments.
+
+    Returns:
+        bool: True if dest_path now holds the complete file
+    """
+    return download_verified(url, dest_path, validator, attempts) is not None
+
+
+def download_verified(url: str, dest_path: str, validator: Optional[Callable[[str], bool]] = None,
+                      attempts: int = DOWNLOAD_ATTEMPTS,
+                      on_invalid: Optional[Callable[[str], None]] = None) -> Optional[str]:
+    """
+    Download url to dest_path atomically and return its SHA-256.
+
+    The body is streamed into dest_path + ".part". When the connection drops,
+    the next attempt asks for the remaining bytes with a Range request.
+    The temporary file is only renamed into place once its size matches the
+    size announced by the server and the optional validator accepts it, so
+    dest_path never holds a partial file.
+
+    Args:
+        url (str): URL to download
+        dest_path (str): Final location of the file
+        validator (callable, optional): Called with the temporary path, returns
+            False to reject the download
+        attempts (int): Maximum number of attempts
+        on_invalid (callable, optional): Called with the temporary path of a file
+            the validator rejected, before it is deleted; may move it elsewhere
+
+    Returns:
+        str: Hex SHA-256 of the file now at dest_path, or None if the download failed
+    """
+    part_path = dest_path + PART_SUFFIX
+    # A leftover partial file may belong to a different version of the resource
+    if os.path.exists(part_path):
+        os.remove(part_path)
+
+    validators = {}
+    digest, hashed = hashlib.sha256(), 0
+    delay = RETRY_DELAY
+    try:
+        for attempt in range(1, attempts + 1):
+            offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            headers = {'Accept-Encoding': 'identity'}
+            if offset:
+                headers['Range'] = f'bytes={offset}-'
+                # Only resume if the resource has not changed since the first attempt
+                if validators:
+                    headers['If-Range'] = validators.get('ETag') or validators.get('Last-Modified')
+
+            try:
+                response = http_client.get(url, stream=True, headers=headers)
+                try:
+                    if response.status_code == 416 and offset:
+                        logger.debug("Range not satisfiable, restarting download")
+                        os.remove(part_path)
+                        continue
+                    if response.status_code not in (200, 206):
+                        logger.error(f"Failed to download image: HTTP {response.status_code}")
+                        if response.status_code < 500:
+                            return None
+                        raise requests.HTTPError(f"HTTP {response.status_code}")
+
+                    if not validators:
+                        validators = {key: response.headers[key] for key in ('ETag', 'Last-Modified')
+                                      if response.headers.get(key)}
+
+                    if response.status_code == 200:
+                        # Server sent the whole file, start over
+                        offset = 0
+                    elif offset:
+                        logger.debug(f"Resuming download at byte {offset}")
+                    total = _expected_total(response, offset)
+
+                    if not offset:
+                        digest, hashed = hashlib.sha256(), 0
+                    elif hashed != offset:
+                        # A write failed midway through a chunk, hash what made it to disk
+                        digest, hashed = _hash_file(part_path), offset
+                    with open(part_path, 'ab' if offset else 'wb') as out_file:
+                        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                            if chunk:
+                                out_file.write(chunk)
+                                digest.update(chunk)
+                                hashed += len(chunk)
+                finally:
+                    response.close()
+
+                size = os.path.getsize(part_path)
+                if total is not None and size != total:
+                    if size > total:
+                        os.remove(part_path)
+                    raise IOError(f"Incomplete download: got {size} of {total} bytes")
+                if size == 0:
+                    raise IOError("Empty download")
+
+                if validator is not None and not validator(part_path):
+                    logger.error(f"Downloaded file failed validation: {url[:50]}...")
+                    if on_invalid is not None:
+                        on_invalid(part_path)
+                    return None
+
+                os.replace(part_path, dest_path)
+                return digest.hexdigest()
+
+            except (requests.RequestException, IOError, ValueError) as e:
+                if isinstance(e, ValueError) and os.path.exists(part_path):
+                    # The partial file cannot be resumed, start over
+                    os.remove(part_path)
+                if attempt == attempts:
+                    logger.error(f"Error downloading {url[:50]}...: {e}")
+                    return None
+                logger.warning(f"Download interrupted ({e}); retrying in {delay:.0f}s")
+                time.sleep(delay)
+                delay *= 2
+        return None
+    finally:
+        if os.path.exists(part_path):
+            os.remove(part_path)
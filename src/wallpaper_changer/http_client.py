@@ -0,0 +1,129 @@
+"""
+HTTP Client Module
+Shared keep-alive HTTP session used by every network path of the app.
+"""
+import logging
+import threading
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+# Connection pool settings
+POOL_CONNECTIONS = 4       # Number of distinct hosts kept in the pool
+POOL_MAXSIZE = 4           # Keep-alive connections kept per host
+POOL_BLOCK = False         # Open extra connections instead of waiting when a host is busy
+
+# Timeouts in seconds: (connect, read)
+DEFAULT_TIMEOUT = (5, 30)
+
+# Retry settings for idempotent requests
+MAX_RETRIES = 3
+BACKOFF_FACTOR = 0.5       # Sleep 0.5s, 1s, 2s between retries
+RETRY_STATUSES = (500, 502, 503, 504)
+
+USER_AGENT = "wallpaper-changer/0.1.0"
+
+_session = None
+_adapter = None
+_lock = threading.Lock()
+
+
+class PooledAdapter(HTTPAdapter):
+    """HTTP adapter that applies a default timeout to every request"""
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, **kwargs):
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        return super().send(request, **kwargs)
+
+    def connection_stats(self) -> Dict[str, int]:
+        """Return request and connection counters summed over all host pools"""
+        stats = {'requests': 0, 'connections': 0}
+        pools = self.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            stats['requests'] += pool.num_requests
+            stats['connections'] += pool.num_connections
+        stats['reused'] = max(0, stats['requests'] - stats['connections'])
+        return stats
+
+
+def create_session() -> requests.Session:
+    """Create a new session with pooling, retries and default timeouts"""
+    retries = Retry(
+        total=MAX_RETRIES,
+        backoff_factor=BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        raise_on_status=False,
+    )
+    adapter = PooledAdapter(
+        pool_connections=POOL_CONNECTIONS,
+        pool_maxsize=POOL_MAXSIZE,
+        pool_block=POOL_BLOCK,
+        max_retries=retries,
+    )
+    session = requests.Session()
+    session.headers['User-Agent'] = USER_AGENT
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+    """Get the shared session, creating it on first use"""
+    global _session, _adapter
+    if _session is None:
+        with _lock:
+            if _session is None:
+                session = create_session()
+                _adapter = session.get_adapter('https://')
+                _session = session
+    return _session
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    """Send a GET request through the shared session"""
+    return get_session().get(url, **kwargs)
+
+
+def connection_stats() -> Dict[str, int]:
+    """
+    Get connection reuse counters for the shared session.
+
+    Returns:
+        dict: 'requests' sent, new 'connections' opened and 'reused' requests
+              that skipped a TCP/TLS handshake
+    """
+    if _adapter is None:
+        return {'requests': 0, 'connections': 0, 'reused': 0}
+    return _adapter.connection_stats()
+
+
+def log_connection_stats(log: Optional[logging.Logger] = None) -> None:
+    """Log the connection reuse counters"""
+    stats = connection_stats()
+    (log or logger).info(
+        f"HTTP connections: {stats['requests']} request(s), "
+        f"{stats['connections']} new connection(s), {stats['reused']} reused"
+    )
+
+
+def close_session() -> None:
+    """Close the shared session and release pooled connections"""
+    global _session, _adapter
+    with _lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+        _adapter = None
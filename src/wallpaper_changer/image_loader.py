@@ -0,0 +1,120 @@
+"""
+Image Loader Module
+Decodes images straight to the size they are needed at.
+
+A full-size Unsplash JPEG decodes to well over 100 MB of pixels. JPEGs are
+instead decoded at 1/2, 1/4 or 1/8 scale by libjpeg (draft mode) and then
+shrunk with a cheap integer box reduction, so the peak memory of any image
+step stays under a fixed cap.
+"""
+import logging
+import math
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Hard cap on the decoded pixels of one image (48 megapixels of grayscale, 16 of RGB)
+MAX_DECODE_BYTES = 48 * 1024 * 1024
+
+# Reductions libjpeg can apply while decoding
+_DRAFT_SCALES = (8, 4, 2, 1)
+
+
+def _bands(mode: str) -> int:
+    from PIL import Image
+    return Image.getmodebands(mode)
+
+
+def _draft_scale(image_size: Tuple[int, int], size: Optional[Tuple[int, int]], bands: int,
+                 max_bytes: int) -> Optional[int]:
+    """
+    Pick the JPEG decode reduction.
+
+    Returns:
+        int: The largest reduction that still covers size within max_bytes, else the
+             smallest one within max_bytes, or None if no reduction fits
+    """
+    width, height = image_size
+    size = size or image_size
+    fitting = [scale for scale in _DRAFT_SCALES
+               if math.ceil(width / scale) * math.ceil(height / scale) * bands <= max_bytes]
+    if not fitting:
+        return None
+    covering = [scale for scale in fitting
+                if math.ceil(width / scale) >= size[0] and math.ceil(height / scale) >= size[1]]
+    return max(covering) if covering else min(fitting)
+
+
+def image_size(file_path: str) -> Optional[Tuple[int, int]]:
+    """Read the size of an image from its header, without decoding it"""
+    try:
+        from PIL import Image
+        with Image.open(file_path) as img:
+            return img.size
+    except Exception as e:
+        logger.debug(f"Could not read image size of {file_path}: {e}")
+        return None
+
+
+def load_image(file_path: str, size: Optional[Tuple[int, int]] = None, mode: Optional[str] = None,
+               max_bytes: int = MAX_DECODE_BYTES):
+    """
+    Decode an image at the smallest scale that still covers size.
+
+    The result is at least size in both dimensions when the source is, and
+    never larger than needed by more than a factor of two. Callers do the
+    final exact resize or crop on the small image.
+
+    Args:
+        file_path (str): Image file
+        size (tuple, optional): Smallest (width, height) needed; full size when None
+        mode (str, optional): Pillow mode to return, such as "L" or "RGB"
+        max_bytes (int): Largest decoded size allowed; JPEGs are decoded smaller to
+            fit, other images over the cap are refused
+
+    Returns:
+        PIL.Image.Image: Loaded image, or None if it cannot be decoded within the cap
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        logger.warning("Pillow is not installed, cannot load images")
+        return None
+
+    try:
+        img = Image.open(file_path)
+    except Exception as e:
+        logger.warning(f"Could not open image {file_path}: {e}")
+        return None
+
+    try:
+        if img.format == "JPEG":
+            # libjpeg can decode to grayscale directly, other conversions happen after
+            draft_mode = mode if mode in ("L", "RGB") else img.mode
+            scale = _draft_scale(img.size, size, _bands(draft_mode), max_bytes)
+            if scale is None:
+                logger.warning(f"Image {file_path} ({img.size[0]}x{img.size[1]}) is too large to decode")
+                img.close()
+                return None
+            if scale > 1:
+                img.draft(draft_mode, (math.ceil(img.size[0] / scale), math.ceil(img.size[1] / scale)))
+        elif img.size[0] * img.size[1] * _bands(img.mode) > max_bytes:
+            logger.warning(f"Image {file_path} ({img.size[0]}x{img.size[1]}) is too large to decode")
+            img.close()
+            return None
+
+        # Loading closes the file of a single-frame image
+        img.load()
+        if img.mode in ("P", "1", "I;16"):
+            img = img.convert(mode or ("RGBA" if "transparency" in img.info else "RGB"))
+        if size:
+            factor = min(img.size[0] // size[0], img.size[1] // size[1])
+            if factor >= 2:
+                img = img.reduce(factor)
+        if mode and img.mode != mode:
+            img = img.convert(mode)
+        return img
+    except Exception as e:
+        logger.warning(f"Could not decode image {file_path}: {e}")
+        img.close()
+        return None
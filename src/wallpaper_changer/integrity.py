@@ -0,0 +1,131 @@
+"""
+Integrity Module
+Checks that an image file is complete and decodable before it is used.
+
+A download that was cut short can still pass the size check when the server
+sent no Content-Length, and a truncated JPEG opens and verifies fine in
+Pillow; libjpeg even decodes it, padding the missing rows with gray. Files
+are checked in order of cost: the end marker of the format, the Pillow
+header and chunk check, and finally a bounded draft decode. Files that fail
+are moved to a quarantine directory instead of being deleted, so they can
+be inspected.
+"""
+import logging
+import os
+import time
+from typing import Optional
+
+from . import image_loader
+
+logger = logging.getLogger(__name__)
+
+JPEG_SOI = b'\xff\xd8'
+JPEG_EOI = b'\xff\xd9'
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+PNG_IEND = b'IEND\xaeB`\x82'
+
+TRAILER_SCAN = 4096        # Bytes at the end of a file searched for the end marker
+DECODE_CHECK_SIZE = (64, 64)  # Size the bounded decode check decodes at
+MAX_QUARANTINED = 20       # Files kept in the quarantine directory, oldest removed first
+
+
+def has_end_marker(file_path: str) -> Optional[bool]:
+    """
+    Check that a JPEG or PNG file ends with the end marker of its format.
+
+    Some encoders pad a few bytes after the marker, so the tail of the file
+    is searched rather than only its last bytes.
+
+    Returns:
+        bool: True if the marker is present, False if it is missing, None for
+              other formats
+    """
+    with open(file_path, 'rb') as f:
+        head = f.read(len(PNG_SIGNATURE))
+        if head.startswith(JPEG_SOI):
+            marker = JPEG_EOI
+        elif head == PNG_SIGNATURE:
+            marker = PNG_IEND
+        else:
+            return None
+        size = f.seek(0, os.SEEK_END)
+        f.seek(max(0, size - TRAILER_SCAN))
+        return marker in f.read()
+
+
+def validate_image(file_path: str, decode: bool = True,
+                   max_bytes: int = image_loader.MAX_DECODE_BYTES) -> Optional[str]:
+    """
+    Check that a file holds a complete image.
+
+    Args:
+        file_path (str): File to check
+        decode (bool): Also decode the image at DECODE_CHECK_SIZE, which catches
+            corrupt scan data; without it only the structure is checked
+        max_bytes (int): Largest decoded size the decode check may use
+
+    Returns:
+        str: Why the file is invalid, or None if it is valid
+    """
+    try:
+        if os.path.getsize(file_path) == 0:
+            return "empty file"
+        if has_end_marker(file_path) is False:
+            return "missing end marker"
+    except OSError as e:
+        return f"unreadable ({e})"
+
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    try:
+        with Image.open(file_path) as img:
+            img.verify()
+    except Exception as e:
+        return f"not a valid image ({e})"
+    if decode and image_loader.load_image(file_path, DECODE_CHECK_SIZE, max_bytes=max_bytes) is None:
+        return "could not be decoded"
+    return None
+
+
+def is_valid_image(file_path: str) -> bool:
+    """Check that a file holds a complete, decodable image, logging why it does not"""
+    reason = validate_image(file_path)
+    if reason is not None:
+        logger.warning(f"Invalid image {file_path}: {reason}")
+    return reason is None
+
+
+def quarantine(file_path: str, directory: str, reason: str = "") -> Optional[str]:
+    """
+    Move an invalid file out of the way.
+
+    Only the MAX_QUARANTINED newest files are kept in directory.
+
+    Args:
+        file_path (str): File to move
+        directory (str): Quarantine directory
+        reason (str): Why the file was rejected, for the log
+
+    Returns:
+        str: New path of the file, or None if it could not be moved
+    """
+    try:
+        os.makedirs(directory, exist_ok=True)
+        target = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.path.basename(file_path)}")
+        os.replace(file_path, target)
+        os.utime(target)
+    except OSError as e:
+        logger.error(f"Could not quarantine {file_path}: {e}")
+        return None
+    logger.warning(f"Quarantined {file_path} as {target}" + (f": {reason}" if reason else ""))
+
+    try:
+        entries = sorted((entry for entry in os.scandir(directory) if entry.is_file()),
+                         key=lambda entry: entry.stat().st_mtime, reverse=True)
+        for entry in entries[MAX_QUARANTINED:]:
+            os.remove(entry.path)
+    except OSError as e:
+        logger.debug(f"Could not trim the quarantine directory: {e}")
+    return target
@@ -0,0 +1,169 @@
+"""
+Key Pool Module
+Spreads Unsplash API requests over several access keys.
+
+Every key has its own rate limiter, fed from the X-Ratelimit-* headers of
+the responses made with it. Requests go to the key with the most budget
+left, and keys the API rejects are dropped from the pool. The pool offers
+the same remaining()/seconds_until_reset() view as a single rate limiter,
+so the scheduler can plan against the combined quota.
+"""
+import hashlib
+import logging
+import os
+import re
+import threading
+from typing import Dict, List, Optional
+
+from . import rate_limiter
+from .rate_limiter import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+KEYS_ENV = "UNSPLASH_ACCESS_KEYS"  # Several keys separated by commas or whitespace
+KEY_ENV = "UNSPLASH_ACCESS_KEY"    # A single key
+
+_default_pool = None
+_default_lock = threading.Lock()
+
+
+def load_keys() -> List[str]:
+    """Read the access keys from the environment (including a loaded .env file)"""
+    keys = []
+    for value in (os.environ.get(KEYS_ENV, ""), os.environ.get(KEY_ENV, "")):
+        for key in re.split(r'[\s,;]+', value):
+            if key and key not in keys:
+                keys.append(key)
+    return keys
+
+
+def fingerprint(key: str) -> str:
+    """Get a short identifier for a key that is safe to log and use in file names"""
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:12]
+
+
+def state_file_for(key: str) -> str:
+    """Get the shared rate limit state file of a key"""
+    base, ext = os.path.splitext(rate_limiter.default_state_file())
+    return f"{base}.{fingerprint(key)}{ext or '.json'}"
+
+
+class KeyPool:
+    """Access keys with their own quotas, used most-remaining-budget first"""
+
+    def __init__(self, keys=None, window=rate_limiter.WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._limiters: Dict[str, RateLimiter] = {
+            key: RateLimiter(state_file_for(key), window=window)
+            for key in (load_keys() if keys is None else keys)
+        }
+        self._last_key = None
+
+    def __len__(self) -> int:
+        return len(self._limiters)
+
+    def _snapshot(self):
+        with self._lock:
+            return list(self._limiters.items())
+
+    def acquire(self) -> Optional[str]:
+        """
+        Take a token from the key with the most remaining budget.
+
+        Returns:
+            str: Key to send the request with, or None if every key is spent
+        """
+        candidates = sorted(self._snapshot(), key=lambda item: item[1].remaining(), reverse=True)
+        for key, limiter in candidates:
+            if limiter.try_acquire():
+                self._last_key = key
+                return key
+        if candidates:
+            logger.warning("API rate limit reached on every access key.")
+        return None
+
+    def observe(self, headers, key: Optional[str] = None) -> Optional[int]:
+        """
+        Update a key's quota from X-Ratelimit-* response headers.
+
+        Args:
+            headers (dict): Headers of an API response
+            key (str, optional): Key the request was made with, defaults to the
+                key used last
+
+        Returns:
+            int: Requests left for that key, or None if unknown
+        """
+        with self._lock:
+            limiter = self._limiters.get(key or self._last_key)
+            if limiter is None and self._limiters:
+                limiter = next(iter(self._limiters.values()))
+        return limiter.observe(headers) if limiter is not None else None
+
+    def remove(self, key: str) -> None:
+        """Take a key the API rejected out of the pool"""
+        with self._lock:
+            removed = self._limiters.pop(key, None)
+            left = len(self._limiters)
+        if removed is not None:
+            logger.warning(f"Access key {fingerprint(key)} was rejected; {left} key(s) left in the pool.")
+
+    def remaining(self) -> int:
+        """Get the estimated requests left over all keys"""
+        return sum(limiter.remaining() for _, limiter in self._snapshot())
+
+    def exhausted(self) -> bool:
+        """Check if there are keys but none of them has requests left"""
+        return len(self) > 0 and self.remaining() <= 0
+
+    def seconds_until_reset(self) -> Optional[float]:
+        """
+        Get the time over which the remaining requests should be spread.
+
+        Each key can spend its own remaining requests until its own reset, so
+        the combined rate is the sum of the per-key rates. The result is the
+        time the total budget lasts at that rate. When every key is spent, it
+        is the time until the first key resets.
+        """
+        total, rate, resets = 0, 0.0, []
+        for _, limiter in self._snapshot():
+            remaining = limiter.remaining()
+            seconds = limiter.seconds_until_reset()
+            if seconds is not None:
+                resets.append(seconds)
+            else:
+                # A key's window only starts with its first request
+                seconds = limiter.window
+            total += remaining
+            if remaining > 0:
+                rate += remaining / max(seconds, 1.0)
+        if not resets:
+            return None
+        if total <= 0:
+            return min(resets)
+        return total / rate
+
+    def close(self) -> None:
+        """Return the unspent tokens of every key"""
+        for _, limiter in self._snapshot():
+            limiter.close()
+
+
+def get_pool() -> KeyPool:
+    """Get the shared key pool, loading the keys on first use"""
+    global _default_pool
+    if _default_pool is None:
+        with _default_lock:
+            if _default_pool is None:
+                _default_pool = KeyPool()
+    return _default_pool
+
+
+def close_pool() -> None:
+    """Close the shared key pool, returning unspent tokens to other processes"""
+    global _default_pool
+    with _default_lock:
+        if _default_pool is not None:
+            _default_pool.close()
+            _default_pool = None
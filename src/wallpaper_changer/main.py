@@ -10,6 +10,7 @@ import sys
 import time
 from datetime import datetime
 
+from . import http_client
 from .config import Config
 from .wallpaper_handler import WallpaperHandler
 
@@ -71,6 +72,7 @@ def main():
                 time.sleep(interval_seconds)
             except KeyboardInterrupt:
                 logger.info("Received exit signal. Shutting down...")
+                http_client.log_connection_stats(logger)
                 break
             except Exception as e:
                 logger.error(f"Error in main loop: {e}")
@@ -0,0 +1,170 @@
+"""
+Monitors Module
+Describes the layout of the monitors a wallpaper is shown on.
+
+A layout is a list of outputs with their position on the virtual desktop.
+It is either configured, as strings like "DP-1:2560x1440+0+0", or detected
+from xrandr on Linux and the monitor API on Windows.
+"""
+import logging
+import platform
+import re
+import subprocess
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_GEOMETRY = re.compile(r'^\s*(?:(?P<name>[^:]+):)?(?P<width>\d+)x(?P<height>\d+)(?P<x>[+-]\d+)(?P<y>[+-]\d+)\s*$')
+
+# " 0: +*DP-1 2560/597x1440/336+0+0  DP-1"
+_XRANDR_MONITOR = re.compile(r'^\s*\d+:\s+\+?(?P<primary>\*?)(?P<name>\S+)\s+'
+                             r'(?P<width>\d+)/\d+x(?P<height>\d+)/\d+(?P<x>[+-]\d+)(?P<y>[+-]\d+)')
+
+
+class Monitor(NamedTuple):
+    """One output of the virtual desktop"""
+    name: str
+    x: int
+    y: int
+    width: int
+    height: int
+    primary: bool = False
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        return self.width, self.height
+
+
+def parse_monitor(value, index: int = 0) -> Optional[Monitor]:
+    """
+    Parse a configured monitor.
+
+    Args:
+        value: "WIDTHxHEIGHT+X+Y", optionally prefixed with "NAME:", or a dict
+               with name, width, height, x and y
+        index (int): Position in the layout, used to name unnamed monitors
+
+    Returns:
+        Monitor: The monitor, or None if the value is invalid
+    """
+    if isinstance(value, dict):
+        try:
+            return Monitor(str(value.get('name') or f"monitor{index}"), int(value.get('x', 0)),
+                           int(value.get('y', 0)), int(value['width']), int(value['height']),
+                           bool(value.get('primary', False)))
+        except (KeyError, TypeError, ValueError):
+            logger.warning(f"Invalid monitor: {value}")
+            return None
+    match = _GEOMETRY.match(str(value))
+    if not match:
+        logger.warning(f"Invalid monitor: {value}")
+        return None
+    return Monitor(match.group('name') or f"monitor{index}", int(match.group('x')), int(match.group('y')),
+                   int(match.group('width')), int(match.group('height')))
+
+
+def parse_layout(values: Iterable) -> List[Monitor]:
+    """Parse a configured list of monitors, skipping invalid entries"""
+    monitors = [parse_monitor(value, index) for index, value in enumerate(values)]
+    return [monitor for monitor in monitors if monitor is not None]
+
+
+def _detect_linux() -> List[Monitor]:
+    output = subprocess.run(['xrandr', '--listmonitors'], capture_output=True, text=True,
+                            timeout=5, check=True).stdout
+    monitors = []
+    for line in output.splitlines():
+        match = _XRANDR_MONITOR.match(line)
+        if match:
+            monitors.append(Monitor(match.group('name'), int(match.group('x')), int(match.group('y')),
+                                    int(match.group('width')), int(match.group('height')),
+                                    bool(match.group('primary'))))
+    return monitors
+
+
+def _detect_windows() -> List[Monitor]:
+    import ctypes
+    from ctypes import wintypes
+
+    class MONITORINFO(ctypes.Structure):
+        _fields_ = [('cbSize', wintypes.DWORD), ('rcMonitor', wintypes.RECT),
+                    ('rcWork', wintypes.RECT), ('dwFlags', wintypes.DWORD)]
+
+    user32 = ctypes.windll.user32
+    monitors = []
+
+    def callback(handle, dc, rect, data):
+        info = MONITORINFO()
+        info.cbSize = ctypes.sizeof(MONITORINFO)
+        if user32.GetMonitorInfoW(handle, ctypes.byref(info)):
+            bounds = info.rcMonitor
+            monitors.append(Monitor(f"DISPLAY{len(monitors) + 1}", bounds.left, bounds.top,
+                                    bounds.right - bounds.left, bounds.bottom - bounds.top,
+                                    bool(info.dwFlags & 1)))
+        return True
+
+    enum_proc = ctypes.WINFUNCTYPE(ctypes.c_int, wintypes.HMONITOR, wintypes.HDC,
+                                   ctypes.POINTER(wintypes.RECT), wintypes.LPARAM)
+    user32.EnumDisplayMonitors(None, None, enum_proc(callback), 0)
+    return monitors
+
+
+def detect_monitors() -> List[Monitor]:
+    """
+    Detect the monitor layout.
+
+    Returns:
+        list: Monitors in the order the platform reports them, or an empty
+              list if the layout could not be detected
+    """
+    detectors = {
+        'Linux': _detect_linux,
+        'Windows': _detect_windows,
+    }
+    detector = detectors.get(platform.system())
+    if detector is None:
+        return []
+    try:
+        return detector()
+    except Exception as e:
+        logger.debug(f"Could not detect monitors: {e}")
+        return []
+
+
+def primary_monitor(monitors: Iterable[Monitor]) -> Optional[Monitor]:
+    """Get the primary monitor, or the first one when none is marked primary"""
+    monitors = list(monitors)
+    return next((monitor for monitor in monitors if monitor.primary), monitors[0] if monitors else None)
+
+
+def get_layout(setting) -> List[Monitor]:
+    """
+    Get the monitor layout for a setting.
+
+    The layout is detected again on every call, so a monitor that was
+    plugged in or removed is picked up on the next wallpaper change.
+
+    Args:
+        setting: None for a single screen, "auto" to detect the layout, or a
+                 list of monitors as accepted by parse_monitor
+
+    Returns:
+        list: Monitors, empty when the wallpaper is set for a single screen
+    """
+    if not setting:
+        return []
+    if setting == "auto":
+        return detect_monitors()
+    if isinstance(setting, str):
+        setting = [setting]
+    return parse_layout(setting)
+
+
+def bounding_box(monitors: Iterable[Monitor]) -> Tuple[int, int, int, int]:
+    """Get the (x, y, width, height) of the virtual desktop covering all monitors"""
+    monitors = list(monitors)
+    left = min(monitor.x for monitor in monitors)
+    top = min(monitor.y for monitor in monitors)
+    right = max(monitor.x + monitor.width for monitor in monitors)
+    bottom = max(monitor.y + monitor.height for monitor in monitors)
+    return left, top, right - left, bottom - top
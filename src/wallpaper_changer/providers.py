@@ -0,0 +1,480 @@
+"""
+Providers Module
+Wallpaper sources behind a single interface.
+
+A provider hands out the next wallpaper as a local file, described by a dict
+with 'file_path', 'source_url' and 'provider' (plus 'cache_key' and 'headers'
+when the source has them). Local files and directories, direct image URLs,
+HTTP manifests and the offline image cache are all providers, and a
+CompositeProvider queries several of them at once.
+"""
+import hashlib
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlparse
+
+from . import downloader, http_client
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+DEFAULT_TIMEOUT = 20.0     # Seconds a composite waits for its sources
+MANIFEST_TTL = 3600        # Seconds a downloaded manifest is reused
+MANIFEST_TIMEOUT = 10      # Seconds allowed for fetching a manifest
+RECENT_LIMIT = 50          # Most recently used cache entries the offline provider picks from
+LATENCY_SMOOTHING = 0.3    # Weight of the newest sample in the average latency
+
+
+def is_image_path(path: str) -> bool:
+    """Check if a file name or URL path has an image extension"""
+    return path.lower().endswith(IMAGE_EXTENSIONS)
+
+
+class Provider:
+    """Base class of wallpaper sources"""
+
+    name = "provider"
+
+    def available(self) -> bool:
+        """Check if the source can currently deliver, e.g. it has quota left"""
+        return True
+
+    def fetch(self, category=None, search_term=None) -> Optional[Dict]:
+        """
+        Get the next wallpaper from this source.
+
+        Args:
+            category (str, optional): Category to fetch, if the source has categories
+            search_term (str, optional): Search term, takes priority over category
+
+        Returns:
+            dict: Dictionary with file_path, source_url and provider, or None
+        """
+        raise NotImplementedError
+
+    def accept(self, result: Dict) -> None:
+        """Called when a result of fetch() is actually used, e.g. to record it as shown"""
+
+    def close(self) -> None:
+        """Release resources held by the source"""
+
+    def _result(self, file_path: str, source_url: Optional[str] = None, **extra) -> Dict:
+        result = {'file_path': file_path, 'source_url': source_url or file_path, 'provider': self.name}
+        result.update(extra)
+        return result
+
+
+class FileProvider(Provider):
+    """A single local image file"""
+
+    name = "file"
+
+    def __init__(self, path):
+        self.path = path
+
+    def fetch(self, category=None, search_term=None) -> Optional[Dict]:
+        if not os.path.isfile(self.path):
+            logger.error(f"Wallpaper file not found: {self.path}")
+            return None
+        return self._result(self.path)
+
+
+class DirectoryProvider(Provider):
+    """Images in a local directory"""
+
+    name = "directory"
+
+    def __init__(self, directory, random_order=True):
+        self.directory = directory
+        self.random_order = random_order
+
+    def select(self) -> Optional[str]:
+        """Select a wallpaper from the directory"""
+        wallpapers = [
+            os.path.join(self.directory, f)
+            for f in os.listdir(self.directory)
+            if os.path.isfile(os.path.join(self.directory, f)) and is_image_path(f)
+        ]
+
+        if not wallpapers:
+            logger.error(f"No valid wallpapers found in directory: {self.directory}")
+            return None
+
+        if self.random_order:
+            return random.choice(wallpapers)
+        # Return the most recently added file
+        return max(wallpapers, key=os.path.getctime)
+
+    def fetch(self, category=None, search_term=None) -> Optional[Dict]:
+        try:
+            path = self.select()
+        except OSError as e:
+            logger.error(f"Error reading wallpaper directory {self.directory}: {e}")
+            return None
+        return self._result(path) if path else None
+
+
+class ImageUrlProvider(Provider):
+    """A URL that points directly at an image"""
+
+    name = "url"
+
+    def __init__(self, url, download_dir):
+        self.url = url
+        self.download_dir = download_dir
+
+    def download(self) -> Optional[str]:
+        """Download the image, saving it with a timestamp to avoid duplicates"""
+        try:
+            path = urlparse(self.url).path
+            if not is_image_path(path):
+                logger.error(f"URL does not point to a direct image: {self.url}")
+                return None
+
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            filename = f"wallpaper_{timestamp}{os.path.splitext(path)[1]}"
+            filepath = os.path.join(self.download_dir, filename)
+
+            if not downloader.download_file(self.url, filepath):
+                return None
+            logger.info(f"Downloaded wallpaper to {filepath}")
+            return filepath
+
+        except Exception as e:
+            logger.error(f"Error downloading wallpaper from {self.url}: {e}")
+            return None
+
+    def fetch(self, category=None, search_term=None) -> Optional[Dict]:
+        path = self.download()
+        return self._result(path, self.url) if path else None
+
+
+class ManifestProvider(Provider):
+    """
+    Images listed in a JSON manifest served over HTTP.
+
+    The manifest is either a list or an object with an "images" list. Entries
+    are image URLs, or objects with a "url" and optional "tags" that are
+    matched against the category or search term.
+    """
+
+    name = "manifest"
+
+    def __init__(self, url, download_dir, random_order=True, validator=None, ttl=MANIFEST_TTL):
+        self.url = url
+        self.download_dir = download_dir
+        self.random_order = random_order
+        self.validator = validator
+        self.ttl = ttl
+        self._entries: List[Dict] = []
+        self._loaded_at = None
+        self._cursor = 0
+        self._lock = threading.Lock()
+
+    def entries(self) -> List[Dict]:
+        """Get the manifest entries, downloading the manifest when it is stale"""
+        with self._lock:
+            if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl:
+                return self._entries
+        response = http_client.get(self.url, timeout=MANIFEST_TIMEOUT)
+        response.raise_for_status()
+        data = response.json()
+        if isinstance(data, dict):
+            data = data.get('images', [])
+
+        entries = []
+        for entry in data if isinstance(data, list) else []:
+            if isinstance(entry, str):
+                entry = {'url': entry}
+            if isinstance(entry, dict) and entry.get('url'):
+                tags = entry.get('tags') or []
+                entries.append({'url': entry['url'], 'tags': [str(tag).lower() for tag in tags]})
+        with self._lock:
+            self._entries = entries
+            self._loaded_at = time.monotonic()
+        logger.debug(f"Loaded {len(entries)} image(s) from manifest {self.url}")
+        return entries
+
+    def _choose(self, entries: List[Dict], query: Optional[str]) -> Dict:
+        if query and query != "random":
+            tagged = [entry for entry in entries if query.lower() in entry['tags']]
+            entries = tagged or entries
+        if self.random_order:
+            return random.choice(entries)
+        with self._lock:
+            entry = entries[self._cursor % len(entries)]
+            self._cursor += 1
+        return entry
+
+    def path_for(self, image_url: str) -> str:
+        """Get the local path a manifest image is stored at"""
+        ext = os.path.splitext(urlparse(image_url).path)[1].lower()
+        digest = hashlib.sha256(image_url.encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.download_dir, f"manifest-{digest}{ext if ext in IMAGE_EXTENSIONS else '.jpg'}")
+
+    def fetch(self, category=None, search_term=None) -> Optional[Dict]:
+        entries = self.entries()
+        if not entries:
+            logger.error(f"No images listed in manifest: {self.url}")
+            return None
+
+        image_url = self._choose(entries, search_term or category)['url']
+        path = self.path_for(image_url)
+        if not os.path.isfile(path):
+            os.makedirs(self.download_dir, exist_ok=True)
+            if not downloader.download_file(image_url, path, validator=self.validator):
+                return None
+        return self._result(path, image_url)
+
+
+class CacheProvider(Provider):
+    """Images already in the offline image cache"""
+
+    name = "cache"
+
+    def __init__(self, cache, recent=RECENT_LIMIT):
+        # cache is anything with recent(limit) and path_for(key), such as an ImageCache
+        self.cache = cache
+        self.recent = recent
+
+    def fetch(self, category=None, search_term=None) -> Optional[Dict]:
+        # Picking an image does not refresh its LRU position, as the result
+        # is often passed over for a fresh one
+        keys = self.cache.recent(self.recent)
+        random.shuffle(keys)
+        for key in keys:
+            path = self.cache.path_for(key)
+            if os.path.isfile(path):
+                return self._result(path, cache_key=key)
+        return None
+
+
+class SourceStats:
+    """Request outcomes and latency of one source in a composite"""
+
+    def __init__(self):
+        self.requests = 0
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.last_latency = None
+        self.average_latency = None
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, outcome: str) -> None:
+        """Record a finished request; outcome is 'hit', 'miss' or 'error'"""
+        with self._lock:
+            self.requests += 1
+            if outcome == 'hit':
+                self.hits += 1
+            elif outcome == 'miss':
+                self.misses += 1
+            else:
+                self.errors += 1
+            self.last_latency = latency
+            if self.average_latency is None:
+                self.average_latency = latency
+            else:
+                self.average_latency += LATENCY_SMOOTHING * (latency - self.average_latency)
+
+    def record_timeout(self) -> None:
+        """Record a request that was still running when the composite gave up on it"""
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self) -> Dict:
+        """Get the counters and latencies (in seconds) as a dict"""
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'hits': self.hits,
+                'misses': self.misses,
+                'errors': self.errors,
+                'timeouts': self.timeouts,
+                'last_latency': self.last_latency,
+                'average_latency': self.average_latency,
+            }
+
+
+class CompositeProvider(Provider):
+    """
+    Queries several providers at once and takes the first valid result.
+
+    Providers are listed in order of preference. Every available provider is
+    asked in parallel, and a result is used as soon as all providers before it
+    have answered without one. Once the timeout passes, the best result that
+    has arrived is used, so a slow or exhausted source never holds up an
+    update. A source whose previous request is still running is skipped.
+    """
+
+    name = "composite"
+
+    def __init__(self, providers, timeout=DEFAULT_TIMEOUT,
+                 validator: Optional[Callable[[str], bool]] = None):
+        self.providers = list(providers)
+        self.timeout = timeout
+        self.validator = validator or os.path.isfile
+        self._stats = [SourceStats() for _ in self.providers]
+        self._in_flight = {}
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def available(self) -> bool:
+        return any(self._is_available(provider) for provider in self.providers)
+
+    @staticmethod
+    def _is_available(provider) -> bool:
+        try:
+            return provider.available()
+        except Exception as e:
+            logger.debug(f"Could not check wallpaper source {provider.name}: {e}")
+            return False
+
+    def _timed_fetch(self, index: int, category, search_term) -> Optional[Dict]:
+        """Fetch from one provider, recording the latency and outcome"""
+        provider = self.providers[index]
+        start = time.monotonic()
+        outcome = 'miss'
+        try:
+            result = provider.fetch(category, search_term)
+            if result is not None and not self.validator(result['file_path']):
+                logger.warning(f"Wallpaper source {provider.name} returned an invalid image")
+                result = None
+            if result is not None:
+                outcome = 'hit'
+            return result
+        except Exception as e:
+            logger.error(f"Error fetching from wallpaper source {provider.name}: {e}")
+            outcome = 'error'
+            return None
+        finally:
+            self._stats[index].record(time.monotonic() - start, outcome)
+
+    def _submit(self, category, search_term) -> Dict:
+        """Start a request on every available provider that is not busy"""
+        futures = {}
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=max(1, len(self.providers)),
+                                                    thread_name_prefix="wallpaper-source")
+            for index, provider in enumerate(self.providers):
+                running = self._in_flight.get(index)
+                if running is not None and not running.done():
+                    logger.debug(f"Wallpaper source {provider.name} is still busy, skipping it")
+                    continue
+                if not self._is_available(provider):
+                    continue
+                futures[index] = self._in_flight[index] = self._executor.submit(
+                    self._timed_fetch, index, category, search_term)
+        return futures
+
+    def _use(self, index: int, result: Dict) -> Dict:
+        """Tell the provider its result is used; results that are dropped are never accepted"""
+        try:
+            self.providers[index].accept(result)
+        except Exception as e:
+            logger.error(f"Error accepting the result of wallpaper source {self.providers[index].name}: {e}")
+        return result
+
+    def fetch(self, category=None, search_term=None) -> Optional[Dict]:
+        futures = self._submit(category, search_term)
+        deadline = time.monotonic() + self.timeout
+        order = sorted(futures)
+
+        while True:
+            for index in order:
+                if not futures[index].done():
+                    break
+                result = futures[index].result()
+                if result is not None:
+                    return self._use(index, result)
+            else:
+                return None
+
+            left = deadline - time.monotonic()
+            if left <= 0:
+                break
+            wait([future for future in futures.values() if not future.done()],
+                 timeout=left, return_when=FIRST_COMPLETED)
+
+        # Out of time: use the most preferred result that has arrived
+        for index in order:
+            future = futures[index]
+            if future.done():
+                if future.result() is not None:
+                    return self._use(index, future.result())
+            else:
+                self._stats[index].record_timeout()
+                logger.warning(f"Wallpaper source {self.providers[index].name} did not answer "
+                               f"within {self.timeout:.0f}s")
+        return None
+
+    def stats(self) -> Dict[str, Dict]:
+        """Get the request counters and latencies of every source"""
+        return {self._label(index): stats.snapshot() for index, stats in enumerate(self._stats)}
+
+    def _label(self, index: int) -> str:
+        name = self.providers[index].name
+        duplicates = [provider.name for provider in self.providers].count(name)
+        return f"{name}#{index}" if duplicates > 1 else name
+
+    def log_stats(self, log: Optional[logging.Logger] = None) -> None:
+        """Log the request counters and average latency of every source"""
+        for label, stats in self.stats().items():
+            latency = stats['average_latency']
+            latency_text = f"{latency * 1000:.0f} ms" if latency is not None else "n/a"
+            (log or logger).info(
+                f"Wallpaper source {label}: {stats['requests']} request(s), {stats['hits']} hit(s), "
+                f"{stats['errors']} error(s), {stats['timeouts']} timeout(s), "
+                f"average latency {latency_text}"
+            )
+
+    def close(self) -> None:
+        """Stop the worker threads and close every provider"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+            futures = list(self._in_flight.values())
+            self._in_flight.clear()
+        # shutdown(cancel_futures=True) needs Python 3.9
+        for future in futures:
+            future.cancel()
+        if executor is not None:
+            executor.shutdown(wait=False)
+        for provider in self.providers:
+            provider.close()
+
+
+def provider_for_source(source: str, download_dir: str, random_order=True,
+                        validator=None) -> Optional[Provider]:
+    """
+    Create the provider for a configured source.
+
+    Args:
+        source (str): Image URL, manifest URL, image file or directory
+        download_dir (str): Directory downloaded images are stored in
+        random_order (bool): Pick images at random instead of newest/next first
+        validator (callable, optional): Check applied to downloaded manifest images
+
+    Returns:
+        Provider: Provider for the source, or None if the source is invalid
+    """
+    if source.startswith(('http://', 'https://')):
+        if is_image_path(urlparse(source).path):
+            return ImageUrlProvider(source, download_dir)
+        return ManifestProvider(source, download_dir, random_order, validator)
+
+    if os.path.isfile(source):
+        return FileProvider(source)
+
+    if os.path.isdir(source):
+        return DirectoryProvider(source, random_order)
+
+    logger.error(f"Invalid source configuration: {source}")
+    return None
@@ -0,0 +1,230 @@
+"""
+Rate Limiter Module
+Shares the Unsplash API quota between every wallpaper changer process on
+this machine.
+
+The quota is a token bucket that is refilled when the rate limit window
+resets. The bucket lives in a small state file protected by a file lock.
+Each process leases a few tokens at a time and spends them from memory, so
+the state file is only touched when a lease runs out. X-Ratelimit-* response
+headers are authoritative and correct the local estimate.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIMIT = 50         # Requests per window for Unsplash demo keys
+WINDOW = 3600              # Seconds in a rate limit window
+LEASE_SIZE = 3             # Tokens taken from the shared bucket at a time
+SYNC_INTERVAL = 60         # Seconds a remaining() estimate is reused before re-reading the state file
+STATE_FILE_ENV = "WALLPAPER_RATE_LIMIT_FILE"
+
+
+def default_state_file() -> str:
+    """Get the path of the shared rate limit state file"""
+    return os.environ.get(STATE_FILE_ENV) or os.path.join(os.path.expanduser("~"), ".wallpaper_rate_limit.json")
+
+
+def _header_int(headers, name: str) -> Optional[int]:
+    """Read an integer rate limit header, ignoring missing or invalid values"""
+    try:
+        value = headers.get(name)
+    except AttributeError:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+@contextmanager
+def _file_lock(lock_path: str):
+    """Hold an exclusive lock on lock_path across processes"""
+    with open(lock_path, 'a+b') as handle:
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        else:
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+            else:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class RateLimiter:
+    """Token bucket for API requests, shared between processes through a locked file"""
+
+    def __init__(self, state_file=None, limit=DEFAULT_LIMIT, window=WINDOW, lease_size=LEASE_SIZE):
+        self.state_file = state_file or default_state_file()
+        self.lock_file = self.state_file + ".lock"
+        self.limit = limit
+        self.window = window
+        self.lease_size = max(1, lease_size)
+        self._lock = threading.Lock()
+        self._leased = 0           # Tokens taken from the shared bucket but not spent yet
+        self._remaining = None     # Estimated requests left for the key
+        self._reset_at = None      # Time the current window resets
+        self._synced_at = None
+        self._observed = None      # (remaining, reset_at, limit) reported by the server, not yet shared
+        self._spent_since_observed = 0
+
+    def _read_state(self) -> Dict:
+        try:
+            with open(self.state_file, 'r') as f:
+                state = json.load(f)
+            if isinstance(state, dict):
+                return state
+        except (OSError, ValueError):
+            pass
+        return {}
+
+    def _write_state(self, state: Dict) -> None:
+        temp_path = f"{self.state_file}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(temp_path, self.state_file)
+
+    def _sync(self, take: int = 0) -> None:
+        """
+        Refresh the shared bucket and move tokens between it and this process.
+
+        A positive take leases up to that many tokens; a negative one returns
+        unspent tokens. Must be called with self._lock held.
+        """
+        now = time.time()
+        try:
+            with _file_lock(self.lock_file):
+                state = self._read_state()
+                limit = int(state.get('limit') or self.limit)
+                tokens = float(state.get('tokens', limit))
+                reset_at = state.get('reset_at')
+
+                # The server's count wins over ours
+                if self._observed is not None:
+                    remaining, observed_reset, observed_limit = self._observed
+                    limit = observed_limit or limit
+                    # Requests sent since then and our own lease are not in the shared bucket
+                    available = float(max(0, remaining - self._spent_since_observed - self._leased))
+                    if observed_reset is not None and observed_reset != reset_at:
+                        tokens, reset_at = available, observed_reset
+                    else:
+                        tokens = min(tokens, available)
+                    self._observed = None
+
+                # The window rolled over: the bucket is full again
+                if reset_at is not None and now >= reset_at:
+                    tokens, reset_at = float(limit), None
+
+                if take > 0:
+                    granted = min(take, int(tokens))
+                    if granted and reset_at is None:
+                        # First request of a window starts the clock
+                        reset_at = now + self.window
+                else:
+                    granted = take
+                tokens = min(float(limit), tokens - granted)
+
+                self._write_state({'limit': limit, 'tokens': tokens, 'reset_at': reset_at, 'updated': now})
+        except OSError as e:
+            # Fall back to a bucket private to this process
+            logger.error(f"Could not update rate limit state in {self.state_file}: {e}")
+            if take > 0:
+                known = self.limit if self._remaining is None else self._remaining
+                self._leased += max(0, min(take, known - self._leased))
+            return
+
+        self.limit = limit
+        self._leased += granted
+        self._reset_at = reset_at
+        self._remaining = int(tokens) + self._leased
+        self._synced_at = now
+
+    def try_acquire(self) -> bool:
+        """
+        Take a token for one API request.
+
+        Returns:
+            bool: True if the request may be sent, False if the quota is spent
+        """
+        with self._lock:
+            if self._leased <= 0:
+                self._sync(self.lease_size)
+            if self._leased <= 0:
+                logger.warning("API rate limit reached. Skipping request.")
+                return False
+            self._leased -= 1
+            self._spent_since_observed += 1
+            if self._remaining:
+                self._remaining -= 1
+            return True
+
+    def observe(self, headers) -> Optional[int]:
+        """
+        Correct the quota from X-Ratelimit-* response headers.
+
+        Args:
+            headers (dict): Headers of an API response
+
+        Returns:
+            int: Estimated requests left, or None if unknown
+        """
+        remaining = _header_int(headers, 'X-Ratelimit-Remaining')
+        if remaining is None:
+            return self._remaining
+        limit = _header_int(headers, 'X-Ratelimit-Limit')
+        reset_at = _header_int(headers, 'X-Ratelimit-Reset')
+
+        with self._lock:
+            if limit:
+                self.limit = limit
+            if reset_at is not None:
+                self._reset_at = reset_at
+            # Never spend leased tokens the server no longer has
+            self._leased = min(self._leased, remaining)
+            self._remaining = remaining
+            self._observed = (remaining, reset_at, limit)
+            self._spent_since_observed = 0
+            return remaining
+
+    def remaining(self) -> int:
+        """Get the estimated number of requests left in the current window"""
+        with self._lock:
+            now = time.time()
+            if self._synced_at is None or now - self._synced_at >= SYNC_INTERVAL or (
+                    self._reset_at is not None and now >= self._reset_at):
+                self._sync()
+            return self._remaining if self._remaining is not None else self.limit
+
+    def seconds_until_reset(self) -> Optional[float]:
+        """Get the seconds until the quota window resets, or None if no window is running"""
+        reset_at = self._reset_at
+        if reset_at is None:
+            return None
+        seconds = reset_at - time.time()
+        return seconds if seconds > 0 else None
+
+    def close(self) -> None:
+        """Return unspent tokens and publish the last server count"""
+        with self._lock:
+            if self._leased or self._observed is not None:
+                self._sync(-self._leased)
+
@@ -0,0 +1,411 @@
+"""
+Renderer Module
+Pre-renders wallpapers to the exact screen size for the configured fit mode.
+
+The desktop then only has to load a screen-sized file instead of rescaling
+a multi-megapixel image on every change. Rendered images are cached by
+source file, screen size and fit mode, so showing a wallpaper again reuses
+the rendered copy.
+
+In "fill" mode the crop can follow the detail of the image instead of its
+center (see smartcrop). The chosen window is remembered per image and
+screen size, so rendering the image again skips the analysis.
+
+Multi-monitor layouts get one rendering per output, made in parallel worker
+processes when several outputs need rendering.
+"""
+import hashlib
+import json
+import logging
+import math
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Sequence, Tuple, Union
+
+from . import image_loader, monitors, smartcrop
+
+logger = logging.getLogger(__name__)
+
+FIT_MODES = ("fill", "fit", "stretch", "center", "tile")
+DEFAULT_FIT_MODE = "fill"
+
+MAX_RENDERED = 16          # Rendered images kept before the least recently used is deleted
+RENDER_QUALITY = 92        # JPEG quality of rendered images
+BACKGROUND = (0, 0, 0)     # Color around images that do not cover the screen
+MAX_WORKERS = 4            # Worker processes rendering the outputs of a layout
+MAX_CROPS = 512            # Smart crop windows remembered before the least recently used is dropped
+CROP_INDEX = "crops.json"  # File in the cache directory the smart crop windows are kept in
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def decode_size(image_size: Tuple[int, int], screen_size: Tuple[int, int],
+                fit_mode: str) -> Optional[Tuple[int, int]]:
+    """
+    Get the smallest size an image has to be decoded at for a fit mode.
+
+    Returns:
+        tuple: (width, height), or None when the image is shown at its own size
+    """
+    width, height = image_size
+    screen_width, screen_height = screen_size
+    if fit_mode == "stretch":
+        return screen_size
+    if fit_mode == "fill":
+        scale = max(screen_width / width, screen_height / height)
+    elif fit_mode == "fit":
+        scale = min(screen_width / width, screen_height / height)
+    else:
+        # center and tile show the pixels 1:1
+        return None
+    return max(1, math.ceil(width * scale)), max(1, math.ceil(height * scale))
+
+
+def render_image(img, screen_size: Tuple[int, int], fit_mode: str,
+                 focus: Optional[Tuple[float, float]] = None):
+    """
+    Lay an RGB image out on a screen-sized canvas.
+
+    Args:
+        img (PIL.Image.Image): Decoded image
+        screen_size (tuple): (width, height) of the screen
+        fit_mode (str): One of FIT_MODES
+        focus (tuple, optional): (x, y) position 0-1 of the "fill" crop window, centered if None
+
+    Returns:
+        PIL.Image.Image: Image of exactly screen_size
+    """
+    from PIL import Image
+
+    screen_width, screen_height = screen_size
+    if fit_mode == "stretch":
+        return img.resize(screen_size, Image.LANCZOS)
+    if fit_mode == "fill":
+        scale = max(screen_width / img.width, screen_height / img.height)
+        width, height = math.ceil(img.width * scale), math.ceil(img.height * scale)
+        if focus is None:
+            left, top = (width - screen_width) // 2, (height - screen_height) // 2
+        else:
+            left, top = round((width - screen_width) * focus[0]), round((height - screen_height) * focus[1])
+        return img.resize((width, height), Image.LANCZOS).crop(
+            (left, top, left + screen_width, top + screen_height))
+
+    canvas = Image.new("RGB", screen_size, BACKGROUND)
+    if fit_mode == "fit":
+        scale = min(screen_width / img.width, screen_height / img.height)
+        img = img.resize((max(1, round(img.width * scale)), max(1, round(img.height * scale))), Image.LANCZOS)
+    if fit_mode == "tile":
+        for top in range(0, screen_height, img.height):
+            for left in range(0, screen_width, img.width):
+                canvas.paste(img, (left, top))
+    else:
+        # Negative offsets crop an image larger than the screen to its center
+        canvas.paste(img, ((screen_width - img.width) // 2, (screen_height - img.height) // 2))
+    return canvas
+
+
+class RenderCache:
+    """Directory of wallpapers rendered for a screen size and fit mode"""
+
+    def __init__(self, cache_dir: str, max_entries: int = MAX_RENDERED, smart_crop: bool = False):
+        """
+        Args:
+            cache_dir (str): Directory rendered images are written to
+            max_entries (int): Rendered images kept before the least recently used is deleted
+            smart_crop (bool): Crop "fill" renderings around the detail of the image
+        """
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.smart_crop = smart_crop
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _image_key(image_path: str, screen_size: Tuple[int, int]) -> str:
+        stat = os.stat(image_path)
+        return f"{os.path.abspath(image_path)}|{stat.st_mtime_ns}|{stat.st_size}|{screen_size[0]}x{screen_size[1]}"
+
+    def path_for(self, image_path: str, screen_size: Tuple[int, int], fit_mode: str) -> str:
+        """Get the file a rendering of image_path is stored in"""
+        key = f"{self._image_key(image_path, screen_size)}|{fit_mode}"
+        if self.smart_crop and fit_mode == "fill":
+            key += "|smart"
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode('utf-8')).hexdigest()[:24] + ".jpg")
+
+    def _load_crops(self) -> dict:
+        """Read the remembered smart crop windows"""
+        try:
+            with open(os.path.join(self.cache_dir, CROP_INDEX), 'r', encoding='utf-8') as f:
+                crops = json.load(f)
+            return crops if isinstance(crops, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def crop_focus(self, image_path: str, img, screen_size: Tuple[int, int]) -> Tuple[float, float]:
+        """
+        Get the smart crop window of an image for a screen size.
+
+        The window is looked up in the crop index and only computed when the
+        image has not been rendered for this size before.
+
+        Returns:
+            tuple: (x, y) position of the crop window for render_image
+        """
+        key = hashlib.sha1(self._image_key(image_path, screen_size).encode('utf-8')).hexdigest()[:24]
+        # Read on every use, as render workers in other processes add to the index
+        crops = self._load_crops()
+        focus = crops.pop(key, None)
+        if focus is None:
+            focus = smartcrop.find_focus(img, screen_size)
+        # Most recently used last, so the oldest are dropped first
+        crops[key] = list(focus)
+        for old_key in list(crops)[:max(0, len(crops) - MAX_CROPS)]:
+            del crops[old_key]
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            temp_path = os.path.join(self.cache_dir, f"{CROP_INDEX}.{os.getpid()}.tmp")
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(crops, f)
+            os.replace(temp_path, os.path.join(self.cache_dir, CROP_INDEX))
+        except OSError as e:
+            logger.debug(f"Could not store the smart crop window: {e}")
+        return tuple(focus)
+
+    @staticmethod
+    def _touch(path: str) -> bool:
+        """Mark a rendering as recently used, if it exists"""
+        try:
+            os.utime(path)
+            return True
+        except OSError:
+            return False
+
+    def cached(self, image_path: str, screen_size: Tuple[int, int], fit_mode: str = DEFAULT_FIT_MODE) -> Optional[str]:
+        """Get the rendering of an image if it is already cached"""
+        try:
+            target = self.path_for(image_path, screen_size, fit_mode)
+        except OSError:
+            return None
+        if self._touch(target):
+            self.hits += 1
+            return target
+        return None
+
+    def render(self, image_path: str, screen_size: Tuple[int, int], fit_mode: str = DEFAULT_FIT_MODE) -> Optional[str]:
+        """
+        Get a copy of an image rendered for the screen, rendering it on a miss.
+
+        Args:
+            image_path (str): Source image
+            screen_size (tuple): (width, height) of the screen
+            fit_mode (str): One of FIT_MODES
+
+        Returns:
+            str: Path of the rendered image, or None if it could not be rendered
+        """
+        if fit_mode not in FIT_MODES:
+            logger.warning(f"Unknown fit mode '{fit_mode}', using '{DEFAULT_FIT_MODE}'")
+            fit_mode = DEFAULT_FIT_MODE
+
+        with self._lock:
+            try:
+                target = self.path_for(image_path, screen_size, fit_mode)
+            except OSError as e:
+                logger.error(f"Cannot render {image_path}: {e}")
+                return None
+            if self._touch(target):
+                self.hits += 1
+                return target
+            self.misses += 1
+
+            image_size = image_loader.image_size(image_path)
+            if not image_size:
+                return None
+            img = image_loader.load_image(image_path, decode_size(image_size, screen_size, fit_mode), mode="RGB")
+            if img is None:
+                return None
+
+            focus = None
+            if self.smart_crop and fit_mode == "fill":
+                focus = self.crop_focus(image_path, img, screen_size)
+
+            temp_path = f"{target}.tmp"
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                render_image(img, screen_size, fit_mode, focus).save(temp_path, "JPEG", quality=RENDER_QUALITY)
+                os.replace(temp_path, target)
+            except Exception as e:
+                logger.error(f"Error rendering {image_path}: {e}")
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                return None
+            logger.debug(f"Rendered {image_path} for {screen_size[0]}x{screen_size[1]} ({fit_mode})")
+            self._evict()
+            return target
+
+    def _evict(self) -> None:
+        """Delete the least recently used renderings beyond max_entries"""
+        try:
+            entries = [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir)
+                       if name.endswith(".jpg")]
+            entries.sort(key=os.path.getmtime)
+            for path in entries[:max(0, len(entries) - self.max_entries)]:
+                os.remove(path)
+        except OSError as e:
+            logger.debug(f"Could not clean up rendered wallpapers: {e}")
+
+
+def _render_in_worker(cache_dir: str, max_entries: int, smart_crop: bool, image_path: str,
+                      screen_size: Tuple[int, int], fit_mode: str) -> Optional[str]:
+    """Render one output in a worker process"""
+    return RenderCache(cache_dir, max_entries, smart_crop).render(image_path, screen_size, fit_mode)
+
+
+def _get_executor(workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """Get the shared pool of render worker processes"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=workers or min(MAX_WORKERS, os.cpu_count() or 1))
+        return _executor
+
+
+def shutdown_workers() -> None:
+    """Stop the render worker processes"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
+
+
+def _save_jpeg(img, target: str) -> None:
+    temp_path = f"{target}.tmp"
+    img.save(temp_path, "JPEG", quality=RENDER_QUALITY)
+    os.replace(temp_path, target)
+
+
+def _render_span(image_path: str, layout: Sequence[monitors.Monitor], cache: RenderCache,
+                 fit_mode: str) -> Optional[List[Tuple[monitors.Monitor, str]]]:
+    """Render one image across the whole layout and cut it into one piece per output"""
+    from PIL import Image
+
+    left, top, width, height = monitors.bounding_box(layout)
+    full = cache.render(image_path, (width, height), fit_mode)
+    if full is None:
+        return None
+    stem = os.path.splitext(full)[0]
+    outputs = []
+    for monitor in layout:
+        box = (monitor.x - left, monitor.y - top, monitor.x - left + monitor.width, monitor.y - top + monitor.height)
+        crop_path = f"{stem}-{box[0]}_{box[1]}_{monitor.width}x{monitor.height}.jpg"
+        if not cache._touch(crop_path):
+            try:
+                with Image.open(full) as img:
+                    _save_jpeg(img.crop(box), crop_path)
+            except Exception as e:
+                logger.error(f"Error cutting the wallpaper for {monitor.name}: {e}")
+                return None
+        outputs.append((monitor, crop_path))
+    return outputs
+
+
+def render_outputs(image_paths: Union[str, Sequence[str]], layout: Sequence[monitors.Monitor], cache: RenderCache,
+                   fit_mode: str = DEFAULT_FIT_MODE, span: bool = False,
+                   workers: Optional[int] = None) -> Optional[List[Tuple[monitors.Monitor, str]]]:
+    """
+    Render the wallpaper of every output of a monitor layout.
+
+    With span, the first image is rendered for the bounding box of the layout
+    and cut into one piece per output. Otherwise every output gets its own
+    rendering, of the image at the same position in image_paths (repeating
+    them when there are more outputs than images).
+
+    Renderings are cached by image, output size and fit mode, so after a
+    hotplug only outputs with a new size are rendered again. In span mode a
+    change of the bounding box renders the whole layout again.
+
+    Args:
+        image_paths (str or list): Source image, or one image per output
+        layout (list): Monitors to render for
+        cache (RenderCache): Cache the renderings are stored in
+        fit_mode (str): One of FIT_MODES
+        span (bool): Stretch a single image across all outputs
+        workers (int, optional): Worker processes to use; 0 renders in this process
+
+    Returns:
+        list: (monitor, rendered path) for every output, or None if an output failed
+    """
+    if isinstance(image_paths, str):
+        image_paths = [image_paths]
+    if fit_mode not in FIT_MODES:
+        logger.warning(f"Unknown fit mode '{fit_mode}', using '{DEFAULT_FIT_MODE}'")
+        fit_mode = DEFAULT_FIT_MODE
+    if span:
+        return _render_span(image_paths[0], layout, cache, fit_mode)
+
+    jobs = [(monitor, image_paths[index % len(image_paths)]) for index, monitor in enumerate(layout)]
+    rendered, missing = {}, []
+    for monitor, image_path in jobs:
+        key = (image_path, monitor.size)
+        if key in rendered or key in missing:
+            continue
+        hit = cache.cached(image_path, monitor.size, fit_mode)
+        if hit:
+            rendered[key] = hit
+        else:
+            missing.append(key)
+
+    results = None
+    if len(missing) > 1 and workers != 0:
+        try:
+            executor = _get_executor(workers)
+            results = list(executor.map(_render_in_worker, [cache.cache_dir] * len(missing),
+                                        [cache.max_entries] * len(missing), [cache.smart_crop] * len(missing),
+                                        [image_path for image_path, _ in missing],
+                                        [size for _, size in missing], [fit_mode] * len(missing)))
+            cache.misses += len(missing)
+        except Exception as e:
+            logger.warning(f"Render workers failed, rendering in this process: {e}")
+            shutdown_workers()
+    if results is None:
+        results = [cache.render(image_path, size, fit_mode) for image_path, size in missing]
+    rendered.update(zip(missing, results))
+
+    outputs = [(monitor, rendered[(image_path, monitor.size)]) for monitor, image_path in jobs]
+    failed = [monitor.name for monitor, path in outputs if path is None]
+    if failed:
+        logger.error(f"Could not render the wallpaper for {', '.join(failed)}")
+        return None
+    return outputs
+
+
+def compose_layout(outputs: Sequence[Tuple[monitors.Monitor, str]], cache: RenderCache) -> Optional[str]:
+    """
+    Paste rendered outputs into one image of the whole virtual desktop.
+
+    Used for desktops that take a single image spanned across all monitors.
+
+    Returns:
+        str: Path of the composed image, or None if it could not be written
+    """
+    from PIL import Image
+
+    left, top, width, height = monitors.bounding_box(monitor for monitor, _ in outputs)
+    key = "|".join(f"{path}@{monitor.x},{monitor.y}" for monitor, path in outputs)
+    target = os.path.join(cache.cache_dir, f"layout-{hashlib.sha1(key.encode('utf-8')).hexdigest()[:24]}.jpg")
+    if cache._touch(target):
+        return target
+    try:
+        canvas = Image.new("RGB", (width, height), BACKGROUND)
+        for monitor, path in outputs:
+            with Image.open(path) as img:
+                canvas.paste(img, (monitor.x - left, monitor.y - top))
+        _save_jpeg(canvas, target)
+        return target
+    except Exception as e:
+        logger.error(f"Error composing the monitor layout: {e}")
+        return None
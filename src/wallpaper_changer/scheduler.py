@@ -0,0 +1,143 @@
+"""
+Scheduler Module
+Plans automatic wallpaper updates so the API quota is spread evenly until
+the rate limit window resets.
+
+Plans count updates, not requests: one batched request can serve many
+updates, and photos already queued need no request at all.
+
+Requests are held back for manual overrides in proportion to how often the
+user has actually pressed the manual update key, instead of a fixed number.
+While the API circuit breaker is open, no update is planned before it lets
+a probe request through.
+"""
+import math
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+from . import circuit_breaker, key_pool
+
+MIN_INTERVAL = 30.0        # Never update more often than this, in seconds
+DEFAULT_INTERVAL = 90.0    # Interval used before any quota window is running
+NO_QUOTA_RECHECK = 600.0   # Longest wait before re-checking an exhausted quota
+RESET_MARGIN = 5.0         # Seconds added after a reset to allow for clock skew
+MIN_RESERVE = 2            # Requests always held back for manual overrides
+MANUAL_HISTORY = 3         # Windows of manual presses used to estimate their rate
+
+_default_scheduler = None
+_default_lock = threading.Lock()
+
+
+class UpdateScheduler:
+    """Computes the interval until the next automatic update"""
+
+    def __init__(self, limiter=None, min_interval=MIN_INTERVAL, min_reserve=MIN_RESERVE, breaker=None):
+        # limiter is anything with remaining(), seconds_until_reset() and window,
+        # by default the pool of API keys
+        self._limiter = limiter
+        self._breaker = breaker
+        self.min_interval = min_interval
+        self.min_reserve = min_reserve
+        self._started = time.time()
+        self._manual_presses = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def limiter(self):
+        return self._limiter or key_pool.get_pool()
+
+    @property
+    def breaker(self):
+        return self._breaker or circuit_breaker.get_breaker()
+
+    def record_manual(self, timestamp: Optional[float] = None) -> None:
+        """Record a manual update so future plans reserve requests for it"""
+        with self._lock:
+            self._manual_presses.append(timestamp if timestamp is not None else time.time())
+
+    def manual_rate(self) -> float:
+        """
+        Estimate how many manual updates the user makes per second.
+
+        Presses in the last MANUAL_HISTORY windows are counted, over at least one
+        full window so a burst right after startup is not extrapolated too far.
+        """
+        now = time.time()
+        window = self.limiter.window
+        horizon = window * MANUAL_HISTORY
+        with self._lock:
+            while self._manual_presses and now - self._manual_presses[0] > horizon:
+                self._manual_presses.popleft()
+            presses = len(self._manual_presses)
+        if not presses:
+            return 0.0
+        observed = min(horizon, max(window, now - self._started))
+        return presses / observed
+
+    def reserve(self, seconds_left: float, remaining: Optional[int] = None) -> int:
+        """
+        Get the number of requests to hold back for manual overrides.
+
+        Args:
+            seconds_left (float): Seconds until the quota window resets
+            remaining (int, optional): Requests left; the reserve never exceeds it
+        """
+        expected = self.manual_rate() * max(0.0, seconds_left)
+        reserved = self.min_reserve + math.ceil(expected)
+        return min(reserved, remaining) if remaining is not None else reserved
+
+    def next_interval(self, remaining: Optional[int] = None, seconds_left: Optional[float] = None,
+                      reserved: Optional[int] = None, queued: int = 0, per_request: int = 1) -> float:
+        """
+        Compute the seconds until the next automatic update.
+
+        The updates still possible before the window resets, the queued photos
+        plus per_request for every usable request (remaining minus the manual
+        reserve), are spaced evenly over the time left. When none are left,
+        the scheduler waits for the reset instead of running into the limit.
+        The interval is never shorter than the circuit breaker's backoff.
+
+        Args:
+            remaining (int, optional): Requests left, defaults to the rate limiter's estimate
+            seconds_left (float, optional): Seconds until the window resets, defaults
+                to the rate limiter's reset time
+            reserved (int, optional): Requests to hold back, defaults to the estimate
+                from observed manual presses
+            queued (int): Updates that can be served without a request
+            per_request (int): Updates one request serves, such as the batch size
+
+        Returns:
+            float: Seconds until the next update
+        """
+        return max(self._quota_interval(remaining, seconds_left, reserved, queued, per_request),
+                   self.breaker.retry_after())
+
+    def _quota_interval(self, remaining, seconds_left, reserved, queued, per_request) -> float:
+        """Compute the interval that spreads the possible updates evenly until the reset"""
+        limiter = self.limiter
+        if remaining is None:
+            remaining = limiter.remaining()
+        if seconds_left is None:
+            seconds_left = limiter.seconds_until_reset()
+            # The window only starts with the next request
+            if seconds_left is None:
+                return DEFAULT_INTERVAL
+        if reserved is None:
+            reserved = self.reserve(seconds_left)
+
+        updates = queued + max(0, remaining - reserved) * per_request
+        if updates <= 0:
+            return min(seconds_left + RESET_MARGIN, NO_QUOTA_RECHECK)
+        return max(self.min_interval, seconds_left / float(updates))
+
+
+def get_scheduler() -> UpdateScheduler:
+    """Get the shared scheduler, creating it on first use"""
+    global _default_scheduler
+    if _default_scheduler is None:
+        with _default_lock:
+            if _default_scheduler is None:
+                _default_scheduler = UpdateScheduler()
+    return _default_scheduler
@@ -0,0 +1,117 @@
+"""
+Smart Crop Module
+Picks the part of an image that "fill" keeps when the aspect ratios differ.
+
+Filling a screen crops the excess width or height of the image, which from
+the center often cuts off the subject. Instead, the image is reduced to a
+grayscale copy of ANALYSIS_SIDE pixels and split into small blocks, and the
+entropy of each block's histogram gives a map of where the detail is. The
+crop window slides along the cropped axis only, so the best position is
+found from running sums of the column or row totals of that map.
+"""
+import logging
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_SIDE = 512        # Longest side of the grayscale copy the detail map is made from
+BLOCK_SIZE = 8             # Side in pixels of the blocks entropy is measured over
+LEVELS = 32                # Gray levels of the block histograms
+MIN_GAIN = 0.05            # Extra detail a window needs over the centered one to be picked
+
+CENTER = (0.5, 0.5)
+
+
+def entropy_map(pixels, block_size: int = BLOCK_SIZE, levels: int = LEVELS):
+    """
+    Measure the entropy of every block of a grayscale image.
+
+    Args:
+        pixels (numpy.ndarray): (height, width) uint8 gray values
+        block_size (int): Side of the blocks; a partial last row or column is dropped
+        levels (int): Gray levels the histograms are quantized to
+
+    Returns:
+        numpy.ndarray: (rows, columns) entropy in bits of every block
+    """
+    import numpy as np
+
+    rows, columns = pixels.shape[0] // block_size, pixels.shape[1] // block_size
+    if not rows or not columns:
+        return np.zeros((rows, columns))
+    blocks = pixels[:rows * block_size, :columns * block_size].reshape(rows, block_size, columns, block_size)
+    quantized = (blocks.astype(np.int64) * levels) >> 8
+    # One histogram per block, all built by a single bincount over offset bins
+    block_index = (np.arange(rows)[:, None, None, None] * columns + np.arange(columns)[None, None, :, None])
+    counts = np.bincount((block_index * levels + quantized).ravel(), minlength=rows * columns * levels)
+    probabilities = counts.reshape(rows, columns, levels) / (block_size * block_size)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        terms = np.where(probabilities > 0, probabilities * np.log2(probabilities), 0.0)
+    return -terms.sum(axis=2)
+
+
+def best_window(profile, window: int) -> Optional[int]:
+    """
+    Find the window of a detail profile with the most detail.
+
+    The centered window wins unless another has MIN_GAIN more detail, so
+    featureless images stay centered.
+
+    Args:
+        profile (numpy.ndarray): Detail of every column or row
+        window (int): Length of the window
+
+    Returns:
+        int: Start of the best window, or None to keep the window centered
+    """
+    import numpy as np
+
+    positions = len(profile) - window + 1
+    if window <= 0 or positions <= 1:
+        return None
+    sums = np.convolve(profile, np.ones(window), mode='valid')
+    best = int(np.argmax(sums))
+    centered = (sums[(positions - 1) // 2] + sums[positions // 2]) / 2
+    if sums[best] <= centered * (1 + MIN_GAIN):
+        return None
+    return best
+
+
+def find_focus(img, screen_size: Tuple[int, int]) -> Tuple[float, float]:
+    """
+    Pick the crop of an image that fills a screen while keeping the most detail.
+
+    Args:
+        img (PIL.Image.Image): Decoded image
+        screen_size (tuple): (width, height) of the screen
+
+    Returns:
+        tuple: (x, y) position of the crop window, each from 0 (left or top
+               edge) to 1 (right or bottom edge); 0.5 is centered
+    """
+    import numpy as np
+
+    screen_width, screen_height = screen_size
+    # Share of the image's width and height that stays visible once it fills the screen
+    scale = max(screen_width / img.width, screen_height / img.height)
+    visible = (screen_width / (img.width * scale), screen_height / (img.height * scale))
+    if min(visible) > 0.99:
+        return CENTER
+
+    try:
+        small = img.convert("L")
+        small.thumbnail((ANALYSIS_SIDE, ANALYSIS_SIDE))
+        detail = entropy_map(np.asarray(small, dtype=np.uint8))
+    except Exception as e:
+        logger.warning(f"Could not analyse the image for cropping: {e}")
+        return CENTER
+
+    # Only one axis is cropped: sum the map over the other one
+    axis = 0 if visible[0] < visible[1] else 1
+    profile = detail.sum(axis=axis)
+    window = round(len(profile) * visible[axis])
+    start = best_window(profile, window)
+    if start is None:
+        return CENTER
+    position = start / (len(profile) - window)
+    return (position, 0.5) if axis == 0 else (0.5, position)
@@ -0,0 +1,245 @@
+"""
+Thumbnails Module
+Keeps thumbnails of a directory of wallpapers in a single packed file.
+
+The pack is a header followed by appended records, one per image: its
+relative name, the modification time and size it was made from, and the
+JPEG bytes of the thumbnail. Updating the pack only makes thumbnails for
+images that are new or changed, in parallel worker processes, and appends
+them. Records of changed or removed images become dead space that is
+reclaimed by rewriting the pack once it outweighs the live records.
+"""
+import io
+import logging
+import os
+import struct
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from . import image_loader
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZE = 256           # Longest side of a thumbnail in pixels
+THUMBNAIL_QUALITY = 80         # JPEG quality of thumbnails
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp')
+MAX_WORKERS = 4                # Worker processes making thumbnails
+CHUNK_SIZE = 8                 # Images handed to a worker process at a time
+
+# Magic, format version, thumbnail size
+_HEADER = struct.Struct("<4sII")
+_MAGIC = b"WCTN"
+_VERSION = 1
+# Name length, source mtime in ns, source size, thumbnail length
+_RECORD = struct.Struct("<HqQI")
+_REMOVED = -1              # Source mtime of a record that drops an image from the pack
+
+
+class Entry(NamedTuple):
+    """Location of a thumbnail in the pack"""
+    mtime_ns: int
+    size: int
+    offset: int
+    length: int
+
+
+def make_thumbnail(file_path: str, size: int = THUMBNAIL_SIZE, quality: int = THUMBNAIL_QUALITY) -> bytes:
+    """
+    Make the JPEG thumbnail of an image.
+
+    Returns:
+        bytes: The thumbnail, or b'' if the image could not be read
+    """
+    img = image_loader.load_image(file_path, (size, size), mode="RGB")
+    if img is None:
+        return b''
+    try:
+        img.thumbnail((size, size))
+        buffer = io.BytesIO()
+        img.save(buffer, "JPEG", quality=quality)
+        return buffer.getvalue()
+    except Exception as e:
+        logger.error(f"Error making the thumbnail of {file_path}: {e}")
+        return b''
+
+
+class ThumbnailPack:
+    """Thumbnails of a directory of images, stored in one file"""
+
+    def __init__(self, path: str, size: int = THUMBNAIL_SIZE, quality: int = THUMBNAIL_QUALITY):
+        """
+        Args:
+            path (str): Pack file, created on the first update
+            size (int): Longest side of a thumbnail; a pack made at another size is rebuilt
+            quality (int): JPEG quality of thumbnails
+        """
+        self.path = path
+        self.size = size
+        self.quality = quality
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Entry] = {}
+        self._end = 0
+        self._dead = 0
+        self._load()
+
+    def _load(self) -> None:
+        """Read the record headers of an existing pack"""
+        try:
+            with open(self.path, 'rb') as f:
+                header = f.read(_HEADER.size)
+                if len(header) < _HEADER.size or _HEADER.unpack(header) != (_MAGIC, _VERSION, self.size):
+                    logger.info(f"Rebuilding thumbnail pack {self.path}")
+                    return
+                file_size = os.fstat(f.fileno()).st_size
+                offset = _HEADER.size
+                while True:
+                    record = f.read(_RECORD.size)
+                    if len(record) < _RECORD.size:
+                        break
+                    name_length, mtime_ns, size, length = _RECORD.unpack(record)
+                    name = f.read(name_length)
+                    data_offset = offset + _RECORD.size + name_length
+                    if len(name) < name_length or f.seek(length, os.SEEK_CUR) > file_size:
+                        break
+                    self._index(name.decode('utf-8'), Entry(mtime_ns, size, data_offset, length))
+                    offset = data_offset + length
+                self._end = offset
+        except FileNotFoundError:
+            pass
+        except (OSError, struct.error, UnicodeDecodeError) as e:
+            logger.warning(f"Could not read thumbnail pack {self.path}, rebuilding it: {e}")
+            self._entries, self._dead = {}, 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._entries
+
+    def names(self) -> List[str]:
+        """Get the names of the images in the pack"""
+        return sorted(self._entries)
+
+    def get(self, name: str) -> Optional[bytes]:
+        """
+        Read the thumbnail of an image.
+
+        Returns:
+            bytes: JPEG bytes, or None if the image has no thumbnail
+        """
+        entry = self._entries.get(name)
+        if entry is None or not entry.length:
+            return None
+        with open(self.path, 'rb') as f:
+            f.seek(entry.offset)
+            return f.read(entry.length)
+
+    def is_current(self, name: str, stat: os.stat_result) -> bool:
+        """Check if the thumbnail of an image was made from its current version"""
+        entry = self._entries.get(name)
+        return entry is not None and (entry.mtime_ns, entry.size) == (stat.st_mtime_ns, stat.st_size)
+
+    def update(self, directory: str, workers: Optional[int] = None) -> Dict[str, int]:
+        """
+        Bring the pack up to date with the images in a directory.
+
+        Args:
+            directory (str): Directory of images; sidecar files are ignored
+            workers (int, optional): Worker processes to use; 0 works in this process
+
+        Returns:
+            dict: Number of thumbnails 'added', 'kept' and 'removed'
+        """
+        with self._lock:
+            present, missing = set(), []
+            for name in sorted(os.listdir(directory)) if os.path.isdir(directory) else []:
+                if not name.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(directory, name))
+                except OSError:
+                    continue
+                present.add(name)
+                if not self.is_current(name, stat):
+                    missing.append((name, stat))
+
+            removed = [name for name in self._entries if name not in present]
+            paths = [os.path.join(directory, name) for name, _ in missing]
+            thumbnails = self._make_thumbnails(paths, workers)
+            records = [(name, stat.st_mtime_ns, stat.st_size, data)
+                       for (name, stat), data in zip(missing, thumbnails)]
+            records += [(name, _REMOVED, 0, b'') for name in removed]
+            if records:
+                self._append(records)
+            if self._dead > self._end - self._dead:
+                self.compact()
+            return {'added': len(missing), 'kept': len(present) - len(missing), 'removed': len(removed)}
+
+    def _make_thumbnails(self, paths: List[str], workers: Optional[int]) -> List[bytes]:
+        """Make thumbnails in worker processes, or in this process for a single image"""
+        if len(paths) > 1 and workers != 0:
+            try:
+                with ProcessPoolExecutor(max_workers=workers or min(MAX_WORKERS, os.cpu_count() or 1)) as executor:
+                    return list(executor.map(make_thumbnail, paths, [self.size] * len(paths),
+                                             [self.quality] * len(paths), chunksize=CHUNK_SIZE))
+            except Exception as e:
+                logger.warning(f"Thumbnail workers failed, working in this process: {e}")
+        return [make_thumbnail(path, self.size, self.quality) for path in paths]
+
+    def _index(self, name: str, entry: Entry) -> None:
+        """Point a name at its newest record"""
+        previous = self._entries.pop(name, None)
+        if previous is not None:
+            self._dead += previous.length
+        if entry.mtime_ns != _REMOVED:
+            self._entries[name] = entry
+
+    def _append(self, records: List[Tuple[str, int, int, bytes]]) -> None:
+        """Append thumbnails to the pack, starting a new pack if needed"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        if not self._end:
+            self._write_pack([])
+        with open(self.path, 'r+b') as f:
+            # Drop a record left half written by an interrupted update
+            f.truncate(self._end)
+            f.seek(self._end)
+            for name, mtime_ns, size, data in records:
+                self._end = self._write_record(f, self._end, name, mtime_ns, size, data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _write_record(self, f, offset: int, name: str, mtime_ns: int, size: int, data: bytes) -> int:
+        """Write one record at offset and return the offset after it"""
+        encoded = name.encode('utf-8')
+        f.write(_RECORD.pack(len(encoded), mtime_ns, size, len(data)))
+        f.write(encoded)
+        f.write(data)
+        data_offset = offset + _RECORD.size + len(encoded)
+        self._index(name, Entry(mtime_ns, size, data_offset, len(data)))
+        return data_offset + len(data)
+
+    def _write_pack(self, records: List[Tuple[str, Entry, bytes]]) -> None:
+        """Replace the pack file with a header and the given records"""
+        temp_path = f"{self.path}.tmp"
+        entries, offset = {}, _HEADER.size
+        with open(temp_path, 'wb') as f:
+            f.write(_HEADER.pack(_MAGIC, _VERSION, self.size))
+            self._entries = entries
+            for name, entry, data in records:
+                offset = self._write_record(f, offset, name, entry.mtime_ns, entry.size, data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+        self._end, self._dead = offset, 0
+
+    def compact(self) -> None:
+        """Rewrite the pack without the records of changed and removed images"""
+        if not self._end:
+            return
+        live = []
+        with open(self.path, 'rb') as f:
+            for name, entry in sorted(self._entries.items(), key=lambda item: item[1].offset):
+                f.seek(entry.offset)
+                live.append((name, entry, f.read(entry.length)))
+        self._write_pack(live)
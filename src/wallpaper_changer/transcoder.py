@@ -0,0 +1,116 @@
+"""
+Transcoder Module
+Re-encodes wallpapers to smaller files for long-term storage.
+
+Images are written as WebP or progressive JPEG at a chosen quality, and
+shrunk to the smallest size that still fills a screen of max_size, so a
+6000x4000 original kept for a 1920x1080 desktop becomes a fraction of its
+size. Batches are spread over worker processes.
+"""
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+
+from . import image_loader, renderer
+
+logger = logging.getLogger(__name__)
+
+# Storage format and the extension its files get
+FORMATS = {"webp": ".webp", "jpeg": ".jpg"}
+DEFAULT_QUALITY = 85
+MAX_WORKERS = 4            # Worker processes transcoding a batch
+
+
+def extension_for(fmt: str) -> str:
+    """Get the file extension of a storage format"""
+    return FORMATS[fmt]
+
+
+def target_size(image_size: Tuple[int, int], max_size: Optional[Tuple[int, int]]) -> Tuple[int, int]:
+    """Get the size an image is stored at: the smallest that still fills max_size, never larger"""
+    if not max_size:
+        return image_size
+    size = renderer.decode_size(image_size, max_size, "fill")
+    if size[0] >= image_size[0] or size[1] >= image_size[1]:
+        return image_size
+    return size
+
+
+def transcode(source: str, target: str, fmt: str = "webp", quality: int = DEFAULT_QUALITY,
+              max_size: Optional[Tuple[int, int]] = None,
+              max_bytes: int = image_loader.MAX_DECODE_BYTES) -> bool:
+    """
+    Re-encode an image.
+
+    A JPEG too large to decode within max_bytes is decoded smaller and
+    stored at that size; images are never scaled up.
+
+    Args:
+        source (str): Image to read
+        target (str): File to write, replaced atomically
+        fmt (str): One of FORMATS
+        quality (int): Encoder quality, 1-100
+        max_size (tuple, optional): Screen size the stored image has to fill
+        max_bytes (int): Largest decoded size allowed
+
+    Returns:
+        bool: True if the target was written
+    """
+    from PIL import Image
+
+    if fmt not in FORMATS:
+        logger.error(f"Unknown storage format '{fmt}'")
+        return False
+    image_size = image_loader.image_size(source)
+    if image_size is None:
+        logger.error(f"Cannot transcode unreadable image {source}")
+        return False
+    size = target_size(image_size, max_size)
+    img = image_loader.load_image(source, size, mode="RGB", max_bytes=max_bytes)
+    if img is None:
+        return False
+    if img.width < size[0] or img.height < size[1]:
+        # Decoded smaller to fit max_bytes: keep the aspect ratio within the decoded image
+        scale = min(img.width / size[0], img.height / size[1])
+        size = (max(1, min(img.width, round(size[0] * scale))), max(1, min(img.height, round(size[1] * scale))))
+
+    temp_path = f"{target}.tmp"
+    try:
+        if img.size != size:
+            img = img.resize(size, Image.LANCZOS)
+        if fmt == "webp":
+            img.save(temp_path, "WEBP", quality=quality, method=6)
+        else:
+            img.save(temp_path, "JPEG", quality=quality, optimize=True, progressive=True)
+        os.replace(temp_path, target)
+        return True
+    except Exception as e:
+        logger.error(f"Error transcoding {source}: {e}")
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return False
+
+
+def transcode_many(jobs: Sequence[Tuple[str, str]], fmt: str = "webp", quality: int = DEFAULT_QUALITY,
+                   max_size: Optional[Tuple[int, int]] = None, workers: Optional[int] = None) -> List[bool]:
+    """
+    Re-encode several images, in worker processes when there is more than one.
+
+    Args:
+        jobs (list): (source, target) pairs
+        workers (int, optional): Worker processes to use; 0 works in this process
+
+    Returns:
+        list: Result of transcode for every job
+    """
+    sources = [source for source, _ in jobs]
+    targets = [target for _, target in jobs]
+    if len(jobs) > 1 and workers != 0:
+        try:
+            with ProcessPoolExecutor(max_workers=workers or min(MAX_WORKERS, os.cpu_count() or 1)) as executor:
+                return list(executor.map(transcode, sources, targets, [fmt] * len(jobs),
+                                         [quality] * len(jobs), [max_size] * len(jobs)))
+        except Exception as e:
+            logger.warning(f"Transcoding workers failed, working in this process: {e}")
+    return [transcode(source, target, fmt, quality, max_size) for source, target in jobs]
@@ -6,13 +6,10 @@ import ctypes
 import logging
 import os
 import platform
-import random
 import shutil
 import subprocess
-from datetime import datetime
-from urllib.parse import urlparse
 
-import requests
+from . import display, providers, renderer
 
 logger = logging.getLogger(__name__)
 
@@ -29,78 +26,79 @@ class WallpaperHandler:
             os.makedirs(self.wallpaper_dir)
             logger.info(f"Created wallpaper directory: {self.wallpaper_dir}")
 
+        self._provider = None
+        self._provider_key = None
+        self._render_cache = renderer.RenderCache(os.path.join(self.wallpaper_dir, '.rendered'),
+                                                  smart_crop=config.get('smart_crop', True))
+
+    def get_provider(self):
+        """
+        Get the provider for the configured source.
+
+        The source may also be a list of sources, which are then queried in
+        parallel, preferring them in the order they are listed.
+        """
+        sources = self.config.get('source', 'wallpapers')
+        if isinstance(sources, str):
+            sources = [sources]
+        random_order = self.config.get('random', True)
+        key = (tuple(sources), random_order)
+        if self._provider is not None and self._provider_key == key:
+            return self._provider
+
+        built = [
+            provider for provider in
+            (providers.provider_for_source(source, self.wallpaper_dir, random_order) for source in sources)
+            if provider is not None
+        ]
+        if not built:
+            return None
+        if len(built) == 1:
+            provider = built[0]
+        else:
+            provider = providers.CompositeProvider(
+                built, timeout=self.config.get('source_timeout', providers.DEFAULT_TIMEOUT))
+
+        if self._provider is not None:
+            self._provider.close()
+        self._provider, self._provider_key = provider, key
+        return provider
+
     def get_wallpaper_path(self):
         """Get a path to the next wallpaper"""
-        source = self.config.get('source', 'wallpapers')
-        
-        # If source is a URL, download a new wallpaper
-        if source.startswith(('http://', 'https://')):
-            return self.download_wallpaper(source)
-        
-        # If source is a specific file, return it if it exists
-        if os.path.isfile(source):
-            return source
-            
-        # If source is a local directory, select a file
-        if os.path.isdir(source):
-            return self.select_wallpaper_from_directory(source)
-        
-        # If we get here, the source doesn't exist or is invalid
-        logger.error(f"Invalid source configuration: {source}")
-        return None
+        provider = self.get_provider()
+        if provider is None:
+            return None
+        result = provider.fetch()
+        return result['file_path'] if result else None
     
     def select_wallpaper_from_directory(self, directory):
         """Select a wallpaper from the given directory"""
-        valid_extensions = ('.jpg', '.jpeg', '.png', '.bmp')
-        wallpapers = [
-            os.path.join(directory, f)
-            for f in os.listdir(directory)
-            if os.path.isfile(os.path.join(directory, f)) and
-            f.lower().endswith(valid_extensions)
-        ]
-        
-        if not wallpapers:
-            logger.error(f"No valid wallpapers found in directory: {directory}")
-            return None
-            
-        if self.config.get('random', True):
-            return random.choice(wallpapers)
-        else:
-            # Return the most recently added file
-            return max(wallpapers, key=os.path.getctime)
+        return providers.DirectoryProvider(directory, self.config.get('random', True)).select()
     
     def download_wallpaper(self, url):
         """Download a wallpaper from the given URL"""
-        try:
-            # If URL is a specific image
-            if urlparse(url).path.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp')):
-                response = requests.get(url, stream=True)
-                if response.status_code == 200:
-                    # Save with timestamp to avoid duplicates
-                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                    filename = f"wallpaper_{timestamp}{os.path.splitext(urlparse(url).path)[1]}"
-                    filepath = os.path.join(self.wallpaper_dir, filename)
-                    
-                    with open(filepath, 'wb') as file:
-                        response.raw.decode_content = True
-                        shutil.copyfileobj(response.raw, file)
-                    
-                    logger.info(f"Downloaded wallpaper to {filepath}")
-                    return filepath
-            
-            # If URL is an API or service (should implement specific APIs here)
-            logger.error(f"URL does not point to a direct image: {url}")
-            return None
-            
-        except Exception as e:
-            logger.error(f"Error downloading wallpaper from {url}: {e}")
-            return None
+        return providers.ImageUrlProvider(url, self.wallpaper_dir).download()
             
+    def render_wallpaper(self, wallpaper_path):
+        """
+        Get a copy of the wallpaper pre-fitted to the screen for the configured fit mode.
+
+        Falls back to the original file when the screen size is unknown or
+        the image cannot be rendered.
+        """
+        screen_size = display.get_screen_size()
+        if not screen_size:
+            return wallpaper_path
+        fit_mode = self.config.get('fit_mode', renderer.DEFAULT_FIT_MODE)
+        return self._render_cache.render(wallpaper_path, screen_size, fit_mode) or wallpaper_path
+
     def set_wallpaper(self, wallpaper_path):
         """Set the desktop wallpaper based on the operating system"""
         if not wallpaper_path or not os.path.isfile(wallpaper_path):
             logger.error(f"Invalid wallpaper path: {wallpaper_path}")
             return False
+        wallpaper_path = self.render_wallpaper(wallpaper_path)
             
         try:
             if self.system == "Windows":
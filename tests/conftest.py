@@ -59,6 +59,31 @@ def mock_logger(monkeypatch):
     
     return mock_logger
 
+@pytest.fixture(autouse=True)
+def isolated_rate_limiter(monkeypatch, tmp_path):
+    """Give every test a fresh API key pool whose quota is not shared with real instances"""
+    monkeypatch.setenv('WALLPAPER_RATE_LIMIT_FILE', str(tmp_path / 'rate_limit.json'))
+    monkeypatch.setenv('WALLPAPER_CATALOG_FILE', str(tmp_path / 'catalog.db'))
+    monkeypatch.setenv('WALLPAPER_HASH_DIR', str(tmp_path / 'hashes'))
+    monkeypatch.setenv('WALLPAPER_SEEN_FILE', str(tmp_path / 'seen.bloom'))
+    monkeypatch.setenv('UNSPLASH_ACCESS_KEYS', 'test-access-key')
+    monkeypatch.delenv('UNSPLASH_ACCESS_KEY', raising=False)
+    # The package may be imported both as wallpaper_changer and src.wallpaper_changer.
+    # Manual presses and API failures must not leak into the next test either.
+    for package in ('wallpaper_changer', 'src.wallpaper_changer'):
+        for module_name, attribute in (('key_pool', '_default_pool'), ('scheduler', '_default_scheduler'),
+                                       ('circuit_breaker', '_default_breaker')):
+            module = sys.modules.get(f'{package}.{module_name}')
+            if module is not None:
+                monkeypatch.setattr(module, attribute, None)
+    for module_name, attribute in (('src.catalog', '_default_catalog'), ('src.photo_filter', '_default_filter'),
+                                   ('src.perceptual_hash', '_default_detector'),
+                                   ('src.seen_filter', '_default_seen_filter')):
+        module = sys.modules.get(module_name)
+        if module is not None:
+            monkeypatch.setattr(module, attribute, None)
+    yield
+
 @pytest.fixture
 def temp_directory():
     """Create a temporary directory for tests and clean it up after"""
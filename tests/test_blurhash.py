@@ -0,0 +1,53 @@
+"""
+Tests for the wallpaper_changer.blurhash module
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from src.wallpaper_changer import blurhash
+from tests.test_image_loader import real_pillow
+
+# Example hash from the BlurHash documentation
+EXAMPLE = "LEHV6nWB2yk8pyo0adR*.7kCMdnj"
+
+
+class TestDecode(unittest.TestCase):
+    def test_single_component_is_flat(self):
+        pixels = blurhash.decode("00FPjV", 4, 2)
+        self.assertEqual(pixels.shape, (2, 4, 3))
+        self.assertEqual(pixels.reshape(-1, 3).tolist(), [[133, 142, 156]] * 8)
+
+    def test_average_color_is_the_dc_component(self):
+        pixels = blurhash.decode(EXAMPLE, 32, 32)
+        self.assertEqual(pixels.shape, (32, 32, 3))
+        # DC component "HV6n" is rgb(151, 150, 149)
+        for channel, expected in zip(pixels.mean(axis=(0, 1)), (151, 150, 149)):
+            self.assertAlmostEqual(channel, expected, delta=3)
+        self.assertGreater(int(pixels.max()) - int(pixels.min()), 40)
+
+    def test_invalid_hashes(self):
+        for value in ("", "LEHV6", EXAMPLE[:-1], "LEHV6nWB2yk8pyo0adR*.7kCMdné"):
+            with self.assertRaises(ValueError):
+                blurhash.decode(value, 8, 8)
+
+
+class TestRenderPlaceholder(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_placeholder_fills_screen(self):
+        with real_pillow() as Image:
+            target = os.path.join(self.temp_dir, "placeholder.jpg")
+            self.assertTrue(blurhash.render_placeholder(EXAMPLE, (640, 360), target, aspect=1.5))
+            with Image.open(target) as img:
+                self.assertEqual(img.size, (640, 360))
+            self.assertFalse(blurhash.render_placeholder("bogus", (640, 360), target))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+"""
+Tests for the catalog module
+"""
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from src import catalog, prefetch
+from src.catalog import PhotoCatalog
+
+
+def photo(photo_id, **fields):
+    record = {'id': photo_id, 'width': 4000, 'height': 3000, 'color': '#0c2640', 'blur_hash': 'LKO2?U%2Tw=w',
+              'likes': 12, 'description': 'A forest', 'urls': {'raw': f'https://example.com/{photo_id}'}}
+    record.update(fields)
+    return record
+
+
+class TestPhotoCatalog(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.catalog = PhotoCatalog(os.path.join(self.temp_dir, "catalog.db"))
+
+    def tearDown(self):
+        self.catalog.close()
+        shutil.rmtree(self.temp_dir)
+
+    def cached_file(self, name):
+        path = os.path.join(self.temp_dir, name)
+        with open(path, 'wb') as f:
+            f.write(b'image')
+        return path
+
+    def test_record_keeps_api_metadata(self):
+        self.assertEqual(self.catalog.record_many([photo('a'), {'urls': {}}], "nature"), ['a', None])
+
+        entry = self.catalog.get('a')
+        self.assertEqual(entry['category'], "nature")
+        self.assertEqual((entry['width'], entry['height']), (4000, 3000))
+        self.assertEqual(entry['color'], '#0c2640')
+        self.assertEqual(entry['blur_hash'], 'LKO2?U%2Tw=w')
+        self.assertEqual(entry['image_url'], 'https://example.com/a')
+
+    def test_record_again_keeps_local_state(self):
+        self.catalog.record(photo('a'), "nature")
+        self.catalog.mark_shown('a', timestamp=100)
+        self.catalog.record(photo('a', likes=20), "nature")
+
+        entry = self.catalog.get('a')
+        self.assertEqual(entry['likes'], 20)
+        self.assertEqual(entry['shown_at'], 100)
+        self.assertEqual(entry['shown_count'], 1)
+
+    def test_shown_ids_and_history(self):
+        self.catalog.record_many([photo('a'), photo('b'), photo('c')], "nature")
+        self.catalog.mark_shown('a', timestamp=100)
+        self.catalog.mark_shown('c', timestamp=200)
+
+        self.assertEqual(self.catalog.shown_ids(['a', 'b', 'c', 'unknown']), {'a', 'c'})
+        self.assertEqual([entry['id'] for entry in self.catalog.history()], ['c', 'a'])
+
+    def test_select_prefers_least_recently_shown(self):
+        self.catalog.record_many([photo('a'), photo('b'), photo('small', width=800)], "nature")
+        self.catalog.record(photo('other'), "city")
+        for photo_id in ('a', 'b', 'small', 'other'):
+            self.catalog.set_cache_path(photo_id, self.cached_file(photo_id + ".jpg"))
+        self.catalog.mark_shown('a', timestamp=100)
+
+        self.assertEqual(self.catalog.select("nature", min_width=1920)['id'], 'b')
+        self.catalog.mark_shown('b', timestamp=200)
+        self.assertEqual(self.catalog.select("nature", min_width=1920)['id'], 'a')
+        self.assertEqual(self.catalog.select("city")['id'], 'other')
+        self.assertIsNone(self.catalog.select("space"))
+
+    def test_select_skips_excluded_ids(self):
+        self.catalog.record_many([photo('a'), photo('b')], "nature")
+        for photo_id in ('a', 'b'):
+            self.catalog.set_cache_path(photo_id, self.cached_file(photo_id + ".jpg"))
+        self.catalog.mark_shown('b', timestamp=100)
+
+        self.assertEqual(self.catalog.select("nature", exclude=['a'])['id'], 'b')
+        self.assertIsNone(self.catalog.select("nature", exclude={'a', 'b'}))
+
+    def test_provider_gives_up_when_missing_files_cannot_be_forgotten(self):
+        self.catalog.record_many([photo('a'), photo('b')], "nature")
+        for photo_id in ('a', 'b'):
+            self.catalog.set_cache_path(photo_id, os.path.join(self.temp_dir, "gone", photo_id + ".jpg"))
+
+        # A failed UPDATE leaves the missing files in the catalog
+        with patch.object(self.catalog, 'set_cache_path') as mock_set_cache_path:
+            self.assertIsNone(prefetch.CatalogProvider(self.catalog).fetch("nature"))
+        self.assertEqual({call[0][0] for call in mock_set_cache_path.call_args_list}, {'a', 'b'})
+
+    def test_select_by_luminance(self):
+        self.catalog.record_many([photo('dark'), photo('light', color='#f0e8e0'), photo('unknown', color=None)])
+        for photo_id in ('dark', 'light', 'unknown'):
+            self.catalog.set_cache_path(photo_id, self.cached_file(photo_id + ".jpg"))
+        self.assertEqual(len(self.catalog.unmeasured()), 3)
+
+        self.assertEqual(self.catalog.select(luminance_range=(None, 90))['id'], 'dark')
+        self.assertEqual(self.catalog.select(luminance_range=(140, None))['id'], 'light')
+
+        # A measured image overrides the dominant color, even when recorded again
+        self.catalog.set_luminance('unknown', 30.0, 45.0)
+        self.catalog.set_luminance('dark', 160.0, 10.0)
+        self.catalog.record(photo('dark'))
+        self.assertEqual(self.catalog.select(luminance_range=(None, 90))['id'], 'unknown')
+        self.assertIsNone(self.catalog.select(luminance_range=(140, None), min_contrast=20))
+        self.assertEqual([entry['id'] for entry in self.catalog.unmeasured()], ['light'])
+
+    def test_older_catalog_is_migrated(self):
+        self.catalog.close()
+        path = os.path.join(self.temp_dir, "old.db")
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE photos (id TEXT PRIMARY KEY, category TEXT, width INTEGER, height INTEGER, "
+                     "color TEXT, blur_hash TEXT, likes INTEGER, description TEXT, image_url TEXT, "
+                     "cache_path TEXT, added_at REAL NOT NULL, shown_at REAL, "
+                     "shown_count INTEGER NOT NULL DEFAULT 0, saved_path TEXT)")
+        conn.execute("INSERT INTO photos (id, added_at) VALUES ('old', 1)")
+        conn.commit()
+        conn.close()
+
+        self.catalog = PhotoCatalog(path)
+        self.catalog.set_luminance('old', 50.0, 20.0)
+        self.assertEqual(self.catalog.get('old')['luminance'], 50.0)
+
+    def test_saved_and_lookup_by_path(self):
+        self.catalog.record(photo('a'))
+        path = self.cached_file("a.jpg")
+        self.catalog.set_cache_path('a', path)
+        self.catalog.mark_saved('a', os.path.join(self.temp_dir, "wallpaper-001.jpg"))
+
+        self.assertEqual(self.catalog.find_by_path(path)['id'], 'a')
+        self.assertEqual([entry['id'] for entry in self.catalog.saved()], ['a'])
+
+    def test_default_catalog_is_shared(self):
+        self.assertIs(catalog.get_catalog(), catalog.get_catalog())
+        catalog.close_catalog()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+"""
+Tests for the wallpaper_changer.circuit_breaker module
+"""
+import unittest
+from unittest.mock import patch
+
+from src.wallpaper_changer import circuit_breaker
+from src.wallpaper_changer.circuit_breaker import CircuitBreaker
+
+
+@patch('src.wallpaper_changer.circuit_breaker.random.uniform', side_effect=lambda low, high: high)
+@patch('src.wallpaper_changer.circuit_breaker.time.time', return_value=1000)
+class TestCircuitBreaker(unittest.TestCase):
+    """Test cases for the API circuit breaker"""
+
+    def breaker(self):
+        return CircuitBreaker(failure_threshold=2, base_delay=10, max_delay=40)
+
+    def test_opens_after_consecutive_failures(self, mock_time, mock_uniform):
+        """Test that a single failure does not open the circuit"""
+        breaker = self.breaker()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, circuit_breaker.CLOSED)
+        self.assertTrue(breaker.allow_request())
+
+        breaker.record_failure()
+        self.assertEqual(breaker.state, circuit_breaker.OPEN)
+        self.assertFalse(breaker.allow_request())
+        self.assertEqual(breaker.retry_after(), 10)
+
+    def test_success_resets_failure_count(self, mock_time, mock_uniform):
+        """Test that failures must be consecutive"""
+        breaker = self.breaker()
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, circuit_breaker.CLOSED)
+
+    def test_half_open_allows_a_single_probe(self, mock_time, mock_uniform):
+        """Test that only one request probes the API after the delay"""
+        breaker = self.breaker()
+        breaker.record_failure()
+        breaker.record_failure()
+
+        mock_time.return_value = 1010
+        self.assertEqual(breaker.state, circuit_breaker.HALF_OPEN)
+        self.assertTrue(breaker.is_available())
+        self.assertTrue(breaker.allow_request())
+        self.assertFalse(breaker.allow_request())
+
+        breaker.record_success()
+        self.assertEqual(breaker.state, circuit_breaker.CLOSED)
+        self.assertTrue(breaker.allow_request())
+
+    def test_failed_probe_doubles_delay(self, mock_time, mock_uniform):
+        """Test the exponential backoff and its upper bound"""
+        breaker = self.breaker()
+        breaker.record_failure()
+        breaker.record_failure()
+
+        delays = []
+        for _ in range(3):
+            mock_time.return_value += breaker.retry_after()
+            self.assertTrue(breaker.allow_request())
+            breaker.record_failure()
+            delays.append(breaker.retry_after())
+        self.assertEqual(delays, [20, 40, 40])
+
+    def test_delay_is_jittered(self, mock_time, mock_uniform):
+        """Test that the delay is drawn between half and all of the backoff"""
+        breaker = self.breaker()
+        breaker.record_failure()
+        breaker.record_failure()
+        mock_uniform.assert_called_with(5, 10)
+
+    def test_release_returns_probe_slot(self, mock_time, mock_uniform):
+        """Test that an unused probe can be taken again"""
+        breaker = self.breaker()
+        breaker.record_failure()
+        breaker.record_failure()
+        mock_time.return_value = 1010
+
+        self.assertTrue(breaker.allow_request())
+        breaker.release()
+        self.assertTrue(breaker.allow_request())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -56,3 +56,25 @@ class TestCLIExtended:
             from src.cli import run_cli
             run_cli()
             mock_handle_auto_mode.assert_called_once()
+
+    @patch('src.cli.update_wallpaper')
+    @patch('src.cli.thumbnails.ThumbnailPack')
+    def test_thumbnails_command(self, mock_pack, mock_update_wallpaper):
+        mock_pack.return_value.update.return_value = {'added': 2, 'kept': 5, 'removed': 0}
+        with patch('sys.argv', ['script.py', '--thumbnails']):
+            from src.cli import run_cli
+            run_cli()
+            mock_pack.return_value.update.assert_called_once()
+            mock_update_wallpaper.assert_not_called()
+
+    @patch('src.cli.wallpaper.transcode_saved_library')
+    def test_transcode_saved_command(self, mock_transcode):
+        mock_transcode.return_value = {'transcoded': 3, 'skipped': 0, 'failed': 0, 'bytes_saved': 12 * 1024 * 1024}
+        with patch('sys.argv', ['script.py', '--transcode-saved']):
+            from src.cli import run_cli
+            run_cli()
+        mock_transcode.assert_called_once_with(None)
+
+        with patch('sys.argv', ['script.py', '--transcode-saved', 'gif']):
+            run_cli()
+        mock_transcode.assert_called_once()
@@ -0,0 +1,62 @@
+"""
+Tests for the wallpaper_changer.display module
+"""
+import unittest
+from unittest.mock import MagicMock, patch
+
+from src.wallpaper_changer import display
+
+
+class TestDisplay(unittest.TestCase):
+    """Test cases for screen resolution detection"""
+
+    def setUp(self):
+        display._detection_done = False
+        display._detected_size = None
+
+    def tearDown(self):
+        display._detection_done = False
+        display._detected_size = None
+
+    def test_parse_resolution(self):
+        """Test parsing resolutions from strings and tuples"""
+        self.assertEqual(display.parse_resolution("1920x1080"), (1920, 1080))
+        self.assertEqual(display.parse_resolution(" 2560 X 1440 "), (2560, 1440))
+        self.assertEqual(display.parse_resolution((1280, 720)), (1280, 720))
+        self.assertIsNone(display.parse_resolution(None))
+        self.assertIsNone(display.parse_resolution("wide"))
+        self.assertIsNone(display.parse_resolution("0x1080"))
+
+    @patch('src.wallpaper_changer.display.platform.system', return_value="Linux")
+    @patch('src.wallpaper_changer.display.subprocess.run')
+    def test_get_screen_size_linux(self, mock_run, mock_system):
+        """Test detecting the resolution of the primary output with xrandr"""
+        mock_run.return_value = MagicMock(stdout="Monitors: 2\n"
+                                                 " 0: +HDMI-1 1920/477x1080/268+0+0  HDMI-1\n"
+                                                 " 1: +*DP-1 2560/597x1440/336+1920+0  DP-1\n")
+
+        self.assertEqual(display.get_screen_size(), (2560, 1440))
+        # The result is cached
+        self.assertEqual(display.get_screen_size(), (2560, 1440))
+        mock_run.assert_called_once()
+
+    @patch('src.wallpaper_changer.display.platform.system', return_value="Linux")
+    @patch('src.wallpaper_changer.display.subprocess.run')
+    def test_get_screen_size_without_primary(self, mock_run, mock_system):
+        """Test that the first output is used when none is primary, not the whole virtual screen"""
+        mock_run.return_value = MagicMock(stdout="Monitors: 2\n"
+                                                 " 0: +HDMI-1 1920/477x1080/268+0+0  HDMI-1\n"
+                                                 " 1: +DP-1 1920/477x1080/268+1920+0  DP-1\n")
+        self.assertEqual(display.get_screen_size(), (1920, 1080))
+
+    @patch('src.wallpaper_changer.display.platform.system', return_value="Linux")
+    @patch('src.wallpaper_changer.display.subprocess.run', side_effect=FileNotFoundError)
+    def test_get_screen_size_failure_is_cached(self, mock_run, mock_system):
+        """Test that a failed detection is not retried on every call"""
+        self.assertIsNone(display.get_screen_size())
+        self.assertIsNone(display.get_screen_size())
+        mock_run.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+"""
+Tests for the wallpaper_changer.downloader module
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+import requests
+
+from src.wallpaper_changer import downloader
+
+
+def make_response(status_code, chunks=(), headers=None, fail_after=None):
+    """Build a fake streamed response, optionally dropping the connection midway"""
+    response = MagicMock()
+    response.status_code = status_code
+    response.headers = headers or {}
+
+    def iter_content(chunk_size):
+        for i, chunk in enumerate(chunks):
+            if fail_after is not None and i == fail_after:
+                raise requests.ConnectionError("Connection reset")
+            yield chunk
+
+    response.iter_content.side_effect = iter_content
+    return response
+
+
+@patch('src.wallpaper_changer.downloader.time.sleep')
+class TestDownloadFile(unittest.TestCase):
+    """Test cases for resumable downloads"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.temp_dir, "wallpaper.jpg")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def read(self):
+        with open(self.file_path, 'rb') as f:
+            return f.read()
+
+    @patch('src.wallpaper_changer.downloader.http_client.get')
+    def test_download_success(self, mock_get, mock_sleep):
+        """Test that a complete download is renamed into place"""
+        mock_get.return_value = make_response(200, [b'abc', b'def'], {'Content-Length': '6'})
+
+        self.assertTrue(downloader.download_file("https://example.com/a", self.file_path))
+
+        self.assertEqual(self.read(), b'abcdef')
+        self.assertFalse(os.path.exists(self.file_path + downloader.PART_SUFFIX))
+        mock_sleep.assert_not_called()
+
+    @patch('src.wallpaper_changer.downloader.http_client.get')
+    def test_resumes_with_range_request(self, mock_get, mock_sleep):
+        """Test that a dropped connection resumes from the bytes already written"""
+        mock_get.side_effect = [
+            make_response(200, [b'abc', b'def'], {'Content-Length': '6', 'ETag': '"v1"'}, fail_after=1),
+            make_response(206, [b'def'], {'Content-Range': 'bytes 3-5/6'}),
+        ]
+
+        self.assertTrue(downloader.download_file("https://example.com/a", self.file_path))
+
+        self.assertEqual(self.read(), b'abcdef')
+        retry_headers = mock_get.call_args_list[1][1]['headers']
+        self.assertEqual(retry_headers['Range'], 'bytes=3-')
+        self.assertEqual(retry_headers['If-Range'], '"v1"')
+        mock_sleep.assert_called_once_with(downloader.RETRY_DELAY)
+
+    @patch('src.wallpaper_changer.downloader.http_client.get')
+    def test_restarts_when_server_ignores_range(self, mock_get, mock_sleep):
+        """Test that a full 200 response to a Range request overwrites the partial file"""
+        mock_get.side_effect = [
+            make_response(200, [b'abc', b'def'], {'Content-Length': '6'}, fail_after=1),
+            make_response(200, [b'abcdef'], {'Content-Length': '6'}),
+        ]
+
+        self.assertTrue(downloader.download_file("https://example.com/a", self.file_path))
+        self.assertEqual(self.read(), b'abcdef')
+
+    @patch('src.wallpaper_changer.downloader.http_client.get')
+    def test_truncated_download_fails_after_retries(self, mock_get, mock_sleep):
+        """Test that a body shorter than Content-Length is never renamed into place"""
+        mock_get.side_effect = lambda *args, **kwargs: make_response(
+            200, [b'abc'], {'Content-Length': '6'})
+
+        self.assertFalse(downloader.download_file("https://example.com/a", self.file_path, attempts=2))
+
+        self.assertFalse(os.path.exists(self.file_path))
+        self.assertFalse(os.path.exists(self.file_path + downloader.PART_SUFFIX))
+        self.assertEqual(mock_get.call_count, 2)
+
+    @patch('src.wallpaper_changer.downloader.http_client.get')
+    def test_client_error_is_not_retried(self, mock_get, mock_sleep):
+        """Test that a 404 fails immediately"""
+        mock_get.return_value = make_response(404)
+
+        self.assertFalse(downloader.download_file("https://example.com/a", self.file_path))
+
+        self.assertFalse(os.path.exists(self.file_path))
+        mock_get.assert_called_once()
+
+    @patch('src.wallpaper_changer.downloader.http_client.get')
+    def test_validator_rejects_download(self, mock_get, mock_sleep):
+        """Test that a file rejected by the validator is discarded"""
+        mock_get.return_value = make_response(200, [b'not an image'])
+        validator = MagicMock(return_value=False)
+
+        self.assertFalse(downloader.download_file("https://example.com/a", self.file_path,
+                                                  validator=validator))
+
+        validator.assert_called_once_with(self.file_path + downloader.PART_SUFFIX)
+        self.assertFalse(os.path.exists(self.file_path))
+        self.assertFalse(os.path.exists(self.file_path + downloader.PART_SUFFIX))
+
+    @patch('src.wallpaper_changer.downloader.http_client.get')
+    def test_digest_is_computed_while_streaming(self, mock_get, mock_sleep):
+        """Test that the returned hash covers resumed and restarted downloads"""
+        mock_get.side_effect = [
+            make_response(200, [b'xyz', b'def'], {'Content-Length': '6'}, fail_after=1),
+            make_response(200, [b'abc', b'def'], {'Content-Length': '6', 'ETag': '"v2"'}, fail_after=1),
+            make_response(206, [b'def'], {'Content-Range': 'bytes 3-5/6'}),
+        ]
+
+        digest = downloader.download_verified("https://example.com/a", self.file_path)
+
+        self.assertEqual(digest, hashlib.sha256(b'abcdef').hexdigest())
+        self.assertEqual(self.read(), b'abcdef')
+
+    @patch('src.wallpaper_changer.downloader.http_client.get')
+    def test_rejected_download_is_handed_to_on_invalid(self, mock_get, mock_sleep):
+        """Test that on_invalid can keep a rejected file before it is discarded"""
+        mock_get.return_value = make_response(200, [b'not an image'])
+        kept = os.path.join(self.temp_dir, "rejected")
+
+        self.assertIsNone(downloader.download_verified("https://example.com/a", self.file_path,
+                                                       validator=lambda path: False,
+                                                       on_invalid=lambda path: os.replace(path, kept)))
+
+        with open(kept, 'rb') as f:
+            self.assertEqual(f.read(), b'not an image')
+        self.assertFalse(os.path.exists(self.file_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+"""
+Tests for the wallpaper_changer.http_client module
+"""
+import unittest
+from unittest.mock import MagicMock, patch
+
+from src.wallpaper_changer import http_client
+
+
+class TestHttpClient(unittest.TestCase):
+    """Test cases for the shared HTTP session"""
+
+    def setUp(self):
+        http_client.close_session()
+
+    def tearDown(self):
+        http_client.close_session()
+
+    def test_get_session_is_shared(self):
+        """Test that the same pooled session is returned every time"""
+        session = http_client.get_session()
+        self.assertIs(session, http_client.get_session())
+        adapter = session.get_adapter('https://api.unsplash.com')
+        self.assertIsInstance(adapter, http_client.PooledAdapter)
+        self.assertEqual(adapter.max_retries.total, http_client.MAX_RETRIES)
+
+    def test_adapter_applies_default_timeout(self):
+        """Test that requests without a timeout get the default one"""
+        adapter = http_client.PooledAdapter()
+        with patch('requests.adapters.HTTPAdapter.send') as mock_send:
+            adapter.send(MagicMock(), timeout=None)
+            self.assertEqual(mock_send.call_args[1]['timeout'], http_client.DEFAULT_TIMEOUT)
+
+            adapter.send(MagicMock(), timeout=3)
+            self.assertEqual(mock_send.call_args[1]['timeout'], 3)
+
+    def test_get_uses_shared_session(self):
+        """Test that get() goes through the shared session"""
+        session = http_client.get_session()
+        with patch.object(session, 'get') as mock_get:
+            http_client.get('https://example.com/image.jpg', stream=True)
+            mock_get.assert_called_once_with('https://example.com/image.jpg', stream=True)
+
+    def test_connection_stats(self):
+        """Test that reuse is computed from the per-host pools"""
+        self.assertEqual(http_client.connection_stats(),
+                         {'requests': 0, 'connections': 0, 'reused': 0})
+
+        adapter = http_client.get_session().get_adapter('https://')
+        pool = adapter.poolmanager.connection_from_url('https://images.unsplash.com')
+        pool.num_requests = 10
+        pool.num_connections = 2
+
+        stats = http_client.connection_stats()
+        self.assertEqual(stats['requests'], 10)
+        self.assertEqual(stats['connections'], 2)
+        self.assertEqual(stats['reused'], 8)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+"""
+Tests for the image_cache module
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from src.image_cache import ImageCache, content_key
+
+
+class TestImageCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.temp_dir, "cache")
+        self.cache = ImageCache(self.cache_dir, max_bytes=250)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _make_file(self, name, size):
+        path = os.path.join(self.temp_dir, name)
+        with open(path, 'wb') as f:
+            f.write(name.encode().ljust(size, b'x'))
+        return path
+
+    def _age(self, key, seconds):
+        path = self.cache.path_for(key)
+        stat = os.stat(path)
+        os.utime(path, (stat.st_atime - seconds, stat.st_mtime - seconds))
+
+    def test_put_and_get(self):
+        path = self.cache.put('photo1', self._make_file('a', 100))
+
+        self.assertEqual(path, self.cache.path_for('photo1'))
+        self.assertEqual(self.cache.get('photo1'), path)
+        self.assertIsNone(self.cache.get('missing'))
+        self.assertEqual(self.cache.size(), 100)
+
+    def test_put_without_key_uses_content_hash(self):
+        source = self._make_file('a', 100)
+        expected = content_key(source)
+
+        path = self.cache.put(None, source)
+
+        self.assertEqual(path, self.cache.path_for(expected))
+        self.assertTrue(expected.startswith('sha256-'))
+
+    def test_unsafe_keys_are_normalized(self):
+        path = self.cache.path_for('../../etc/passwd')
+        self.assertEqual(os.path.dirname(path), self.cache_dir)
+
+    def test_evicts_least_recently_used(self):
+        self.cache.put('old', self._make_file('a', 100))
+        self._age('old', 300)
+        self.cache.put('used', self._make_file('b', 100))
+        self._age('used', 200)
+        self.cache.get('used')  # Refreshes its LRU position
+
+        self.cache.put('new', self._make_file('c', 100))
+
+        self.assertFalse(self.cache.contains('old'))
+        self.assertTrue(self.cache.contains('used'))
+        self.assertTrue(self.cache.contains('new'))
+        self.assertEqual(self.cache.recent(), ['new', 'used'])
+
+    def test_pinned_images_are_not_evicted(self):
+        self.cache.put('old', self._make_file('a', 100))
+        self._age('old', 300)
+        self.cache.put('mid', self._make_file('b', 100))
+        self._age('mid', 200)
+        self.cache.pin('old')
+
+        self.cache.put('new', self._make_file('c', 100))
+
+        self.assertTrue(self.cache.contains('old'))
+        self.assertFalse(self.cache.contains('mid'))
+
+        self.cache.unpin('old')
+        self.cache.evict()
+        self.assertTrue(self.cache.contains('old'))  # Fits the budget again
+
+    def test_add_copy_keeps_original(self):
+        source = self._make_file('a', 100)
+
+        path = self.cache.add_copy('photo1', source)
+
+        self.assertTrue(os.path.exists(source))
+        self.assertTrue(os.path.exists(path))
+
+
+if __name__ == '__main__':
+    unittest.main()
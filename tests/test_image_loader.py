@@ -0,0 +1,79 @@
+"""
+Tests for the wallpaper_changer.image_loader module
+"""
+import contextlib
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from src.wallpaper_changer import image_loader
+
+
+@contextlib.contextmanager
+def real_pillow():
+    """Import the installed Pillow instead of the mock from conftest"""
+    with patch.dict(sys.modules):
+        for name in [name for name in sys.modules if name == 'PIL' or name.startswith('PIL.')]:
+            del sys.modules[name]
+        try:
+            from PIL import Image
+        except ImportError:
+            raise unittest.SkipTest("Pillow is not installed")
+        yield Image
+
+
+class TestDraftScale(unittest.TestCase):
+    def test_largest_reduction_covering_size(self):
+        self.assertEqual(image_loader._draft_scale((6000, 4000), (1920, 1080), 3, 10 ** 9), 2)
+        self.assertEqual(image_loader._draft_scale((6000, 4000), (128, 128), 1, 10 ** 9), 8)
+        self.assertEqual(image_loader._draft_scale((6000, 4000), None, 3, 10 ** 9), 1)
+
+    def test_memory_cap_wins_over_size(self):
+        self.assertEqual(image_loader._draft_scale((6000, 4000), None, 3, 20 * 1024 * 1024), 2)
+        self.assertIsNone(image_loader._draft_scale((6000, 4000), None, 3, 1000))
+
+
+class TestLoadImage(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_jpeg_is_decoded_at_reduced_scale(self):
+        with real_pillow() as Image:
+            path = os.path.join(self.temp_dir, "large.jpg")
+            Image.new("RGB", (4000, 3000), (200, 100, 50)).save(path)
+
+            img = image_loader.load_image(path, (480, 360), mode="L")
+            self.assertEqual(img.mode, "L")
+            self.assertEqual(img.size, (500, 375))
+
+            capped = image_loader.load_image(path, max_bytes=4000 * 3000)
+            self.assertEqual(capped.size, (2000, 1500))
+            self.assertEqual(capped.mode, "RGB")
+            self.assertEqual(image_loader.image_size(path), (4000, 3000))
+
+    def test_other_formats_are_reduced_after_decoding(self):
+        with real_pillow() as Image:
+            path = os.path.join(self.temp_dir, "image.png")
+            Image.new("P", (1200, 900)).save(path)
+
+            img = image_loader.load_image(path, (300, 200))
+            self.assertEqual((img.mode, img.size), ("RGB", (300, 225)))
+            self.assertIsNone(image_loader.load_image(path, max_bytes=1000))
+
+    def test_unreadable_files(self):
+        with real_pillow():
+            path = os.path.join(self.temp_dir, "broken.jpg")
+            with open(path, 'wb') as f:
+                f.write(b'not an image')
+            self.assertIsNone(image_loader.load_image(path))
+            self.assertIsNone(image_loader.image_size(os.path.join(self.temp_dir, "missing.jpg")))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,11 @@
+import hashlib
 import os
 import sys
 import unittest
 from unittest.mock import patch, MagicMock
 import tempfile
 import shutil
+import time
 
 # Add the src directory to the path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -13,6 +15,7 @@ sys.modules['keyboard'] = MagicMock()
 
 # Now it's safe to import modules that depend on keyboard
 from src import main, config, unsplash_api, wallpaper
+from src.image_cache import ImageCache
 
 class TestIntegration(unittest.TestCase):
     def setUp(self):
@@ -44,8 +47,16 @@ class TestIntegration(unittest.TestCase):
         shutil.rmtree(self.temp_dir)
     
     @patch('src.wallpaper.set_wallpaper')
-    @patch('requests.get')
+    @patch('src.unsplash_api.http_client.get')
+    @patch('src.unsplash_api.DEMO_MODE', False)
     def test_update_wallpaper_cmd(self, mock_get, mock_set_wallpaper):
+        cache = ImageCache(os.path.join(self.temp_dir, "cache"))
+
+        def fake_download(url, file_path):
+            with open(file_path, 'wb') as f:
+                f.write(b'downloaded wallpaper')
+            return hashlib.sha256(b'downloaded wallpaper').hexdigest()
+
         # Mock successful API response
         mock_response = MagicMock()
         mock_response.status_code = 200
@@ -55,41 +66,38 @@ class TestIntegration(unittest.TestCase):
                 "raw": "https://example.com/image"
             }
         }
-        
-        # Mock image download response
-        mock_img_response = MagicMock()
-        mock_img_response.status_code = 200
-        mock_img_response.iter_content.return_value = [b'new wallpaper data']
-        
-        # Configure the mock
-        mock_get.side_effect = [mock_response, mock_img_response]
+        mock_get.return_value = mock_response
+        unsplash_api.clear_photo_queues()
         
         # Call the main update function
-        main.requests_remaining = 50
-        main.hour_start = None
-        main.update_wallpaper_cmd("test", "nature")
+        with patch('src.prefetch.image_cache.get_cache', return_value=cache), \
+                patch('src.prefetch.download_image', side_effect=fake_download):
+            main.update_wallpaper_cmd("test", "nature")
         
-        # Check if wallpaper was set
+        # Check that the downloaded file was set, never the remote URL
         mock_set_wallpaper.assert_called_once()
+        self.assertTrue(os.path.isfile(mock_set_wallpaper.call_args[0][0]))
         
         # Check if rate limit was updated
-        self.assertEqual(main.requests_remaining, 49)
-        self.assertIsNotNone(main.hour_start)
+        self.assertEqual(main.key_pool.get_pool().remaining(), 49)
+        self.assertIsNotNone(main.key_pool.get_pool().seconds_until_reset())
+        unsplash_api.clear_photo_queues()
     
     def test_compute_auto_interval(self):
-        # Test fresh start (no hour_start)
-        main.hour_start = None
+        limiter = main.key_pool.get_pool()
+        
+        # Test fresh start (no quota window running)
         interval = main.compute_auto_interval()
         self.assertEqual(interval, 90.0)
         
         # Test with limited requests
-        main.hour_start = 100  # Some time value
-        main.requests_remaining = config.RESERVED_FOR_MANUAL + 1
+        limiter.observe({'X-Ratelimit-Remaining': str(main.scheduler.MIN_RESERVE + 1),
+                         'X-Ratelimit-Reset': str(int(time.time()) + 1800)})
         interval = main.compute_auto_interval()
         self.assertGreaterEqual(interval, 30.0)
         
         # Test with no usable requests
-        main.requests_remaining = config.RESERVED_FOR_MANUAL
+        limiter.observe({'X-Ratelimit-Remaining': str(main.scheduler.MIN_RESERVE)})
         interval = main.compute_auto_interval()
         self.assertEqual(interval, 600.0)
 
@@ -0,0 +1,102 @@
+"""
+Tests for the wallpaper_changer.integrity module
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from src.wallpaper_changer import integrity
+from tests.test_image_loader import real_pillow
+
+
+class TestValidateImage(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def path(self, name):
+        return os.path.join(self.temp_dir, name)
+
+    def truncated(self, source, name, tail=b''):
+        with open(source, 'rb') as f:
+            data = f.read()
+        with open(self.path(name), 'wb') as f:
+            f.write(data[:len(data) // 2] + tail)
+        return self.path(name)
+
+    def test_complete_images_are_valid(self):
+        with real_pillow() as Image:
+            Image.new("RGB", (640, 480), (10, 120, 200)).save(self.path("a.jpg"))
+            Image.new("RGB", (640, 480), (10, 120, 200)).save(self.path("a.png"))
+            self.assertIsNone(integrity.validate_image(self.path("a.jpg")))
+            self.assertIsNone(integrity.validate_image(self.path("a.png")))
+            self.assertTrue(integrity.has_end_marker(self.path("a.jpg")))
+
+    def test_truncated_images_are_rejected(self):
+        with real_pillow() as Image:
+            import numpy as np
+            pixels = np.random.default_rng(0).integers(0, 255, (480, 640, 3), dtype=np.uint8)
+            Image.fromarray(pixels).save(self.path("a.jpg"))
+            Image.fromarray(pixels).save(self.path("a.png"))
+
+            jpeg = self.truncated(self.path("a.jpg"), "cut.jpg")
+            # Pillow alone accepts the truncated JPEG
+            with Image.open(jpeg) as img:
+                img.verify()
+            self.assertEqual(integrity.validate_image(jpeg), "missing end marker")
+            self.assertEqual(integrity.validate_image(self.truncated(self.path("a.png"), "cut.png")),
+                             "missing end marker")
+
+            # An end marker pasted on does not hide the missing PNG chunks
+            with open(self.path("a.png"), 'rb') as f:
+                iend = f.read()[-12:]
+            reason = integrity.validate_image(self.truncated(self.path("a.png"), "patched.png", iend))
+            self.assertTrue(reason.startswith("not a valid image"))
+
+    def test_decode_check_is_bounded(self):
+        with real_pillow() as Image:
+            Image.new("RGB", (640, 480)).save(self.path("a.jpg"))
+            self.assertEqual(integrity.validate_image(self.path("a.jpg"), max_bytes=10), "could not be decoded")
+            self.assertIsNone(integrity.validate_image(self.path("a.jpg"), decode=False, max_bytes=10))
+
+    def test_empty_and_unknown_files(self):
+        open(self.path("empty.jpg"), 'wb').close()
+        self.assertEqual(integrity.validate_image(self.path("empty.jpg")), "empty file")
+        with open(self.path("other.bin"), 'wb') as f:
+            f.write(b'not an image')
+        self.assertIsNone(integrity.has_end_marker(self.path("other.bin")))
+        self.assertTrue(integrity.validate_image(self.path("missing.jpg")).startswith("unreadable"))
+
+
+class TestQuarantine(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.quarantine_dir = os.path.join(self.temp_dir, "quarantine")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    @patch.object(integrity, 'MAX_QUARANTINED', 2)
+    def test_files_are_moved_and_trimmed(self):
+        for index in range(3):
+            path = os.path.join(self.temp_dir, f"bad-{index}.jpg")
+            with open(path, 'wb') as f:
+                f.write(b'broken')
+            os.utime(path, (index, index))
+            target = integrity.quarantine(path, self.quarantine_dir, "missing end marker")
+            os.utime(target, (index, index))
+            self.assertFalse(os.path.exists(path))
+
+        self.assertEqual(sorted(name.split("-", 2)[-1] for name in os.listdir(self.quarantine_dir)),
+                         ["bad-1.jpg", "bad-2.jpg"])
+
+    def test_missing_file(self):
+        self.assertIsNone(integrity.quarantine(os.path.join(self.temp_dir, "gone.jpg"), self.quarantine_dir))
+
+
+if __name__ == '__main__':
+    unittest.main()
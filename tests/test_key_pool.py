@@ -0,0 +1,87 @@
+"""
+Tests for the wallpaper_changer.key_pool module
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from src.wallpaper_changer import key_pool
+from src.wallpaper_changer.key_pool import KeyPool
+
+
+class TestKeyPool(unittest.TestCase):
+    """Test cases for quota-aware access key rotation"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.env = patch.dict(os.environ, {
+            'WALLPAPER_RATE_LIMIT_FILE': os.path.join(self.temp_dir, "rate_limit.json")
+        })
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        shutil.rmtree(self.temp_dir)
+
+    def test_load_keys_from_environment(self):
+        """Test that keys are split, merged and deduplicated"""
+        with patch.dict(os.environ, {key_pool.KEYS_ENV: "first, second;third\nfirst",
+                                     key_pool.KEY_ENV: "fourth"}):
+            self.assertEqual(key_pool.load_keys(), ["first", "second", "third", "fourth"])
+
+    def test_keys_have_separate_state_files(self):
+        """Test that each key's quota is stored in its own file"""
+        first, second = key_pool.state_file_for("first"), key_pool.state_file_for("second")
+        self.assertNotEqual(first, second)
+        self.assertTrue(first.startswith(os.path.join(self.temp_dir, "rate_limit.")))
+        self.assertNotIn("first", os.path.basename(first))
+
+    def test_acquire_uses_key_with_most_budget(self):
+        """Test that requests go to the key with the most requests left"""
+        pool = KeyPool(["first", "second"])
+        pool.observe({'X-Ratelimit-Remaining': '3'}, "first")
+        pool.observe({'X-Ratelimit-Remaining': '10'}, "second")
+        self.assertEqual(pool.acquire(), "second")
+        self.assertEqual(pool.remaining(), 12)
+
+    def test_acquire_falls_back_when_key_is_spent(self):
+        """Test that a spent key is skipped and None is returned once all are spent"""
+        pool = KeyPool(["first", "second"])
+        pool.observe({'X-Ratelimit-Remaining': '0'}, "first")
+        pool.observe({'X-Ratelimit-Remaining': '1'}, "second")
+        self.assertEqual(pool.acquire(), "second")
+        self.assertIsNone(pool.acquire())
+        self.assertTrue(pool.exhausted())
+
+    def test_remove_rejected_key(self):
+        """Test that a removed key is no longer used"""
+        pool = KeyPool(["first", "second"])
+        pool.remove("first")
+        self.assertEqual(len(pool), 1)
+        self.assertEqual(pool.acquire(), "second")
+
+    def test_empty_pool(self):
+        """Test that a pool without keys is never exhausted and has no window"""
+        pool = KeyPool([])
+        self.assertIsNone(pool.acquire())
+        self.assertFalse(pool.exhausted())
+        self.assertIsNone(pool.seconds_until_reset())
+
+    @patch('src.wallpaper_changer.rate_limiter.time.time', return_value=1000)
+    def test_seconds_until_reset_combines_rates(self, mock_time):
+        """Test that the budgets of all keys are spread at their combined rate"""
+        pool = KeyPool(["first", "second"])
+        pool.observe({'X-Ratelimit-Remaining': '10', 'X-Ratelimit-Reset': '2000'}, "first")
+        pool.observe({'X-Ratelimit-Remaining': '10', 'X-Ratelimit-Reset': '3000'}, "second")
+        # 10/1000 + 10/2000 requests per second make 20 requests last 1333 seconds
+        self.assertAlmostEqual(pool.seconds_until_reset(), 20 / 0.015)
+
+        pool.observe({'X-Ratelimit-Remaining': '0', 'X-Ratelimit-Reset': '2000'}, "first")
+        pool.observe({'X-Ratelimit-Remaining': '0', 'X-Ratelimit-Reset': '3000'}, "second")
+        self.assertEqual(pool.seconds_until_reset(), 1000)
+
+
+if __name__ == '__main__':
+    unittest.main()
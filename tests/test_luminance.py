@@ -0,0 +1,133 @@
+"""
+Tests for the luminance module
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from src import config, luminance, prefetch
+from src.catalog import PhotoCatalog
+from tests.test_image_loader import real_pillow
+
+
+class TestMeasure(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_luminance_and_contrast(self):
+        with real_pillow() as Image:
+            flat = os.path.join(self.temp_dir, "flat.jpg")
+            Image.new("RGB", (3000, 2000), (20, 20, 20)).save(flat)
+            split = os.path.join(self.temp_dir, "split.png")
+            img = Image.new("L", (400, 400), 0)
+            img.paste(255, (0, 0, 200, 400))
+            img.save(split)
+
+            mean, contrast = luminance.measure(flat)
+            self.assertAlmostEqual(mean, 20, delta=2)
+            self.assertLess(contrast, 2)
+            mean, contrast = luminance.measure(split)
+            self.assertAlmostEqual(mean, 127.5, delta=1)
+            self.assertAlmostEqual(contrast, 127.5, delta=1)
+
+    def test_unreadable_image(self):
+        with real_pillow():
+            path = os.path.join(self.temp_dir, "broken.jpg")
+            with open(path, 'wb') as f:
+                f.write(b'not an image')
+            self.assertIsNone(luminance.measure(path))
+
+
+class TestTheme(unittest.TestCase):
+    def setUp(self):
+        self.original_theme = config.THEME
+        luminance._detected = None
+
+    def tearDown(self):
+        config.THEME = self.original_theme
+        luminance._detected = None
+
+    def test_configured_theme_wins_over_category(self):
+        config.THEME = None
+        self.assertEqual(luminance.current_theme("Night"), "dark")
+        self.assertIsNone(luminance.current_theme("nature"))
+        config.THEME = "light"
+        self.assertEqual(luminance.theme_range("night"), config.LIGHT_LUMINANCE_RANGE)
+
+    @patch('src.luminance.platform.system', return_value="Linux")
+    @patch('src.luminance.subprocess.run')
+    def test_auto_follows_desktop_then_time_of_day(self, mock_run, mock_system):
+        config.THEME = "auto"
+        mock_run.return_value = MagicMock(stdout="'prefer-dark'\n")
+        self.assertEqual(luminance.current_theme(), "dark")
+        self.assertEqual(luminance.current_theme(), "dark")
+        mock_run.assert_called_once()
+
+        luminance._detected = None
+        mock_run.side_effect = FileNotFoundError("gsettings")
+        with patch('src.luminance.is_night', return_value=False):
+            self.assertEqual(luminance.current_theme(), "light")
+
+    def test_night_hours_wrap_around_midnight(self):
+        self.assertTrue(luminance.is_night(23))
+        self.assertTrue(luminance.is_night(3))
+        self.assertFalse(luminance.is_night(12))
+
+    def test_preferred_index_uses_dominant_color(self):
+        photos = [{'color': '#ffffff'}, {}, {'color': '#102030'}]
+        self.assertEqual(luminance.preferred_index(photos, (None, 90)), 2)
+        self.assertEqual(luminance.preferred_index(photos, (250, None)), 0)
+        self.assertEqual(luminance.preferred_index(photos[1:2], (None, 90)), 0)
+        self.assertEqual(luminance.preferred_index(photos, None), 0)
+
+
+# The flat test images would be skipped as featureless
+@patch.object(config, 'MIN_EDGE_DENSITY', None)
+@patch.object(config, 'MIN_SHARPNESS', None)
+class TestCatalogSelection(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.catalog = PhotoCatalog(os.path.join(self.temp_dir, "catalog.db"))
+        self.original_theme = config.THEME
+        config.THEME = "dark"
+
+    def tearDown(self):
+        config.THEME = self.original_theme
+        self.catalog.close()
+        shutil.rmtree(self.temp_dir)
+
+    def cache(self, Image, photo_id, value, color):
+        path = os.path.join(self.temp_dir, f"{photo_id}.jpg")
+        Image.new("RGB", (1600, 1200), (value, value, value)).save(path)
+        self.catalog.record({'id': photo_id, 'color': color}, "nature")
+        self.catalog.set_cache_path(photo_id, path)
+        return path
+
+    def test_cached_images_are_measured_and_matched(self):
+        with real_pillow() as Image:
+            # The API color of 'night' is wrong; the measured image decides
+            self.cache(Image, 'day', 230, '#f0f0f0')
+            night = self.cache(Image, 'night', 15, '#f0f0f0')
+            self.catalog.mark_shown('day', timestamp=1)
+            self.catalog.mark_shown('night', timestamp=2)
+
+            prefetch.measure_cached_photos("nature", photo_catalog=self.catalog)
+            item = prefetch.CatalogProvider(self.catalog).fetch("nature")
+
+            self.assertEqual(item['file_path'], night)
+            self.assertEqual(self.catalog.unmeasured(), [])
+            self.assertLess(self.catalog.get('night')['luminance'], 30)
+
+    def test_falls_back_when_nothing_matches(self):
+        with real_pillow() as Image:
+            day = self.cache(Image, 'day', 230, '#f0f0f0')
+            self.assertEqual(prefetch.CatalogProvider(self.catalog).fetch("nature")['file_path'], day)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -15,61 +15,109 @@ from src import main, config
 
 class TestMain(unittest.TestCase):
     
+    def setUp(self):
+        main.unsplash_api.clear_photo_queues()
+    
     @patch('time.time')
     def test_compute_auto_interval_fresh_start(self, mock_time):
-        # Setup
+        # Setup: no request made yet, so no quota window is running
         mock_time.return_value = 1000
-        main.hour_start = None
-        main.requests_remaining = config.RATE_LIMIT_PER_HOUR
         
         # Execute
         interval = main.compute_auto_interval()
         
         # Assert
         self.assertEqual(interval, 90.0)
+        self.assertEqual(main.key_pool.get_pool().remaining(), config.RATE_LIMIT_PER_HOUR)
     
     @patch('time.time')
     def test_compute_auto_interval_hour_reset(self, mock_time):
         # Setup
-        mock_time.return_value = 5000
-        main.hour_start = 1000  # 4000 seconds ago
-        main.requests_remaining = 5
+        mock_time.return_value = 1000
+        limiter = main.key_pool.get_pool()
+        limiter.observe({'X-Ratelimit-Remaining': '5', 'X-Ratelimit-Reset': '4600'})
+        mock_time.return_value = 5000  # 400 seconds after the window reset
         
         # Execute
         interval = main.compute_auto_interval()
         
         # Assert
         self.assertEqual(interval, 90.0)
-        self.assertEqual(main.hour_start, 5000)
-        self.assertEqual(main.requests_remaining, config.RATE_LIMIT_PER_HOUR)
+        self.assertEqual(limiter.remaining(), config.RATE_LIMIT_PER_HOUR)
     
     @patch('time.time')
     def test_compute_auto_interval_no_usable_requests(self, mock_time):
         # Setup
         mock_time.return_value = 1500
-        main.hour_start = 1000
-        main.requests_remaining = config.RESERVED_FOR_MANUAL
+        main.key_pool.get_pool().observe({
+            'X-Ratelimit-Remaining': str(main.scheduler.MIN_RESERVE),
+            'X-Ratelimit-Reset': '4600',
+        })
         
         # Execute
         interval = main.compute_auto_interval()
         
-        # Assert
+        # Assert: wait for the reset, re-checking at least every 10 minutes
         self.assertEqual(interval, 600.0)
     
     @patch('time.time')
     def test_compute_auto_interval_normal(self, mock_time):
         # Setup
         mock_time.return_value = 1500
-        main.hour_start = 1000
-        usable_requests = 10
-        main.requests_remaining = config.RESERVED_FOR_MANUAL + usable_requests
+        usable_requests = 1
+        main.key_pool.get_pool().observe({
+            'X-Ratelimit-Remaining': str(main.scheduler.MIN_RESERVE + usable_requests),
+            'X-Ratelimit-Reset': '4600',  # Window started at 1000
+        })
         
         # Execute
         interval = main.compute_auto_interval()
         
-        # Assert
-        expected_interval = (3600 - 500) / usable_requests
+        # Assert: every request fills the queue with a batch of photos
+        expected_interval = (3600 - 500) / (usable_requests * main.unsplash_api.BATCH_SIZE)
         self.assertEqual(interval, expected_interval)
+    
+    @patch('time.time')
+    def test_compute_auto_interval_counts_queued_photos(self, mock_time):
+        # Setup: no usable request left, but a batch is still queued
+        mock_time.return_value = 1500
+        main.key_pool.get_pool().observe({
+            'X-Ratelimit-Remaining': str(main.scheduler.MIN_RESERVE),
+            'X-Ratelimit-Reset': '4600',
+        })
+        
+        # Execute
+        with patch.object(main.unsplash_api, 'queued_total', return_value=20):
+            interval = main.compute_auto_interval()
+        
+        # Assert
+        self.assertEqual(interval, (3600 - 500) / 20)
+    
+    @patch('time.time')
+    def test_compute_auto_interval_waits_for_imminent_reset(self, mock_time):
+        # Setup: quota spent, but the window resets in 100 seconds
+        mock_time.return_value = 4500
+        main.key_pool.get_pool().observe({'X-Ratelimit-Remaining': '0', 'X-Ratelimit-Reset': '4600'})
+        
+        # Execute
+        interval = main.compute_auto_interval()
+        
+        # Assert
+        self.assertEqual(interval, 100 + main.scheduler.RESET_MARGIN)
+    
+    def test_stop_prefetcher_stops_render_workers(self):
+        # Setup
+        prefetcher = MagicMock()
+        main.prefetcher = prefetcher
+        
+        # Execute
+        with patch.object(main.renderer, 'shutdown_workers') as mock_shutdown:
+            main.stop_prefetcher()
+        
+        # Assert
+        prefetcher.stop.assert_called_once()
+        mock_shutdown.assert_called_once()
+        self.assertIsNone(main.prefetcher)
 
 if __name__ == '__main__':
     unittest.main()
@@ -49,14 +49,16 @@ class TestRateLimiting:
     def test_compute_auto_interval_normal(self):
         """Test normal interval computation."""
         current_time = time.time()
-        # 50 requests remaining, 30 minutes into the hour, 5 reserved
-        interval = compute_auto_interval(
-            remaining_requests=50,
-            start_time=current_time-1800,  # 30 minutes ago
-            reserved_requests=5
-        )
-        # Should be approximately 45 requests over 30 minutes = 40 seconds per request
-        assert 35 <= interval <= 45
+        # 6 requests remaining, 30 minutes into the hour, 5 reserved
+        with patch('src.main.unsplash_api.queued_total', return_value=0), \
+                patch('src.main.unsplash_api.BATCH_SIZE', 30):
+            interval = compute_auto_interval(
+                remaining_requests=6,
+                start_time=current_time-1800,  # 30 minutes ago
+                reserved_requests=5
+            )
+        # Should be approximately 1 batch of 30 photos over 30 minutes = 60 seconds per update
+        assert 59 <= interval <= 61
         
     def test_compute_auto_interval_minimum_enforced(self):
         """Test minimum interval is enforced."""
@@ -78,19 +80,19 @@ class TestRateLimiting:
         
     def test_update_rate_limits_invalid(self):
         """Test handling invalid rate limit headers."""
+        update_rate_limits({'X-Ratelimit-Remaining': '50'})
         headers = {'X-Ratelimit-Remaining': 'invalid'}
-        with patch('src.main.requests_remaining', 50):
-            remaining = update_rate_limits(headers)
-            # Should not change the value since header is invalid
-            assert remaining == 50
+        remaining = update_rate_limits(headers)
+        # Should not change the value since header is invalid
+        assert remaining == 50
             
     def test_update_rate_limits_missing(self):
         """Test handling missing rate limit headers."""
+        update_rate_limits({'X-Ratelimit-Remaining': '30'})
         headers = {}
-        with patch('src.main.requests_remaining', 30):
-            remaining = update_rate_limits(headers)
-            # Should not change the value since header is missing
-            assert remaining == 30
+        remaining = update_rate_limits(headers)
+        # Should not change the value since header is missing
+        assert remaining == 30
 
 class TestUserInterface:
     """Tests for user interface and input handling."""
@@ -138,10 +140,10 @@ class TestUserInterface:
         mock_exit_flag.set.assert_called_once()
         
     @patch('src.main.is_desktop_foreground')
-    @patch('src.main.requests_remaining', 20)
     def test_process_key_press_manual_update(self, mock_is_desktop):
         """Test processing manual update key."""
         mock_is_desktop.return_value = True
+        update_rate_limits({'X-Ratelimit-Remaining': '20'})
         
         result = process_key_press('n')
         command, trigger, last_manual, last_print = result
@@ -151,10 +153,10 @@ class TestUserInterface:
         assert last_manual > 0  # Should have updated the timestamp
         
     @patch('src.main.is_desktop_foreground')
-    @patch('src.main.requests_remaining', 0)
     def test_process_key_press_no_requests(self, mock_is_desktop):
         """Test processing manual update with no requests left."""
         mock_is_desktop.return_value = True
+        update_rate_limits({'X-Ratelimit-Remaining': '0'})
         
         result = process_key_press('n')
         assert result[0] is None  # No command when no requests left
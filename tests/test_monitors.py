@@ -0,0 +1,44 @@
+"""
+Tests for the wallpaper_changer.monitors module
+"""
+import unittest
+from unittest.mock import MagicMock, patch
+
+from src.wallpaper_changer import monitors
+from src.wallpaper_changer.monitors import Monitor
+
+XRANDR_OUTPUT = """Monitors: 3
+ 0: +*DP-1 2560/597x1440/336+1920+0  DP-1
+ 1: +HDMI-1 1920/477x1080/268+0+180  HDMI-1
+ 2: +DP-2 1080/477x1920/268+4480+0  DP-2
+"""
+
+
+class TestMonitors(unittest.TestCase):
+    def test_parse_layout(self):
+        layout = monitors.parse_layout(["DP-1:2560x1440+1920+0", "1920x1080+0+180", "bogus",
+                                        {"width": 1080, "height": 1920, "x": 4480}])
+        self.assertEqual(layout, [Monitor("DP-1", 1920, 0, 2560, 1440), Monitor("monitor1", 0, 180, 1920, 1080),
+                                  Monitor("monitor3", 4480, 0, 1080, 1920)])
+
+    @patch('src.wallpaper_changer.monitors.platform.system', return_value="Linux")
+    @patch('src.wallpaper_changer.monitors.subprocess.run')
+    def test_detect_with_xrandr(self, mock_run, mock_system):
+        mock_run.return_value = MagicMock(stdout=XRANDR_OUTPUT)
+
+        layout = monitors.get_layout("auto")
+
+        self.assertEqual([monitor.name for monitor in layout], ["DP-1", "HDMI-1", "DP-2"])
+        self.assertTrue(layout[0].primary)
+        self.assertEqual(layout[1], Monitor("HDMI-1", 0, 180, 1920, 1080))
+        self.assertEqual(monitors.bounding_box(layout), (0, 0, 5560, 1920))
+
+    @patch('src.wallpaper_changer.monitors.platform.system', return_value="Linux")
+    @patch('src.wallpaper_changer.monitors.subprocess.run', side_effect=FileNotFoundError("xrandr"))
+    def test_detection_failure_means_single_screen(self, mock_run, mock_system):
+        self.assertEqual(monitors.get_layout("auto"), [])
+        self.assertEqual(monitors.get_layout(None), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+"""
+Tests for the perceptual_hash module
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+from src import perceptual_hash
+from src.perceptual_hash import DuplicateDetector, HashIndex
+
+
+def scene(seed):
+    """A smooth 32x32 test image made of a few bright and dark blobs"""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:32, 0:32]
+    pixels = np.full((32, 32), 128.0)
+    for _ in range(6):
+        cx, cy, radius, amplitude = rng.uniform(0, 32), rng.uniform(0, 32), rng.uniform(3, 10), rng.uniform(-100, 100)
+        pixels += amplitude * np.exp(-((x - cx) ** 2 + (y - cy) ** 2) / (2 * radius ** 2))
+    return pixels
+
+
+class TestPhash(unittest.TestCase):
+    def distance(self, a, b):
+        return bin(a ^ b).count("1")
+
+    def test_similar_images_have_close_hashes(self):
+        original = scene(1)
+        noisy = original + np.random.default_rng(1).normal(0, 1, original.shape)
+        brighter = original * 0.9 + 20
+
+        value = perceptual_hash.phash_pixels(original)
+        self.assertLessEqual(self.distance(value, perceptual_hash.phash_pixels(noisy)), 8)
+        self.assertLessEqual(self.distance(value, perceptual_hash.phash_pixels(brighter)), 2)
+        self.assertGreater(self.distance(value, perceptual_hash.phash_pixels(scene(2))), 16)
+
+    def test_hamming_distances(self):
+        hashes = np.array([0, 0b1011, 2 ** 64 - 1], dtype=np.uint64)
+        self.assertEqual(perceptual_hash.hamming_distances(hashes, 0b1).tolist(), [1, 2, 63])
+
+
+class TestHashIndex(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_nearest_among_many_hashes(self):
+        rng = np.random.default_rng(0)
+        values = rng.integers(0, 2 ** 63, size=150_000, dtype=np.int64).astype(np.uint64)
+        index = HashIndex()
+        for position, value in enumerate(values[:3000]):
+            index.add(f"p{position}", int(value))
+        self.assertEqual(index.nearest(int(values[1234]) ^ 0b101), ("p1234", 2))
+
+        # Growing past the initial buffer keeps the packed array aligned with the keys
+        for position, value in enumerate(values[3000:], start=3000):
+            index.add(f"p{position}", int(value))
+        self.assertEqual(len(index), 150_000)
+        self.assertEqual(index.nearest(int(values[140_000]))[0], "p140000")
+        self.assertEqual(HashIndex().nearest(0), (None, None))
+
+    def test_capacity_keeps_newest(self):
+        index = HashIndex(capacity=2)
+        for key, value in (("a", 1), ("b", 2), ("c", 4)):
+            index.add(key, value)
+        self.assertIsNone(index.get("a"))
+        self.assertEqual((index.get("b"), index.get("c")), (2, 4))
+
+    def test_save_and_load(self):
+        path = os.path.join(self.temp_dir, "hashes", "recent.npz")
+        index = HashIndex(path)
+        index.add("a", 2 ** 64 - 1)
+        index.add("b", 5)
+        index.save()
+
+        loaded = HashIndex(path)
+        self.assertEqual(len(loaded), 2)
+        self.assertEqual(loaded.get("a"), 2 ** 64 - 1)
+        self.assertEqual(loaded.nearest(4), ("b", 1))
+
+
+class TestDuplicateDetector(unittest.TestCase):
+    def setUp(self):
+        self.detector = DuplicateDetector(HashIndex(), HashIndex(), max_distance=4)
+
+    @patch('src.perceptual_hash.phash')
+    def test_rejects_near_duplicates_of_recent_and_saved(self, mock_phash):
+        mock_phash.side_effect = lambda path: {'a.jpg': 0b11110000, 'a2.jpg': 0b11100000, 'b.jpg': 0xFF0000,
+                                               'saved.jpg': 2 ** 50, 'c.jpg': 2 ** 50 + 1}[path]
+        self.assertIsNone(self.detector.check('a.jpg', 'a'))
+        self.assertEqual(self.detector.check('a2.jpg', 'a2'), 'a')
+        self.assertIsNone(self.detector.check('b.jpg', 'b'))
+
+        self.detector.add_saved('saved.jpg', 'saved')
+        self.assertEqual(self.detector.check('c.jpg', 'c'), 'saved')
+
+        stats = self.detector.stats()
+        self.assertEqual((stats['checked'], stats['rejected']), (4, 2))
+        self.assertEqual((stats['recent'], stats['library']), (2, 1))
+
+    @patch('src.perceptual_hash.phash')
+    def test_unused_images_are_not_remembered(self, mock_phash):
+        mock_phash.side_effect = lambda path: {'a.jpg': 0b11110000, 'a2.jpg': 0b11100000}[path]
+        self.assertIsNone(self.detector.check('a.jpg', 'a', remember=False))
+        self.assertIsNone(self.detector.check('a2.jpg', 'a2', remember=False))
+        self.assertEqual(len(self.detector.recent), 0)
+
+        self.detector.remember('a.jpg', 'a')
+        self.assertEqual(self.detector.recent.get('a'), 0b11110000)
+        self.assertEqual(mock_phash.call_count, 2)
+
+    @patch('src.perceptual_hash.phash', return_value=None)
+    def test_unhashable_images_pass(self, mock_phash):
+        self.assertIsNone(self.detector.check('broken.jpg'))
+        self.assertIsNone(self.detector.check('broken.jpg'))
+
+    def test_disabled_by_config(self):
+        with patch('src.perceptual_hash.config.DUPLICATE_MAX_DISTANCE', None):
+            self.assertIsNone(perceptual_hash.get_detector())
+        self.assertIs(perceptual_hash.get_detector(), perceptual_hash.get_detector())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+"""
+Tests for the photo_filter module
+"""
+import unittest
+from unittest.mock import patch
+
+from src import photo_filter
+from src.photo_filter import PhotoFilter
+
+
+def photo(photo_id, width=4000, height=3000, color="#406080"):
+    return {'id': photo_id, 'width': width, 'height': height, 'color': color}
+
+
+class TestPhotoFilter(unittest.TestCase):
+    def test_brightness_of_dominant_color(self):
+        self.assertEqual(photo_filter.brightness("#000000"), 0)
+        self.assertAlmostEqual(photo_filter.brightness("#ffffff"), 255)
+        self.assertAlmostEqual(photo_filter.brightness("#fff"), 255)
+        self.assertIsNone(photo_filter.brightness("not a color"))
+
+    def test_rules(self):
+        rules = PhotoFilter(min_size=(1920, 1080), aspect_range=(1.0, 2.5), brightness_range=(None, 100))
+        self.assertIsNone(rules.check(photo('ok')))
+        self.assertEqual(rules.check(photo('tiny', 800, 600)), "resolution")
+        self.assertEqual(rules.check(photo('portrait', 3000, 4000)), "aspect")
+        self.assertEqual(rules.check(photo('bright', color="#f0f0f0")), "brightness")
+        # Missing metadata never rejects a photo
+        self.assertIsNone(rules.check({'id': 'demo'}))
+
+    def test_color_rule(self):
+        rules = PhotoFilter(color="#0c2640", color_distance=60)
+        self.assertIsNone(rules.check(photo('navy', color="#102a48")))
+        self.assertEqual(rules.check(photo('orange', color="#e08020")), "color")
+
+    def test_apply_reports_bandwidth_saved(self):
+        rules = PhotoFilter(aspect_range=(1.0, None))
+        accepted = rules.apply([photo('ok'), photo('portrait', 2000, 3000)], target_size=(1000, 1000))
+
+        self.assertEqual([p['id'] for p in accepted], ['ok'])
+        stats = rules.stats()
+        self.assertEqual(stats['checked'], 2)
+        self.assertEqual(stats['reasons'], {'aspect': 1})
+        # The portrait image would have been fetched as a 1000x1500 variant
+        self.assertEqual(stats['bytes_saved'], int(1000 * 1500 * photo_filter.ESTIMATED_BYTES_PER_PIXEL))
+
+    @patch('src.photo_filter.config.FILTER_MIN_RESOLUTION', "screen")
+    def test_from_config_uses_screen_size(self):
+        rules = photo_filter.from_config(target_size=(2560, 1440))
+        self.assertEqual(rules.min_size, (2560, 1440))
+
+
+if __name__ == '__main__':
+    unittest.main()
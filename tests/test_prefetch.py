@@ -0,0 +1,276 @@
+"""
+Tests for the prefetch module
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from src import config, image_cache, prefetch
+from src.image_cache import ImageCache
+
+
+def fake_download(url, file_path):
+    with open(file_path, 'wb') as f:
+        f.write(url.encode())
+    return hashlib.sha256(url.encode()).hexdigest()
+
+
+class TestDownloadImage(unittest.TestCase):
+    @patch('src.prefetch.downloader.download_verified', return_value="ab" * 32)
+    def test_download_image_validates_images(self, mock_download):
+        self.assertEqual(prefetch.download_image("https://example.com/a", "wallpaper.jpg"), "ab" * 32)
+        self.assertEqual(mock_download.call_args[1]['validator'], prefetch.is_valid_image)
+
+    @patch('src.prefetch.quarantine')
+    @patch('src.prefetch.downloader.download_verified')
+    def test_invalid_download_is_quarantined(self, mock_download, mock_quarantine):
+        def invalid(url, file_path, validator, on_invalid):
+            on_invalid(file_path + ".part")
+            return None
+        mock_download.side_effect = invalid
+
+        with self.assertRaises(prefetch.InvalidDownload):
+            prefetch.download_image("https://example.com/a", "wallpaper.jpg")
+        mock_quarantine.assert_called_once_with("wallpaper.jpg.part")
+
+        # A failed transfer is not the image's fault
+        mock_download.side_effect = None
+        mock_download.return_value = None
+        self.assertIsNone(prefetch.download_image("https://example.com/a", "wallpaper.jpg"))
+
+
+class TestFetchWallpaperFile(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache = ImageCache(self.temp_dir, max_bytes=1024 * 1024)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    @patch('src.prefetch.unsplash_api.next_photo')
+    def test_downloads_on_cache_miss_only(self, mock_next):
+        mock_next.return_value = ({'id': 'abc123', 'urls': {'full': 'https://example.com/abc'}}, {})
+
+        with patch('src.prefetch.download_image', side_effect=fake_download) as mock_download:
+            first = prefetch.fetch_wallpaper_file("nature", cache=self.cache)
+            second = prefetch.fetch_wallpaper_file("nature", cache=self.cache)
+
+        mock_download.assert_called_once()
+        self.assertEqual(first['file_path'], self.cache.path_for('abc123'))
+        self.assertEqual(second['file_path'], first['file_path'])
+        self.assertEqual(second['cache_key'], 'abc123')
+
+    @patch('src.prefetch.unsplash_api.next_photo')
+    def test_damaged_download_moves_on_to_next_photo(self, mock_next):
+        mock_next.side_effect = [({'id': photo_id, 'urls': {'full': f'https://example.com/{photo_id}'}}, {})
+                                 for photo_id in ('damaged', 'good')]
+
+        def download(url, file_path):
+            if url.endswith('damaged'):
+                raise prefetch.InvalidDownload(url)
+            return fake_download(url, file_path)
+
+        with patch('src.prefetch.download_image', side_effect=download):
+            item = prefetch.fetch_wallpaper_file("nature", cache=self.cache)
+
+        self.assertEqual(item['photo_id'], 'good')
+        self.assertIsNone(prefetch.downloading_photo())
+
+    @patch('src.prefetch.unsplash_api.next_photo')
+    def test_photo_without_id_is_content_addressed(self, mock_next):
+        mock_next.return_value = ({'urls': {'full': 'https://example.com/abc'}}, {})
+
+        with patch('src.prefetch.download_image', side_effect=fake_download):
+            item = prefetch.fetch_wallpaper_file(cache=self.cache)
+
+        # Keyed by the hash computed while downloading
+        self.assertEqual(item['cache_key'], image_cache.content_key(item['file_path']))
+        self.assertTrue(os.path.exists(item['file_path']))
+
+    @patch('src.prefetch.unsplash_api.next_photo')
+    def test_damaged_cached_image_is_quarantined_and_downloaded_again(self, mock_next):
+        mock_next.return_value = ({'id': 'abc123', 'urls': {'full': 'https://example.com/abc'}}, {})
+        with open(self.cache.path_for('abc123'), 'wb') as f:
+            f.write(b'\xff\xd8\xff\xe0 cut short')
+        quarantine_dir = os.path.join(self.temp_dir, "quarantine")
+
+        with patch('src.prefetch.download_image', side_effect=fake_download) as mock_download, \
+                patch.object(config, 'QUARANTINE_DIR', quarantine_dir):
+            item = prefetch.fetch_wallpaper_file("nature", cache=self.cache)
+
+        mock_download.assert_called_once()
+        self.assertEqual(item['file_path'], self.cache.path_for('abc123'))
+        self.assertEqual(len(os.listdir(quarantine_dir)), 1)
+
+    @patch('src.prefetch.unsplash_api.next_photo')
+    def test_skips_near_duplicates(self, mock_next):
+        mock_next.side_effect = [({'id': photo_id, 'urls': {'full': f'https://example.com/{photo_id}'}}, {})
+                                 for photo_id in ('a', 'a-copy', 'b')]
+        hashes = {'a': 0b1111, 'a-copy': 0b0111, 'b': 2 ** 40 - 1}
+
+        def phash(path):
+            return hashes[os.path.splitext(os.path.basename(path))[0]]
+
+        with patch('src.prefetch.download_image', side_effect=fake_download), \
+                patch('src.perceptual_hash.phash', side_effect=phash):
+            first = prefetch.fetch_wallpaper_file(cache=self.cache)
+            second = prefetch.fetch_wallpaper_file(cache=self.cache)
+
+        self.assertEqual(first['photo_id'], 'a')
+        self.assertEqual(second['photo_id'], 'b')
+
+
+class TestWallpaperPrefetcher(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache = ImageCache(self.temp_dir, max_bytes=1024 * 1024)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_matches(self):
+        prefetcher = prefetch.WallpaperPrefetcher("nature", cache=self.cache)
+        self.assertTrue(prefetcher.matches())
+        self.assertTrue(prefetcher.matches("nature"))
+        self.assertFalse(prefetcher.matches("city"))
+        self.assertFalse(prefetcher.matches(search_term="ocean"))
+
+    @patch('src.prefetch.unsplash_api.next_photo')
+    def test_take_returns_downloaded_wallpapers(self, mock_next):
+        ids = iter(range(100))
+
+        def next_photo(category, search_term):
+            i = next(ids)
+            return {'id': f'photo{i}', 'urls': {'full': f'https://example.com/photo{i}'}}, {'X-Ratelimit-Remaining': '40'}
+
+        mock_next.side_effect = next_photo
+
+        prefetcher = prefetch.WallpaperPrefetcher("nature", depth=2, cache=self.cache)
+        with patch('src.prefetch.download_image', side_effect=fake_download):
+            try:
+                first = prefetcher.take(timeout=5)
+                second = prefetcher.take(timeout=5)
+            finally:
+                prefetcher.stop()
+
+        self.assertEqual(first['source_url'], "https://example.com/photo0")
+        self.assertEqual(second['source_url'], "https://example.com/photo1")
+        self.assertEqual(second['headers'], {'X-Ratelimit-Remaining': '40'})
+        self.assertTrue(os.path.exists(second['file_path']))
+        # Only the wallpaper being shown stays pinned in the cache
+        self.assertNotIn('photo0', self.cache._pinned)
+        self.assertIn('photo1', self.cache._pinned)
+        mock_next.assert_called_with("nature", None)
+
+    @patch('src.prefetch.unsplash_api.next_photo')
+    def test_blur_hash_placeholder_while_downloading(self, mock_next):
+        photo = {'id': 'slow', 'blur_hash': 'LEHV6nWB2yk8pyo0adR*.7kCMdnj', 'urls': {'full': 'https://example.com/slow'}}
+        mock_next.return_value = (photo, {})
+        released = threading.Event()
+
+        def slow_download(url, file_path):
+            released.wait(5)
+            return fake_download(url, file_path)
+
+        prefetcher = prefetch.WallpaperPrefetcher("nature", depth=1, cache=self.cache)
+        with patch('src.prefetch.download_image', side_effect=slow_download), \
+                patch.object(prefetch.config, 'BLUR_PLACEHOLDER', True), \
+                patch('src.prefetch.wallpaper.set_placeholder', side_effect=lambda p: released.set()) as mock_set:
+            try:
+                prefetcher.start()
+                deadline = time.time() + 5
+                while prefetch.downloading_photo() is None and time.time() < deadline:
+                    time.sleep(0.01)
+                item = prefetcher.take(timeout=5)
+            finally:
+                prefetcher.stop()
+
+        mock_set.assert_called_once_with(photo)
+        self.assertEqual(item['photo_id'], 'slow')
+        self.assertIsNone(prefetch.downloading_photo())
+
+    @patch('src.prefetch.unsplash_api.next_photo')
+    def test_previous_wallpaper_replaces_placeholder_on_timeout(self, mock_next):
+        photo = {'id': 'stuck', 'blur_hash': 'LEHV6nWB2yk8pyo0adR*.7kCMdnj', 'urls': {'full': 'https://example.com/stuck'}}
+        mock_next.return_value = (photo, {})
+        released = threading.Event()
+        previous = self.cache.path_for('previous')
+        fake_download('https://example.com/previous', previous)
+
+        def stuck_download(url, file_path):
+            released.wait(5)
+            return None
+
+        prefetcher = prefetch.WallpaperPrefetcher("nature", depth=1, cache=self.cache)
+        prefetcher._current = {'file_path': previous, 'cache_key': None}
+        with patch('src.prefetch.download_image', side_effect=stuck_download), \
+                patch.object(prefetch.config, 'BLUR_PLACEHOLDER', True), \
+                patch('src.prefetch.wallpaper.set_placeholder', return_value=True) as mock_set, \
+                patch('src.prefetch.wallpaper.set_wallpaper') as mock_restore:
+            try:
+                prefetcher.start()
+                deadline = time.time() + 5
+                while prefetch.downloading_photo() is None and time.time() < deadline:
+                    time.sleep(0.01)
+                self.assertIsNone(prefetcher.take(timeout=0.2))
+            finally:
+                released.set()
+                prefetcher.stop()
+
+        mock_set.assert_called_once_with(photo)
+        mock_restore.assert_called_once_with(previous)
+
+    def test_cached_photos_are_measured_while_waiting_for_room(self):
+        provider = MagicMock()
+        provider.fetch.side_effect = lambda category, search_term: {'file_path': "wallpaper.jpg", 'cache_key': None}
+        prefetcher = prefetch.WallpaperPrefetcher("nature", depth=1, cache=self.cache, provider=provider)
+        with patch('src.prefetch.measure_cached_photos', side_effect=[3, 0]) as mock_measure:
+            try:
+                prefetcher.start()
+                deadline = time.time() + 5
+                while mock_measure.call_count < 2 and time.time() < deadline:
+                    time.sleep(0.01)
+                # Once caught up, the worker stops measuring
+                time.sleep(1.2)
+            finally:
+                prefetcher.stop()
+
+        self.assertEqual(mock_measure.call_count, 2)
+        mock_measure.assert_called_with("nature", None)
+
+    def test_seen_photos_get_no_placeholder(self):
+        prefetch.seen_filter.get_seen_filter().add('shown')
+        self.assertFalse(prefetch._previewable({'id': 'shown'}))
+        self.assertTrue(prefetch._previewable({'id': 'new'}))
+
+    @patch('src.prefetch.unsplash_api.next_photo', return_value=(None, {}))
+    def test_falls_back_to_cached_images(self, mock_next):
+        cached = self.cache.path_for('offline1')
+        fake_download('https://example.com/offline1', cached)
+
+        prefetcher = prefetch.WallpaperPrefetcher("nature", cache=self.cache)
+        try:
+            item = prefetcher.take(timeout=5)
+        finally:
+            prefetcher.stop()
+
+        self.assertEqual(item['file_path'], cached)
+        self.assertEqual(item['provider'], "cache")
+        self.assertEqual(item['cache_key'], 'offline1')
+
+    @patch('src.prefetch.unsplash_api.next_photo', return_value=(None, {}))
+    def test_take_times_out_when_nothing_ready(self, mock_next):
+        prefetcher = prefetch.WallpaperPrefetcher("nature", cache=self.cache)
+        try:
+            self.assertIsNone(prefetcher.take(timeout=0.1))
+        finally:
+            prefetcher.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
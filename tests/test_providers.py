@@ -0,0 +1,193 @@
+"""
+Tests for the wallpaper_changer.providers module
+"""
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+from src.wallpaper_changer import providers
+from src.wallpaper_changer.providers import CompositeProvider, Provider
+
+
+def fake_download(url, file_path, validator=None):
+    with open(file_path, 'wb') as f:
+        f.write(url.encode())
+    return True
+
+
+class StaticProvider(Provider):
+    """Provider returning a fixed file, optionally after waiting for an event"""
+
+    def __init__(self, name, file_path=None, gate=None, error=None):
+        self.name = name
+        self.file_path = file_path
+        self.gate = gate
+        self.error = error
+        self.calls = 0
+        self.accepted = []
+
+    def fetch(self, category=None, search_term=None):
+        self.calls += 1
+        if self.gate is not None:
+            self.gate.wait(5)
+        if self.error is not None:
+            raise self.error
+        return self._result(self.file_path) if self.file_path else None
+
+    def accept(self, result):
+        self.accepted.append(result['file_path'])
+
+
+class TestProviders(unittest.TestCase):
+    """Test cases for the individual wallpaper sources"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def touch(self, name):
+        path = os.path.join(self.temp_dir, name)
+        with open(path, 'wb') as f:
+            f.write(b'image')
+        return path
+
+    def test_provider_for_source(self):
+        """Test that each kind of source gets its provider"""
+        image = self.touch("a.jpg")
+        self.assertIsInstance(providers.provider_for_source(image, self.temp_dir), providers.FileProvider)
+        self.assertIsInstance(providers.provider_for_source(self.temp_dir, self.temp_dir),
+                              providers.DirectoryProvider)
+        self.assertIsInstance(providers.provider_for_source("https://example.com/a.png", self.temp_dir),
+                              providers.ImageUrlProvider)
+        self.assertIsInstance(providers.provider_for_source("https://example.com/list.json", self.temp_dir),
+                              providers.ManifestProvider)
+        self.assertIsNone(providers.provider_for_source("/nonexistent/path", self.temp_dir))
+
+    def test_directory_provider_skips_other_files(self):
+        """Test that only images are picked from a directory"""
+        image = self.touch("a.png")
+        self.touch("notes.txt")
+        result = providers.DirectoryProvider(self.temp_dir).fetch()
+        self.assertEqual(result['file_path'], image)
+        self.assertEqual(result['provider'], "directory")
+
+    @patch('src.wallpaper_changer.providers.downloader.download_file')
+    @patch('src.wallpaper_changer.providers.http_client.get')
+    def test_manifest_provider_matches_tags(self, mock_get, mock_download):
+        """Test that manifest entries tagged with the category are preferred"""
+        mock_get.return_value.json.return_value = {"images": [
+            "https://example.com/plain.jpg",
+            {"url": "https://example.com/forest.jpg", "tags": ["Nature"]},
+        ]}
+        mock_download.side_effect = fake_download
+
+        provider = providers.ManifestProvider("https://example.com/list.json", self.temp_dir)
+        result = provider.fetch("nature")
+        self.assertEqual(result['source_url'], "https://example.com/forest.jpg")
+        self.assertTrue(os.path.isfile(result['file_path']))
+
+        # The manifest and the downloaded image are both reused
+        provider.fetch("nature")
+        mock_get.assert_called_once()
+        mock_download.assert_called_once()
+
+    def test_cache_provider_serves_cached_images(self):
+        """Test that the offline provider returns an image from the cache"""
+        cache = MagicMock()
+        cache.recent.return_value = ["missing", "abc"]
+        cache.path_for.side_effect = lambda key: os.path.join(self.temp_dir, key + ".jpg")
+        self.touch("abc.jpg")
+
+        result = providers.CacheProvider(cache).fetch()
+        self.assertEqual(result['cache_key'], "abc")
+        self.assertEqual(providers.CacheProvider(MagicMock(recent=MagicMock(return_value=[]))).fetch(), None)
+
+
+class TestCompositeProvider(unittest.TestCase):
+    """Test cases for querying several sources at once"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.first = os.path.join(self.temp_dir, "first.jpg")
+        self.second = os.path.join(self.temp_dir, "second.jpg")
+        for path in (self.first, self.second):
+            with open(path, 'wb') as f:
+                f.write(b'image')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_prefers_sources_in_order(self):
+        """Test that a faster, less preferred result waits for the preferred source"""
+        gate = threading.Event()
+        composite = CompositeProvider([StaticProvider("slow", self.first, gate=gate),
+                                       StaticProvider("fast", self.second)], timeout=5)
+        threading.Timer(0.05, gate.set).start()
+        try:
+            self.assertEqual(composite.fetch()['file_path'], self.first)
+        finally:
+            composite.close()
+
+    def test_falls_back_when_preferred_source_fails(self):
+        """Test that errors and empty results give way to the next source"""
+        composite = CompositeProvider([StaticProvider("broken", error=IOError("down")),
+                                       StaticProvider("empty"),
+                                       StaticProvider("local", self.second)])
+        try:
+            self.assertEqual(composite.fetch()['provider'], "local")
+            stats = composite.stats()
+        finally:
+            composite.close()
+        self.assertEqual(stats['broken']['errors'], 1)
+        self.assertEqual(stats['empty']['misses'], 1)
+        self.assertEqual(stats['local']['hits'], 1)
+        self.assertIsNotNone(stats['local']['average_latency'])
+
+    def test_slow_source_does_not_stall(self):
+        """Test that the timeout caps the wait and a busy source is skipped"""
+        gate = threading.Event()
+        slow = StaticProvider("slow", self.first, gate=gate)
+        local = StaticProvider("local", self.second)
+        composite = CompositeProvider([slow, local], timeout=0.05)
+        try:
+            self.assertEqual(composite.fetch()['provider'], "local")
+            self.assertEqual(composite.stats()['slow']['timeouts'], 1)
+
+            # The slow source is still running, so it is not asked again
+            self.assertEqual(composite.fetch()['provider'], "local")
+            self.assertEqual(slow.calls, 1)
+        finally:
+            gate.set()
+            composite.close()
+        # Only results that were used are accepted
+        self.assertEqual(local.accepted, [self.second, self.second])
+        self.assertEqual(slow.accepted, [])
+
+    def test_invalid_results_are_rejected(self):
+        """Test that results failing the validator are not used"""
+        missing = os.path.join(self.temp_dir, "missing.jpg")
+        composite = CompositeProvider([StaticProvider("missing", missing)])
+        try:
+            self.assertIsNone(composite.fetch())
+        finally:
+            composite.close()
+
+    def test_unavailable_sources_are_skipped(self):
+        """Test that exhausted sources are not queried"""
+        exhausted = StaticProvider("exhausted", self.first)
+        exhausted.available = lambda: False
+        composite = CompositeProvider([exhausted, StaticProvider("local", self.second)])
+        try:
+            self.assertEqual(composite.fetch()['provider'], "local")
+        finally:
+            composite.close()
+        self.assertEqual(exhausted.calls, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
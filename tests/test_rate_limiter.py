@@ -0,0 +1,96 @@
+"""
+Tests for the wallpaper_changer.rate_limiter module
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from src.wallpaper_changer import rate_limiter
+from src.wallpaper_changer.rate_limiter import RateLimiter
+
+
+class TestRateLimiter(unittest.TestCase):
+    """Test cases for the shared token bucket"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.state_file = os.path.join(self.temp_dir, "rate_limit.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def limiter(self, **kwargs):
+        kwargs.setdefault('limit', 5)
+        kwargs.setdefault('lease_size', 2)
+        return RateLimiter(self.state_file, **kwargs)
+
+    def test_stops_when_quota_is_spent(self):
+        """Test that no more than the limit is granted"""
+        limiter = self.limiter()
+        granted = [limiter.try_acquire() for _ in range(7)]
+        self.assertEqual(granted, [True] * 5 + [False] * 2)
+        self.assertEqual(limiter.remaining(), 0)
+
+    def test_processes_share_the_quota(self):
+        """Test that two limiters on the same state file never overspend together"""
+        first, second = self.limiter(), self.limiter()
+        granted = 0
+        for _ in range(5):
+            granted += first.try_acquire()
+            granted += second.try_acquire()
+        self.assertEqual(granted, 5)
+
+    def test_leased_tokens_do_not_touch_disk(self):
+        """Test that the state file is only read when a lease runs out"""
+        limiter = self.limiter(lease_size=3)
+        with patch.object(limiter, '_read_state', wraps=limiter._read_state) as mock_read:
+            for _ in range(3):
+                self.assertTrue(limiter.try_acquire())
+        mock_read.assert_called_once()
+
+    def test_close_returns_unspent_tokens(self):
+        """Test that closing a limiter gives its lease back to other processes"""
+        first = self.limiter(lease_size=3)
+        first.try_acquire()
+        first.close()
+        self.assertEqual(self.limiter().remaining(), 4)
+
+    def test_headers_correct_the_estimate(self):
+        """Test that X-Ratelimit-Remaining lowers the shared bucket"""
+        limiter = self.limiter(limit=50)
+        self.assertTrue(limiter.try_acquire())
+        self.assertEqual(limiter.observe({'X-Ratelimit-Remaining': '1', 'X-Ratelimit-Limit': '50'}), 1)
+        self.assertTrue(limiter.try_acquire())
+        self.assertFalse(limiter.try_acquire())
+
+    def test_invalid_headers_are_ignored(self):
+        """Test that missing or invalid headers keep the current estimate"""
+        limiter = self.limiter()
+        self.assertIsNone(limiter.observe({'X-Ratelimit-Remaining': 'invalid'}))
+        self.assertEqual(limiter.remaining(), 5)
+
+    @patch('src.wallpaper_changer.rate_limiter.time.time')
+    def test_bucket_refills_when_window_resets(self, mock_time):
+        """Test that the reset timestamp from the headers refills the bucket"""
+        mock_time.return_value = 1000
+        limiter = self.limiter()
+        limiter.observe({'X-Ratelimit-Remaining': '0', 'X-Ratelimit-Reset': '1600'})
+        self.assertFalse(limiter.try_acquire())
+        self.assertEqual(limiter.seconds_until_reset(), 600)
+
+        mock_time.return_value = 1600
+        self.assertIsNone(limiter.seconds_until_reset())
+        self.assertTrue(limiter.try_acquire())
+
+    def test_first_request_starts_the_window(self):
+        """Test that a window is started when the server sends no reset time"""
+        limiter = self.limiter()
+        self.assertIsNone(limiter.seconds_until_reset())
+        limiter.try_acquire()
+        self.assertAlmostEqual(limiter.seconds_until_reset(), rate_limiter.WINDOW, delta=5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,157 @@
+"""
+Tests for the wallpaper_changer.renderer module
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from src.wallpaper_changer import renderer
+from src.wallpaper_changer.monitors import Monitor
+from src.wallpaper_changer.renderer import RenderCache
+from tests.test_image_loader import real_pillow
+
+
+class TestDecodeSize(unittest.TestCase):
+    def test_decode_size_per_fit_mode(self):
+        self.assertEqual(renderer.decode_size((6000, 4000), (1920, 1080), "fill"), (1920, 1280))
+        self.assertEqual(renderer.decode_size((6000, 4000), (1920, 1080), "fit"), (1620, 1080))
+        self.assertEqual(renderer.decode_size((6000, 4000), (1920, 1080), "stretch"), (1920, 1080))
+        self.assertIsNone(renderer.decode_size((6000, 4000), (1920, 1080), "tile"))
+
+
+class TestRenderCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache = RenderCache(os.path.join(self.temp_dir, "rendered"), max_entries=2)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_renders_every_fit_mode_to_screen_size(self):
+        with real_pillow() as Image:
+            source = os.path.join(self.temp_dir, "wide.jpg")
+            Image.new("RGB", (1200, 400), (255, 0, 0)).save(source)
+
+            for fit_mode in renderer.FIT_MODES:
+                with Image.open(self.cache.render(source, (320, 240), fit_mode)) as img:
+                    self.assertEqual(img.size, (320, 240), fit_mode)
+                    # Letterboxing leaves the top row black, filling covers it
+                    top = img.getpixel((160, 0))
+                    self.assertEqual(top[0] > 128, fit_mode != "fit", fit_mode)
+
+    def test_rendering_is_cached_and_bounded(self):
+        with real_pillow() as Image:
+            source = os.path.join(self.temp_dir, "image.png")
+            Image.new("RGB", (800, 600)).save(source)
+
+            first = self.cache.render(source, (400, 300), "fill")
+            self.assertEqual(self.cache.render(source, (400, 300), "fill"), first)
+            self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+            self.cache.render(source, (400, 300), "fit")
+            self.cache.render(source, (200, 100), "fill")
+            self.assertEqual(len(os.listdir(self.cache.cache_dir)), 2)
+
+    def test_unreadable_image(self):
+        with real_pillow():
+            source = os.path.join(self.temp_dir, "broken.jpg")
+            with open(source, 'wb') as f:
+                f.write(b'not an image')
+            self.assertIsNone(self.cache.render(source, (400, 300), "fill"))
+
+
+class TestSmartCrop(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.temp_dir, "rendered")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_fill_keeps_the_detail_and_remembers_the_window(self):
+        with real_pillow() as Image:
+            source = os.path.join(self.temp_dir, "wide.png")
+            img = Image.new("RGB", (1200, 400), (0, 0, 0))
+            img.paste(Image.effect_noise((200, 200), 100).convert("RGB"), (950, 100))
+            img.save(source)
+
+            plain = RenderCache(self.cache_dir).render(source, (400, 300), "fill")
+            smart = RenderCache(self.cache_dir, smart_crop=True).render(source, (400, 300), "fill")
+            self.assertNotEqual(plain, smart)
+            with Image.open(plain) as rendered:
+                self.assertEqual(rendered.getextrema()[0][1], 0)
+            with Image.open(smart) as rendered:
+                self.assertGreater(rendered.getextrema()[0][1], 128)
+
+            # Once the rendering is gone, the window is reused instead of computed again
+            os.remove(smart)
+            with patch.object(renderer.smartcrop, 'find_focus') as mock_find:
+                self.assertEqual(RenderCache(self.cache_dir, smart_crop=True).render(source, (400, 300), "fill"),
+                                 smart)
+            mock_find.assert_not_called()
+
+
+class TestRenderOutputs(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache = RenderCache(os.path.join(self.temp_dir, "rendered"), max_entries=20)
+        self.layout = [Monitor("left", 0, 0, 320, 240), Monitor("right", 320, 0, 240, 320)]
+
+    def tearDown(self):
+        renderer.shutdown_workers()
+        shutil.rmtree(self.temp_dir)
+
+    def image(self, Image, name, color=(255, 0, 0)):
+        path = os.path.join(self.temp_dir, name)
+        Image.new("RGB", (800, 600), color).save(path)
+        return path
+
+    def test_every_output_gets_its_size(self):
+        with real_pillow() as Image:
+            source = self.image(Image, "a.jpg")
+            outputs = renderer.render_outputs(source, self.layout, self.cache, workers=0)
+
+            for (monitor, path), expected in zip(outputs, self.layout):
+                self.assertEqual(monitor, expected)
+                with Image.open(path) as img:
+                    self.assertEqual(img.size, monitor.size)
+
+            composite = renderer.compose_layout(outputs, self.cache)
+            with Image.open(composite) as img:
+                self.assertEqual(img.size, (560, 320))
+
+    def test_hotplug_renders_only_new_outputs(self):
+        with real_pillow() as Image:
+            source = self.image(Image, "a.jpg")
+            renderer.render_outputs(source, self.layout, self.cache, workers=0)
+            self.assertEqual(self.cache.misses, 2)
+
+            # A third monitor is plugged in
+            layout = self.layout + [Monitor("extra", 560, 0, 1024, 768)]
+            outputs = renderer.render_outputs(source, layout, self.cache, workers=0)
+            self.assertEqual(len(outputs), 3)
+            self.assertEqual((self.cache.hits, self.cache.misses), (2, 3))
+
+    def test_outputs_render_in_worker_processes(self):
+        with real_pillow() as Image:
+            sources = [self.image(Image, "a.jpg"), self.image(Image, "b.jpg", (0, 0, 255))]
+            outputs = renderer.render_outputs(sources, self.layout, self.cache, workers=2)
+
+            with Image.open(outputs[1][1]) as img:
+                self.assertEqual(img.size, (240, 320))
+                self.assertGreater(img.getpixel((120, 160))[2], 128)
+
+    def test_span_cuts_one_image(self):
+        with real_pillow() as Image:
+            source = self.image(Image, "a.jpg")
+            outputs = renderer.render_outputs(source, self.layout, self.cache, span=True)
+
+            self.assertEqual([monitor.name for monitor, _ in outputs], ["left", "right"])
+            with Image.open(outputs[1][1]) as img:
+                self.assertEqual(img.size, (240, 320))
+
+
+if __name__ == '__main__':
+    unittest.main()
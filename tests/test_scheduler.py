@@ -0,0 +1,87 @@
+"""
+Tests for the wallpaper_changer.scheduler module
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from src.wallpaper_changer import scheduler
+from src.wallpaper_changer.rate_limiter import RateLimiter
+from src.wallpaper_changer.scheduler import UpdateScheduler
+
+
+@patch('src.wallpaper_changer.scheduler.time.time', return_value=10000)
+class TestUpdateScheduler(unittest.TestCase):
+    """Test cases for the adaptive update scheduler"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.limiter = RateLimiter(os.path.join(self.temp_dir, "rate_limit.json"))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_spreads_usable_requests_until_reset(self, mock_time):
+        """Test that updates are spaced evenly over the time left"""
+        plan = UpdateScheduler(self.limiter, min_reserve=2)
+        self.assertEqual(plan.next_interval(remaining=12, seconds_left=1000), 100.0)
+
+    def test_plans_updates_not_requests(self, mock_time):
+        """Test that batched requests and queued photos give more updates"""
+        plan = UpdateScheduler(self.limiter, min_reserve=2)
+        self.assertEqual(plan.next_interval(remaining=3, seconds_left=1000, per_request=10), 100.0)
+        self.assertEqual(plan.next_interval(remaining=3, seconds_left=1000, queued=15, per_request=5), 50.0)
+        self.assertEqual(plan.next_interval(remaining=2, seconds_left=1000, queued=5, per_request=30), 200.0)
+
+    def test_enforces_minimum_interval(self, mock_time):
+        """Test that the minimum interval is respected"""
+        plan = UpdateScheduler(self.limiter)
+        self.assertEqual(plan.next_interval(remaining=1000, seconds_left=600), scheduler.MIN_INTERVAL)
+
+    def test_waits_for_reset_when_quota_is_spent(self, mock_time):
+        """Test that the scheduler waits for the reset, re-checking periodically"""
+        plan = UpdateScheduler(self.limiter, min_reserve=2)
+        self.assertEqual(plan.next_interval(remaining=2, seconds_left=60), 60 + scheduler.RESET_MARGIN)
+        self.assertEqual(plan.next_interval(remaining=0, seconds_left=3000), scheduler.NO_QUOTA_RECHECK)
+
+    def test_uses_reset_time_from_the_limiter(self, mock_time):
+        """Test that the server's reset time drives the plan"""
+        with patch('src.wallpaper_changer.rate_limiter.time.time', return_value=10000):
+            self.limiter.observe({'X-Ratelimit-Remaining': '22', 'X-Ratelimit-Reset': '12000'})
+            plan = UpdateScheduler(self.limiter, min_reserve=2)
+            self.assertEqual(plan.next_interval(), 100.0)
+
+    def test_default_interval_before_window_starts(self, mock_time):
+        """Test the default interval when no request has been made yet"""
+        plan = UpdateScheduler(self.limiter)
+        self.assertEqual(plan.next_interval(), scheduler.DEFAULT_INTERVAL)
+
+    def test_waits_for_circuit_breaker(self, mock_time):
+        """Test that no update is planned while the API circuit is open"""
+        breaker = MagicMock()
+        breaker.retry_after.return_value = 400.0
+        plan = UpdateScheduler(self.limiter, min_reserve=2, breaker=breaker)
+        self.assertEqual(plan.next_interval(remaining=12, seconds_left=1000), 400.0)
+
+    def test_reserve_follows_manual_presses(self, mock_time):
+        """Test that frequent manual updates hold back more requests"""
+        plan = UpdateScheduler(self.limiter, min_reserve=2)
+        self.assertEqual(plan.reserve(3600), 2)
+
+        # Six presses over the last hour predict three more in the next half hour
+        for minutes_ago in range(0, 60, 10):
+            plan.record_manual(10000 - minutes_ago * 60)
+        self.assertEqual(plan.reserve(1800), 5)
+        self.assertEqual(plan.reserve(1800, remaining=4), 4)
+
+    def test_old_manual_presses_are_forgotten(self, mock_time):
+        """Test that presses older than the history are ignored"""
+        plan = UpdateScheduler(self.limiter)
+        plan.record_manual(10000 - self.limiter.window * scheduler.MANUAL_HISTORY - 1)
+        self.assertEqual(plan.manual_rate(), 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
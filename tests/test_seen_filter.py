@@ -0,0 +1,82 @@
+"""
+Tests for the seen_filter module
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from src import catalog, seen_filter
+from src.seen_filter import SeenFilter
+
+
+class TestSeenFilter(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, "seen.bloom")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_filter_size(self):
+        num_bits, num_hashes = seen_filter.filter_size(100_000, 0.001)
+        self.assertLess(num_bits // 8, 200 * 1024)
+        self.assertEqual(num_hashes, 10)
+
+    def test_remembers_ids_across_restarts(self):
+        seen = SeenFilter(self.path, capacity=1000)
+        seen.add_many(["a", "b"])
+        self.assertIn("a", seen)
+        self.assertNotIn("c", seen)
+        seen.close()
+
+        reopened = SeenFilter(self.path, capacity=1000)
+        self.assertFalse(reopened.created)
+        self.assertEqual(reopened.count, 2)
+        self.assertIn("b", reopened)
+        self.assertNotIn("c", reopened)
+        reopened.close()
+        self.assertEqual(os.path.getsize(self.path) - seen_filter._HEADER.size, reopened.num_bits // 8)
+
+    def test_resized_filter_starts_over(self):
+        seen = SeenFilter(self.path, capacity=1000)
+        seen.add("a")
+        seen.close()
+
+        resized = SeenFilter(self.path, capacity=5000)
+        self.assertTrue(resized.created)
+        self.assertNotIn("a", resized)
+        resized.close()
+
+    def test_shrunk_filter_forgets_old_bits(self):
+        seen = SeenFilter(self.path, capacity=5000)
+        ids = [f"seen-{i}" for i in range(5000)]
+        seen.add_many(ids)
+        seen.close()
+
+        shrunk = SeenFilter(self.path, capacity=1000)
+        self.assertTrue(shrunk.created)
+        self.assertEqual(shrunk.count, 0)
+        self.assertFalse(any(photo_id in shrunk for photo_id in ids))
+        shrunk.close()
+        self.assertEqual(os.path.getsize(self.path) - seen_filter._HEADER.size, shrunk.num_bits // 8)
+
+    def test_false_positive_rate_at_capacity(self):
+        seen = SeenFilter(capacity=2000, false_positive_rate=0.01)
+        seen.add_many(f"seen-{i}" for i in range(2000))
+        false_positives = sum(f"new-{i}" in seen for i in range(10_000))
+        self.assertLess(false_positives, 300)
+
+    def test_new_default_filter_is_filled_from_catalog(self):
+        photo_catalog = catalog.get_catalog()
+        photo_catalog.record({"id": "shown"})
+        photo_catalog.mark_shown("shown")
+
+        self.assertIn("shown", seen_filter.get_seen_filter())
+        self.assertIs(seen_filter.get_seen_filter(), seen_filter.get_seen_filter())
+        seen_filter.close_seen_filter()
+        catalog.close_catalog()
+
+
+if __name__ == '__main__':
+    unittest.main()
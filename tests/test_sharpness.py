@@ -0,0 +1,162 @@
+"""
+Tests for the sharpness module
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from src import config, prefetch, sharpness
+from src.catalog import PhotoCatalog
+from src.image_cache import ImageCache
+from tests.test_image_loader import real_pillow
+
+
+def save_detailed(Image, path, blur=0):
+    """Save a photo-sized image full of edges, optionally blurred"""
+    import numpy as np
+    from PIL import ImageFilter
+
+    pixels = np.random.default_rng(0).integers(0, 255, (150, 200), dtype=np.uint8)
+    img = Image.fromarray(pixels).resize((3000, 2250), Image.NEAREST)
+    if blur:
+        img = img.filter(ImageFilter.GaussianBlur(blur))
+    img.save(path, quality=90)
+    return path
+
+
+@patch.object(config, 'MIN_EDGE_DENSITY', 0.002)
+@patch.object(config, 'MIN_SHARPNESS', 10.0)
+class TestMeasure(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_blurry_and_flat_images_score_low(self):
+        with real_pillow() as Image:
+            sharp = sharpness.measure(save_detailed(Image, os.path.join(self.temp_dir, "sharp.jpg")))
+            blurry = sharpness.measure(save_detailed(Image, os.path.join(self.temp_dir, "blurry.jpg"), blur=30))
+            flat = os.path.join(self.temp_dir, "flat.jpg")
+            Image.new("RGB", (3000, 2000), (40, 90, 160)).save(flat)
+
+            self.assertGreater(sharp[0], 20 * blurry[0])
+            self.assertGreater(sharp[1], 0.02)
+            self.assertTrue(sharpness.is_acceptable(sharp))
+            self.assertFalse(sharpness.is_acceptable(blurry))
+            self.assertEqual(sharpness.measure(flat), (0.0, 0.0))
+
+    def test_unreadable_image(self):
+        with real_pillow():
+            path = os.path.join(self.temp_dir, "broken.jpg")
+            with open(path, 'wb') as f:
+                f.write(b'not an image')
+            self.assertIsNone(sharpness.measure(path))
+            self.assertTrue(sharpness.is_acceptable(None))
+
+
+@patch.object(config, 'MIN_EDGE_DENSITY', 0.002)
+@patch.object(config, 'MIN_SHARPNESS', 10.0)
+class TestScoredCatalog(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.catalog = PhotoCatalog(os.path.join(self.temp_dir, "catalog.db"))
+
+    def tearDown(self):
+        self.catalog.close()
+        shutil.rmtree(self.temp_dir)
+
+    def cache(self, Image, photo_id, blur=0):
+        path = save_detailed(Image, os.path.join(self.temp_dir, f"{photo_id}.jpg"), blur)
+        self.catalog.record({'id': photo_id}, "nature")
+        self.catalog.set_cache_path(photo_id, path)
+        return path
+
+    def test_scores_are_stored_and_reused(self):
+        with real_pillow() as Image:
+            path = self.cache(Image, 'sharp')
+            scores = sharpness.photo_scores('sharp', path, self.catalog)
+            with patch.object(sharpness, 'measure') as mock_measure:
+                self.assertEqual(sharpness.photo_scores('sharp', path, self.catalog), scores)
+            mock_measure.assert_not_called()
+
+    def test_shared_catalog_is_used_by_default(self):
+        with real_pillow() as Image:
+            path = self.cache(Image, 'sharp')
+            with patch('src.sharpness.catalog.get_catalog', return_value=self.catalog):
+                scores = sharpness.photo_scores('sharp', path)
+            self.assertEqual(self.catalog.get('sharp')['sharpness'], scores[0])
+
+    def test_cached_photos_are_scored_for_the_catalog_provider(self):
+        with real_pillow() as Image:
+            self.cache(Image, 'blurry', blur=30)
+            self.cache(Image, 'sharp')
+            self.assertEqual(prefetch.measure_cached_photos("nature", photo_catalog=self.catalog), 2)
+            self.assertEqual(prefetch.measure_cached_photos("nature", photo_catalog=self.catalog), 0)
+            self.assertEqual(self.catalog.unmeasured(column="sharpness"), [])
+            self.assertEqual(prefetch.CatalogProvider(self.catalog).fetch("nature")['photo_id'], 'sharp')
+
+    def test_library_is_ranked_and_blurry_photos_skipped(self):
+        with real_pillow() as Image:
+            self.cache(Image, 'blurry', blur=30)
+            self.cache(Image, 'soft', blur=2)
+            self.cache(Image, 'sharp')
+            self.assertEqual(sharpness.measure_cached(self.catalog), 3)
+            self.assertEqual(self.catalog.unmeasured(column="sharpness"), [])
+
+            self.assertEqual([entry['id'] for entry in self.catalog.ranked("nature")], ['sharp', 'soft', 'blurry'])
+            self.catalog.mark_shown('sharp', timestamp=1)
+            self.catalog.mark_shown('soft', timestamp=2)
+            self.assertEqual(prefetch.CatalogProvider(self.catalog).fetch("nature")['photo_id'], 'sharp')
+
+
+@patch.object(config, 'MIN_EDGE_DENSITY', 0.002)
+@patch.object(config, 'MIN_SHARPNESS', 10.0)
+class TestFetchRejection(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache = ImageCache(os.path.join(self.temp_dir, "cache"), max_bytes=64 * 1024 * 1024)
+        self.catalog = PhotoCatalog(os.path.join(self.temp_dir, "catalog.db"))
+
+    def tearDown(self):
+        self.catalog.close()
+        shutil.rmtree(self.temp_dir)
+
+    @patch('src.prefetch.perceptual_hash.get_detector', return_value=None)
+    @patch('src.prefetch.unsplash_api.next_photo')
+    def test_blurry_candidates_are_skipped(self, mock_next, mock_detector):
+        mock_next.side_effect = [({'id': photo_id, 'urls': {'full': f'https://example.com/{photo_id}'}}, {})
+                                 for photo_id in ('blurry', 'sharp')]
+        for photo_id in ('blurry', 'sharp'):
+            self.catalog.record({'id': photo_id})
+
+        with real_pillow() as Image:
+            def download(url, file_path):
+                save_detailed(Image, file_path, blur=30 if url.endswith('blurry') else 0)
+                return "00" * 32
+
+            with patch('src.prefetch.download_image', side_effect=download), \
+                    patch('src.prefetch.catalog.get_catalog', return_value=self.catalog):
+                item = prefetch.fetch_wallpaper_file("nature", cache=self.cache)
+
+        self.assertEqual(item['photo_id'], 'sharp')
+        self.assertIsNotNone(self.catalog.get('blurry')['sharpness'])
+
+
+class TestThresholds(unittest.TestCase):
+    def test_smooth_photos_are_accepted_by_default(self):
+        # Sky, minimalist or abstract photos score like featureless images
+        self.assertIsNone(config.MIN_SHARPNESS)
+        self.assertIsNone(config.MIN_EDGE_DENSITY)
+        self.assertTrue(sharpness.is_acceptable((0.0, 0.0)))
+
+    def test_each_threshold_applies_alone(self):
+        with patch.object(config, 'MIN_SHARPNESS', 10.0):
+            self.assertFalse(sharpness.is_acceptable((2.5, 0.1)))
+            self.assertTrue(sharpness.is_acceptable((12.0, 0.0)))
+
+
+if __name__ == '__main__':
+    unittest.main()
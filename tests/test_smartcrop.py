@@ -0,0 +1,57 @@
+"""
+Tests for the wallpaper_changer.smartcrop module
+"""
+import unittest
+
+import numpy as np
+
+from src.wallpaper_changer import smartcrop
+from tests.test_image_loader import real_pillow
+
+
+def detailed_image(Image, size, box):
+    """Flat gray image with random noise inside box"""
+    width, height = size
+    pixels = np.full((height, width), 120, dtype=np.uint8)
+    left, top, right, bottom = box
+    pixels[top:bottom, left:right] = np.random.default_rng(0).integers(0, 255, (bottom - top, right - left))
+    return Image.fromarray(pixels).convert("RGB")
+
+
+class TestEntropyMap(unittest.TestCase):
+    def test_flat_blocks_have_no_entropy(self):
+        pixels = np.zeros((16, 24), dtype=np.uint8)
+        pixels[:8, 8:16] = np.arange(64, dtype=np.uint8).reshape(8, 8) * 4
+        entropy = smartcrop.entropy_map(pixels)
+
+        self.assertEqual(entropy.shape, (2, 3))
+        # 64 values spread evenly over 32 levels: two of each, 5 bits
+        self.assertAlmostEqual(entropy[0, 1], 5.0)
+        self.assertEqual(np.count_nonzero(entropy), 1)
+
+    def test_best_window_prefers_center_unless_clearly_better(self):
+        self.assertEqual(smartcrop.best_window(np.array([0, 0, 0, 0, 5, 5]), 2), 4)
+        self.assertIsNone(smartcrop.best_window(np.ones(6), 2))
+        self.assertIsNone(smartcrop.best_window(np.ones(6), 6))
+
+
+class TestFindFocus(unittest.TestCase):
+    def test_window_follows_the_detail(self):
+        with real_pillow() as Image:
+            wide = detailed_image(Image, (3000, 1000), (2300, 300, 2900, 700))
+            x, y = smartcrop.find_focus(wide, (1920, 1080))
+            self.assertGreater(x, 0.9)
+            self.assertEqual(y, 0.5)
+
+            tall = detailed_image(Image, (1000, 3000), (200, 100, 800, 500))
+            self.assertEqual(smartcrop.find_focus(tall, (1920, 1080)), (0.5, 0.0))
+
+    def test_same_aspect_or_flat_image_stays_centered(self):
+        with real_pillow() as Image:
+            self.assertEqual(smartcrop.find_focus(Image.new("RGB", (3000, 1000)), (1920, 1080)), smartcrop.CENTER)
+            detailed = detailed_image(Image, (1920, 1080), (0, 0, 300, 300))
+            self.assertEqual(smartcrop.find_focus(detailed, (1280, 720)), smartcrop.CENTER)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+"""
+Tests for the wallpaper_changer.thumbnails module
+"""
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from src.wallpaper_changer import thumbnails
+from src.wallpaper_changer.thumbnails import ThumbnailPack
+from tests.test_image_loader import real_pillow
+
+
+class TestThumbnailPack(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.saved_dir = os.path.join(self.temp_dir, "saved")
+        os.makedirs(self.saved_dir)
+        self.pack_path = os.path.join(self.temp_dir, "thumbnails.pack")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def image(self, Image, name, size=(800, 600), color=(255, 0, 0)):
+        path = os.path.join(self.saved_dir, name)
+        Image.new("RGB", size, color).save(path)
+        return path
+
+    def test_thumbnails_are_packed_and_persisted(self):
+        with real_pillow() as Image:
+            self.image(Image, "wallpaper-001.jpg", (1600, 900))
+            self.image(Image, "wallpaper-002.png", (600, 800), (0, 0, 255))
+            with open(os.path.join(self.saved_dir, "wallpaper-001.txt"), 'w') as f:
+                f.write("Source URL: https://unsplash.com/photos/abc\n")
+
+            pack = ThumbnailPack(self.pack_path, size=64)
+            self.assertEqual(pack.update(self.saved_dir, workers=2), {'added': 2, 'kept': 0, 'removed': 0})
+            self.assertEqual(os.listdir(self.temp_dir).count("thumbnails.pack"), 1)
+
+            reopened = ThumbnailPack(self.pack_path, size=64)
+            self.assertEqual(reopened.names(), ["wallpaper-001.jpg", "wallpaper-002.png"])
+            with Image.open(io.BytesIO(reopened.get("wallpaper-001.jpg"))) as img:
+                self.assertEqual(img.size, (64, 36))
+            with Image.open(io.BytesIO(reopened.get("wallpaper-002.png"))) as img:
+                self.assertEqual(img.size, (48, 64))
+                self.assertGreater(img.getpixel((24, 32))[2], 128)
+
+    def test_update_only_processes_new_and_changed_images(self):
+        with real_pillow() as Image:
+            self.image(Image, "wallpaper-001.jpg")
+            self.image(Image, "wallpaper-002.jpg")
+            ThumbnailPack(self.pack_path, size=64).update(self.saved_dir, workers=0)
+
+            changed = self.image(Image, "wallpaper-002.jpg", color=(0, 255, 0))
+            os.utime(changed, ns=(1, 1))
+            self.image(Image, "wallpaper-003.jpg")
+
+            pack = ThumbnailPack(self.pack_path, size=64)
+            with patch.object(thumbnails, 'make_thumbnail', wraps=thumbnails.make_thumbnail) as mock_make:
+                counts = pack.update(self.saved_dir, workers=0)
+            self.assertEqual(counts, {'added': 2, 'kept': 1, 'removed': 0})
+            self.assertEqual(sorted(call.args[0] for call in mock_make.call_args_list),
+                             [os.path.join(self.saved_dir, "wallpaper-002.jpg"),
+                              os.path.join(self.saved_dir, "wallpaper-003.jpg")])
+            with Image.open(io.BytesIO(pack.get("wallpaper-002.jpg"))) as img:
+                self.assertGreater(img.getpixel((32, 24))[1], 128)
+
+            with patch.object(thumbnails, 'make_thumbnail') as mock_make:
+                self.assertEqual(pack.update(self.saved_dir), {'added': 0, 'kept': 3, 'removed': 0})
+            mock_make.assert_not_called()
+
+    def test_removed_images_are_dropped_and_space_reclaimed(self):
+        with real_pillow() as Image:
+            for index in range(1, 5):
+                self.image(Image, f"wallpaper-00{index}.jpg")
+            pack = ThumbnailPack(self.pack_path, size=64)
+            pack.update(self.saved_dir, workers=0)
+            full_size = os.path.getsize(self.pack_path)
+
+            os.remove(os.path.join(self.saved_dir, "wallpaper-001.jpg"))
+            self.assertEqual(pack.update(self.saved_dir, workers=0)['removed'], 1)
+            self.assertEqual(len(ThumbnailPack(self.pack_path, size=64)), 3)
+
+            for index in range(2, 4):
+                os.remove(os.path.join(self.saved_dir, f"wallpaper-00{index}.jpg"))
+            pack.update(self.saved_dir, workers=0)
+            self.assertLess(os.path.getsize(self.pack_path), full_size / 2)
+            self.assertEqual(ThumbnailPack(self.pack_path, size=64).names(), ["wallpaper-004.jpg"])
+
+    def test_unreadable_images_are_not_retried(self):
+        with real_pillow():
+            with open(os.path.join(self.saved_dir, "broken.jpg"), 'wb') as f:
+                f.write(b'not an image')
+            pack = ThumbnailPack(self.pack_path, size=64)
+            self.assertEqual(pack.update(self.saved_dir, workers=0)['added'], 1)
+            self.assertIsNone(pack.get("broken.jpg"))
+            self.assertEqual(ThumbnailPack(self.pack_path, size=64).update(self.saved_dir)['kept'], 1)
+
+    def test_truncated_or_resized_pack(self):
+        with real_pillow() as Image:
+            self.image(Image, "wallpaper-001.jpg")
+            self.image(Image, "wallpaper-002.jpg")
+            ThumbnailPack(self.pack_path, size=64).update(self.saved_dir, workers=0)
+
+            # An update interrupted while writing the last record
+            with open(self.pack_path, 'r+b') as f:
+                f.truncate(os.path.getsize(self.pack_path) - 10)
+            pack = ThumbnailPack(self.pack_path, size=64)
+            self.assertEqual(pack.names(), ["wallpaper-001.jpg"])
+            self.assertEqual(pack.update(self.saved_dir, workers=0)['added'], 1)
+            self.assertIsNotNone(ThumbnailPack(self.pack_path, size=64).get("wallpaper-002.jpg"))
+
+            self.assertEqual(len(ThumbnailPack(self.pack_path, size=128)), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+"""
+Tests for the wallpaper_changer.transcoder module
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from src.wallpaper_changer import transcoder
+from tests.test_image_loader import real_pillow
+
+
+class TestTranscoder(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_target_size_fills_screen_without_upscaling(self):
+        self.assertEqual(transcoder.target_size((6000, 4000), (1920, 1080)), (1920, 1280))
+        self.assertEqual(transcoder.target_size((1280, 720), (1920, 1080)), (1280, 720))
+        self.assertEqual(transcoder.target_size((6000, 4000), None), (6000, 4000))
+
+    def test_formats(self):
+        with real_pillow() as Image:
+            source = os.path.join(self.temp_dir, "large.jpg")
+            Image.effect_noise((3000, 2000), 32).convert("RGB").save(source, quality=98)
+
+            webp = os.path.join(self.temp_dir, "small.webp")
+            self.assertTrue(transcoder.transcode(source, webp, "webp", 80, (960, 540)))
+            with Image.open(webp) as img:
+                self.assertEqual((img.format, img.size), ("WEBP", (960, 640)))
+            self.assertLess(os.path.getsize(webp), os.path.getsize(source))
+
+            jpeg = os.path.join(self.temp_dir, "small.jpg")
+            self.assertTrue(transcoder.transcode(source, jpeg, "jpeg", 80))
+            with Image.open(jpeg) as img:
+                self.assertEqual(img.size, (3000, 2000))
+                self.assertTrue(img.info.get("progressive"))
+
+            self.assertFalse(transcoder.transcode(source, jpeg, "gif"))
+
+    def test_large_jpeg_is_not_scaled_back_up(self):
+        with real_pillow() as Image:
+            source = os.path.join(self.temp_dir, "large.jpg")
+            Image.new("RGB", (3000, 2000), (10, 120, 200)).save(source)
+
+            # Too large to decode at full size: libjpeg decodes it at half size or less
+            target = os.path.join(self.temp_dir, "stored.jpg")
+            self.assertTrue(transcoder.transcode(source, target, "jpeg", 80, max_bytes=3000 * 2000))
+            with Image.open(target) as img:
+                self.assertLessEqual(img.width, 1500)
+                self.assertLessEqual(img.height, 1000)
+                self.assertAlmostEqual(img.width / img.height, 1.5, places=2)
+
+    def test_batch_in_worker_processes(self):
+        with real_pillow() as Image:
+            jobs = []
+            for index in range(3):
+                source = os.path.join(self.temp_dir, f"{index}.png")
+                Image.new("RGB", (800, 600), (index * 100, 0, 0)).save(source)
+                jobs.append((source, os.path.join(self.temp_dir, f"{index}.webp")))
+            broken = os.path.join(self.temp_dir, "broken.jpg")
+            with open(broken, 'wb') as f:
+                f.write(b'not an image')
+            jobs.append((broken, os.path.join(self.temp_dir, "broken.webp")))
+
+            self.assertEqual(transcoder.transcode_many(jobs, "webp", workers=2), [True, True, True, False])
+            with Image.open(jobs[2][1]) as img:
+                self.assertGreater(img.getpixel((400, 300))[0], 150)
+            self.assertFalse(os.path.exists(os.path.join(self.temp_dir, "broken.webp")))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,8 +5,12 @@ import sys
 import unittest
 import tempfile
 import shutil
+import time
+import urllib.parse
 from unittest.mock import patch, MagicMock
 
+import requests
+
 # Add the src directory to the path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
@@ -133,5 +137,222 @@ class TestUnsplashAPI(unittest.TestCase):
         args, kwargs = mock_get.call_args_list[0]
         self.assertEqual(kwargs['params']['query'], "nature")
 
+class TestPhotoBatchQueue(unittest.TestCase):
+    def setUp(self):
+        self.original_demo_mode = unsplash_api.DEMO_MODE
+        unsplash_api.DEMO_MODE = False
+        unsplash_api.clear_photo_queues()
+
+    def tearDown(self):
+        unsplash_api.DEMO_MODE = self.original_demo_mode
+        unsplash_api.clear_photo_queues()
+
+    def _batch_response(self, count):
+        response = MagicMock()
+        response.status_code = 200
+        response.headers = {"X-Ratelimit-Remaining": "48"}
+        response.json.return_value = [
+            {"id": f"photo{i}", "urls": {"full": f"https://example.com/photo{i}"}}
+            for i in range(count)
+        ]
+        return response
+
+    @patch('src.unsplash_api.http_client.get')
+    def test_fetch_photo_batch_requests_count(self, mock_get):
+        mock_get.return_value = self._batch_response(3)
+
+        photos, headers = unsplash_api.fetch_photo_batch("nature", count=50)
+
+        self.assertEqual(len(photos), 3)
+        self.assertEqual(headers["X-Ratelimit-Remaining"], "48")
+        params = mock_get.call_args[1]['params']
+        self.assertEqual(params['count'], str(unsplash_api.MAX_BATCH_SIZE))
+        self.assertEqual(params['query'], "nature")
+
+    @patch('src.unsplash_api.http_client.get')
+    def test_random_batch_is_not_limited_to_one_category(self, mock_get):
+        mock_get.return_value = self._batch_response(3)
+
+        for category in ("random", None):
+            unsplash_api.fetch_photo_batch(category)
+            self.assertNotIn('query', mock_get.call_args[1]['params'])
+        self.assertIsNone(unsplash_api.catalog.get_catalog().get("photo0")["category"])
+
+    @patch('src.unsplash_api.http_client.get')
+    def test_next_wallpaper_serves_from_queue(self, mock_get):
+        mock_get.return_value = self._batch_response(3)
+
+        urls = [unsplash_api.next_wallpaper("nature")[0] for _ in range(3)]
+
+        self.assertEqual(urls, [f"https://example.com/photo{i}" for i in range(3)])
+        mock_get.assert_called_once()
+        self.assertEqual(unsplash_api.queued_count("nature"), 0)
+
+        # An empty queue is refilled with a new batch
+        unsplash_api.next_wallpaper("nature")
+        self.assertEqual(mock_get.call_count, 2)
+
+    @patch('src.unsplash_api.http_client.get')
+    def test_batch_is_cataloged_and_shown_photos_skipped(self, mock_get):
+        mock_get.return_value = self._batch_response(3)
+        photo_catalog = unsplash_api.catalog.get_catalog()
+        photo_catalog.record({"id": "photo0"})
+        unsplash_api.mark_shown("photo0")
+
+        url, _ = unsplash_api.next_wallpaper("nature")
+
+        self.assertEqual(url, "https://example.com/photo1")
+        self.assertEqual(photo_catalog.get("photo2")["category"], "nature")
+
+    @patch('src.unsplash_api.http_client.get')
+    def test_dark_category_serves_dark_photos_first(self, mock_get):
+        response = self._batch_response(3)
+        for photo, color in zip(response.json.return_value, ("#f0f0f0", "#101820", "#e0d0c0")):
+            photo["color"] = color
+        mock_get.return_value = response
+
+        urls = [unsplash_api.next_wallpaper("night")[0] for _ in range(3)]
+
+        self.assertEqual(urls, [f"https://example.com/photo{i}" for i in (1, 0, 2)])
+        mock_get.assert_called_once()
+
+    @patch('src.unsplash_api.http_client.get')
+    def test_filtered_photos_are_never_downloaded(self, mock_get):
+        response = self._batch_response(2)
+        response.json.return_value[0].update({"width": 3000, "height": 4000})
+        mock_get.return_value = response
+
+        url, _ = unsplash_api.next_wallpaper("nature")
+
+        self.assertEqual(url, "https://example.com/photo1")
+        self.assertEqual(unsplash_api.queued_count("nature"), 0)
+        self.assertEqual(unsplash_api.photo_filter.get_filter().stats()['reasons'], {'aspect': 1})
+
+    @patch('src.unsplash_api.http_client.get')
+    def test_next_wallpaper_queues_per_category(self, mock_get):
+        mock_get.return_value = self._batch_response(2)
+
+        unsplash_api.next_wallpaper("nature")
+        unsplash_api.next_wallpaper(search_term="ocean")
+
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertEqual(unsplash_api.queued_count("nature"), 1)
+        self.assertEqual(unsplash_api.queued_count(search_term="ocean"), 1)
+
+    @patch('src.unsplash_api.http_client.get')
+    def test_next_wallpaper_api_error(self, mock_get):
+        response = MagicMock()
+        response.status_code = 403
+        mock_get.return_value = response
+
+        result, headers = unsplash_api.next_wallpaper("nature")
+
+        self.assertIsNone(result)
+        self.assertEqual(headers, {})
+        self.assertFalse(unsplash_api.DEMO_MODE)
+
+    @patch('src.unsplash_api.http_client.get')
+    def test_network_error_does_not_switch_to_demo_mode(self, mock_get):
+        mock_get.side_effect = requests.ConnectionError("DNS failure")
+
+        result, headers = unsplash_api.next_wallpaper("nature")
+
+        self.assertIsNone(result)
+        self.assertFalse(unsplash_api.DEMO_MODE)
+
+    @patch('src.unsplash_api.http_client.get')
+    def test_open_circuit_serves_demo_images_then_recovers(self, mock_get):
+        breaker = unsplash_api.circuit_breaker.get_breaker()
+        threshold = unsplash_api.circuit_breaker.FAILURE_THRESHOLD
+        mock_get.side_effect = requests.ConnectionError("DNS failure")
+        for _ in range(threshold):
+            unsplash_api.next_wallpaper("nature")
+        self.assertEqual(breaker.state, unsplash_api.circuit_breaker.OPEN)
+
+        # While the circuit is open the API is left alone
+        url, _ = unsplash_api.next_wallpaper("nature")
+        self.assertTrue(url.startswith("https://images.unsplash.com/"))
+        self.assertEqual(mock_get.call_count, threshold)
+        self.assertFalse(unsplash_api.DEMO_MODE)
+
+        # Once the backoff has passed, a probe succeeds and live mode resumes
+        mock_get.side_effect = None
+        mock_get.return_value = self._batch_response(2)
+        later = time.time() + unsplash_api.circuit_breaker.MAX_DELAY
+        with patch.object(unsplash_api.circuit_breaker.time, 'time', return_value=later):
+            url, _ = unsplash_api.next_wallpaper("nature")
+        self.assertEqual(url, "https://example.com/photo0")
+        self.assertEqual(breaker.state, unsplash_api.circuit_breaker.CLOSED)
+
+    @patch('src.unsplash_api.http_client.get')
+    def test_rejected_key_rotates_to_next_key(self, mock_get):
+        pool = unsplash_api.key_pool.KeyPool(["bad-key", "good-key"])
+        rejected = MagicMock()
+        rejected.status_code = 401
+        rejected.headers = {}
+
+        def get(url, headers=None, **kwargs):
+            return rejected if headers["Authorization"] == "Client-ID bad-key" else self._batch_response(2)
+
+        mock_get.side_effect = get
+        with patch('src.unsplash_api.key_pool.get_pool', return_value=pool), \
+                patch.object(pool._limiters["good-key"], 'remaining', return_value=0):
+            # The rejected key has the most budget left, so it is tried first
+            url, _ = unsplash_api.next_wallpaper("nature")
+
+        self.assertEqual(url, "https://example.com/photo0")
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertEqual(len(pool), 1)
+        self.assertFalse(unsplash_api.DEMO_MODE)
+
+class TestSizedImageUrl(unittest.TestCase):
+    def setUp(self):
+        self.original_resolution = config.SCREEN_RESOLUTION
+
+    def tearDown(self):
+        config.SCREEN_RESOLUTION = self.original_resolution
+
+    def _query(self, url):
+        return dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(url).query))
+
+    def test_sized_variant_covers_screen(self):
+        photo = {"width": 6000, "height": 4000}
+        url = unsplash_api.sized_image_url("https://images.unsplash.com/photo-1?ixid=abc", photo, (1920, 1080))
+
+        query = self._query(url)
+        # 1920 / 6000 > 1080 / 4000, so the width decides the scale
+        self.assertEqual(query["w"], "1920")
+        self.assertEqual(query["fit"], "max")
+        self.assertEqual(query["q"], str(config.IMAGE_QUALITY))
+        self.assertEqual(query["fm"], config.IMAGE_FORMAT)
+        self.assertEqual(query["ixid"], "abc")
+
+    def test_sized_variant_tall_screen(self):
+        photo = {"width": 6000, "height": 4000}
+        url = unsplash_api.sized_image_url("https://images.unsplash.com/photo-1", photo, (1080, 1920))
+        self.assertEqual(self._query(url)["w"], "2880")
+
+    def test_sized_variant_never_upscales(self):
+        photo = {"width": 1000, "height": 500}
+        url = unsplash_api.sized_image_url("https://images.unsplash.com/photo-1", photo, (3840, 2160))
+        self.assertEqual(self._query(url)["w"], "1000")
+
+    def test_select_image_url_uses_configured_resolution(self):
+        config.SCREEN_RESOLUTION = "1920x1080"
+        photo = {"width": 6000, "height": 4000,
+                 "urls": {"raw": "https://example.com/raw", "full": "https://example.com/full"}}
+
+        url = unsplash_api.photo_image_url(photo)
+
+        self.assertTrue(url.startswith("https://example.com/raw?"))
+        self.assertEqual(self._query(url)["w"], "1920")
+
+    @patch('src.unsplash_api.display.get_screen_size', return_value=None)
+    def test_select_image_url_without_resolution(self, mock_size):
+        config.SCREEN_RESOLUTION = None
+        photo = {"urls": {"raw": "https://example.com/raw", "full": "https://example.com/full"}}
+
+        self.assertEqual(unsplash_api.photo_image_url(photo), "https://example.com/full")
+
 if __name__ == '__main__':
     unittest.main()
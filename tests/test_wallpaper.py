@@ -93,6 +93,19 @@ class TestWallpaper(unittest.TestCase):
         if saved_path:  # Make sure saved_path is not None before using basename
             self.assertEqual(os.path.basename(saved_path), "wallpaper-011.jpg")
     
+    def test_save_current_wallpaper_only_once(self):
+        # A cataloged photo that was saved before is not copied again
+        photo_catalog = wallpaper.catalog.get_catalog()
+        photo_catalog.record({'id': 'abc'})
+        photo_catalog.set_cache_path('abc', self.test_wallpaper_path)
+        
+        first = wallpaper.save_current_wallpaper(self.test_wallpaper_path)
+        second = wallpaper.save_current_wallpaper(self.test_wallpaper_path)
+        
+        self.assertEqual(first, second)
+        self.assertEqual(os.listdir(self.test_saved_dir), ["wallpaper-001.jpg"])
+        self.assertEqual(photo_catalog.get('abc')['saved_path'], os.path.abspath(first))
+    
     def test_save_current_wallpaper_no_source_file(self):
         # Patch the get_current_wallpaper function to return None
         with patch('src.wallpaper.get_current_wallpaper', return_value=None):
@@ -101,5 +114,107 @@ class TestWallpaper(unittest.TestCase):
         
             self.assertIsNone(saved_path)
 
+    def test_set_placeholder(self):
+        from tests.test_image_loader import real_pillow
+        photo = {'id': 'abc', 'width': 3000, 'height': 2000, 'blur_hash': "LEHV6nWB2yk8pyo0adR*.7kCMdnj"}
+        with real_pillow() as Image, patch.object(config, 'SCREEN_RESOLUTION', "800x450"), \
+                patch('src.wallpaper._apply_wallpaper', return_value=True) as mock_apply:
+            self.assertTrue(wallpaper.set_placeholder(photo))
+            with Image.open(mock_apply.call_args[0][0]) as img:
+                self.assertEqual(img.size, (800, 450))
+            self.assertFalse(wallpaper.set_placeholder({'id': 'no-hash'}))
+        mock_apply.assert_called_once()
+
+    def test_saved_wallpaper_is_transcoded(self):
+        from tests.test_image_loader import real_pillow
+        photo_catalog = wallpaper.catalog.get_catalog()
+        photo_catalog.record({'id': 'abc', 'urls': {'raw': 'https://images.unsplash.com/photo-abc'}})
+        photo_catalog.set_cache_path('abc', self.test_wallpaper_path)
+        with real_pillow() as Image, patch.object(config, 'SAVED_FORMAT', "webp"), \
+                patch.object(config, 'SAVED_MAX_SIZE', "400x300"):
+            Image.new("RGB", (1600, 1000), (0, 128, 255)).save(self.test_wallpaper_path)
+
+            saved_path = wallpaper.save_current_wallpaper(self.test_wallpaper_path)
+
+            self.assertEqual(os.path.basename(saved_path), "wallpaper-001.webp")
+            with Image.open(saved_path) as img:
+                self.assertEqual((img.format, img.size), ("WEBP", (480, 300)))
+        metadata = wallpaper.read_metadata(saved_path)
+        self.assertEqual(metadata["Source URL"], "https://images.unsplash.com/photo-abc")
+        self.assertEqual(metadata["Stored as"], "webp, quality 85")
+        self.assertEqual(wallpaper.get_next_filename(self.test_saved_dir),
+                         os.path.join(self.test_saved_dir, "wallpaper-002.jpg"))
+
+    def test_transcode_saved_library(self):
+        from tests.test_image_loader import real_pillow
+        os.makedirs(self.test_saved_dir)
+        with real_pillow() as Image, patch.object(config, 'SAVED_MAX_SIZE', None):
+            for index in (1, 2):
+                path = os.path.join(self.test_saved_dir, f"wallpaper-00{index}.jpg")
+                Image.effect_noise((800, 600), 64).convert("RGB").save(path, quality=100)
+            wallpaper.write_metadata(os.path.join(self.test_saved_dir, "wallpaper-001.jpg"),
+                                     {"Source URL": "https://example.com/1", "Saved on": "2024-01-01 10:00:00"})
+
+            counts = wallpaper.transcode_saved_library("jpeg", workers=0)
+
+            self.assertEqual((counts['transcoded'], counts['skipped'], counts['failed']), (1, 1, 0))
+            self.assertGreater(counts['bytes_saved'], 0)
+            with Image.open(os.path.join(self.test_saved_dir, "wallpaper-001.jpg")) as img:
+                self.assertTrue(img.info.get("progressive"))
+            # The wallpaper without a source URL is kept as it was
+            with Image.open(os.path.join(self.test_saved_dir, "wallpaper-002.jpg")) as img:
+                self.assertFalse(img.info.get("progressive"))
+            metadata = wallpaper.read_metadata(os.path.join(self.test_saved_dir, "wallpaper-001.jpg"))
+            self.assertEqual(metadata["Saved on"], "2024-01-01 10:00:00")
+
+            self.assertEqual(wallpaper.transcode_saved_library("jpeg", workers=0)['transcoded'], 0)
+            counts = wallpaper.transcode_saved_library("webp", workers=0)
+            self.assertEqual(counts['transcoded'], 1)
+            self.assertEqual(sorted(os.listdir(self.test_saved_dir)),
+                             ["wallpaper-001.txt", "wallpaper-001.webp", "wallpaper-002.jpg"])
+
+    @patch('src.wallpaper.platform.system', return_value='Linux')
+    @patch('src.wallpaper.subprocess.run')
+    def test_multi_monitor_outputs_are_set_together(self, mock_run, mock_system):
+        # Each monitor gets its own rendering, applied in a single feh call
+        layout = [wallpaper.monitors.Monitor("left", 0, 0, 1920, 1080),
+                  wallpaper.monitors.Monitor("right", 1920, 0, 2560, 1440)]
+        outputs = [(layout[0], "/tmp/left.jpg"), (layout[1], "/tmp/right.jpg")]
+        with patch.object(config, 'MONITOR_LAYOUT', ["1920x1080+0+0", "2560x1440+1920+0"]), \
+                patch('src.wallpaper.renderer.render_outputs', return_value=outputs) as mock_render, \
+                patch.dict('os.environ', {'XDG_CURRENT_DESKTOP': 'i3'}):
+            self.assertTrue(wallpaper.set_wallpaper(self.test_wallpaper_path))
+        
+        self.assertEqual(mock_render.call_args[0][1], [layout[0]._replace(name="monitor0"),
+                                                       layout[1]._replace(name="monitor1")])
+        mock_run.assert_called_once_with(['feh', '--bg-fill', "/tmp/left.jpg", "/tmp/right.jpg"], check=True)
+    
+    @patch('src.wallpaper._apply_wallpaper', return_value=True)
+    def test_single_screen_fill_uses_rendered_copy(self, mock_apply):
+        # The crop of "fill" is made by the render cache, with smart cropping
+        with patch.object(config, 'MONITOR_LAYOUT', None), patch.object(config, 'FIT_MODE', 'fill'), \
+                patch.object(config, 'SCREEN_RESOLUTION', "1920x1080"), \
+                patch('src.wallpaper.renderer.RenderCache') as mock_cache:
+            mock_cache.return_value.render.return_value = "/tmp/rendered.jpg"
+            self.assertTrue(wallpaper.set_wallpaper(self.test_wallpaper_path))
+        
+        self.assertEqual(mock_cache.call_args[1]['smart_crop'], config.SMART_CROP)
+        mock_cache.return_value.render.assert_called_once_with(self.test_wallpaper_path, (1920, 1080), "fill")
+        mock_apply.assert_called_once_with("/tmp/rendered.jpg")
+    
+    @patch('src.wallpaper.platform.system', return_value='Linux')
+    @patch('src.wallpaper.subprocess.run')
+    def test_multi_monitor_xfce_sets_each_monitor(self, mock_run, mock_system):
+        layout = [wallpaper.monitors.Monitor("DP-1", 0, 0, 1920, 1080),
+                  wallpaper.monitors.Monitor("DP-2", 1920, 0, 1920, 1080)]
+        outputs = [(monitor, f"/tmp/{monitor.name}.jpg") for monitor in layout]
+        with patch('src.wallpaper.renderer.render_outputs', return_value=outputs), \
+                patch.dict('os.environ', {'XDG_CURRENT_DESKTOP': 'XFCE'}):
+            self.assertTrue(wallpaper.set_layout_wallpaper(self.test_wallpaper_path, layout))
+        
+        properties = [call[0][0][4] for call in mock_run.call_args_list]
+        self.assertEqual(properties, ['/backdrop/screen0/monitorDP-1/workspace0/last-image',
+                                      '/backdrop/screen0/monitorDP-2/workspace0/last-image'])
+
 if __name__ == '__main__':
     unittest.main()
@@ -14,6 +14,7 @@ from urllib.parse import urlparse
 
 import requests
 
+from wallpaper_changer import providers
 from wallpaper_changer.config import Config
 from wallpaper_changer.wallpaper_handler import WallpaperHandler
 
@@ -45,6 +46,11 @@ class TestWallpaperHandler(unittest.TestCase):
             'random': True
         }.get(key, default)
 
+        # Without a known screen size wallpapers are set as they are, not rendered
+        screen_patcher = patch('wallpaper_changer.wallpaper_handler.display.get_screen_size', return_value=None)
+        self.mock_screen_size = screen_patcher.start()
+        self.addCleanup(screen_patcher.stop)
+
     def tearDown(self):
         """Clean up test environment"""
         shutil.rmtree(self.test_dir)
@@ -143,35 +149,27 @@ class TestWallpaperHandler(unittest.TestCase):
         
         self.assertIsNone(selected)
 
-    @patch('requests.get')
-    def test_download_wallpaper_success(self, mock_requests_get):
+    @patch('wallpaper_changer.providers.downloader.download_file', return_value=True)
+    def test_download_wallpaper_success(self, mock_download_file):
         """Test downloading a wallpaper successfully"""
-        # Mock the requests.get response
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.raw.decode_content = True
-        mock_requests_get.return_value = mock_response
-        
         # Mock datetime to get predictable filename
         mock_timestamp = "20230101_120000"
-        with patch('wallpaper_changer.wallpaper_handler.datetime') as mock_datetime:
+        with patch('wallpaper_changer.providers.datetime') as mock_datetime:
             mock_datetime_instance = MagicMock()
             mock_datetime_instance.strftime.return_value = mock_timestamp
             mock_datetime.now.return_value = mock_datetime_instance
             
-            # Mock shutil.copyfileobj
-            with patch('wallpaper_changer.wallpaper_handler.shutil.copyfileobj') as mock_copyfileobj:
-                handler = WallpaperHandler(self.mock_config)
-                result = handler.download_wallpaper("https://example.com/image.jpg")
-                
-                expected_filepath = os.path.join(
-                    self.wallpaper_dir, 
-                    f"wallpaper_{mock_timestamp}.jpg"
-                )
-                self.assertEqual(result, expected_filepath)
-                mock_copyfileobj.assert_called_once()
-
-    @patch('requests.get')
+            handler = WallpaperHandler(self.mock_config)
+            result = handler.download_wallpaper("https://example.com/image.jpg")
+            
+            expected_filepath = os.path.join(
+                self.wallpaper_dir, 
+                f"wallpaper_{mock_timestamp}.jpg"
+            )
+            self.assertEqual(result, expected_filepath)
+            mock_download_file.assert_called_once_with("https://example.com/image.jpg", expected_filepath)
+
+    @patch('wallpaper_changer.downloader.http_client.get')
     def test_download_wallpaper_non_image_url(self, mock_requests_get):
         """Test downloading from a URL that doesn't point to an image"""
         handler = WallpaperHandler(self.mock_config)
@@ -180,7 +178,7 @@ class TestWallpaperHandler(unittest.TestCase):
         self.assertIsNone(result)
         mock_requests_get.assert_not_called()
 
-    @patch('requests.get')
+    @patch('wallpaper_changer.downloader.http_client.get')
     def test_download_wallpaper_failure(self, mock_requests_get):
         """Test downloading a wallpaper with a failed request"""
         # Mock the requests.get response for failure
@@ -194,7 +192,7 @@ class TestWallpaperHandler(unittest.TestCase):
         self.assertIsNone(result)
         mock_requests_get.assert_called_once()
 
-    @patch('requests.get')
+    @patch('wallpaper_changer.downloader.http_client.get')
     def test_download_wallpaper_exception(self, mock_requests_get):
         """Test downloading a wallpaper with an exception"""
         # Mock requests.get to raise an exception
@@ -208,14 +206,15 @@ class TestWallpaperHandler(unittest.TestCase):
 
     def test_get_wallpaper_path_local_directory(self):
         """Test getting wallpaper path from local directory"""
-        with patch.object(WallpaperHandler, 'select_wallpaper_from_directory') as mock_select:
+        with patch.object(providers.DirectoryProvider, 'select') as mock_select:
             mock_select.return_value = self.test_files[0]
             
             handler = WallpaperHandler(self.mock_config)
             result = handler.get_wallpaper_path()
             
             self.assertEqual(result, self.test_files[0])
-            mock_select.assert_called_once_with(self.wallpaper_dir)
+            mock_select.assert_called_once_with()
+            self.assertEqual(handler.get_provider().directory, self.wallpaper_dir)
 
     def test_get_wallpaper_path_url(self):
         """Test getting wallpaper path from URL"""
@@ -223,18 +222,19 @@ class TestWallpaperHandler(unittest.TestCase):
         mock_config = MagicMock()
         mock_config.get.side_effect = lambda key, default=None: {
             'download_folder': self.wallpaper_dir,
-            'source': 'https://example.com/images',
+            'source': 'https://example.com/images/photo.jpg',
             'random': True
         }.get(key, default)
         
-        with patch.object(WallpaperHandler, 'download_wallpaper') as mock_download:
+        with patch.object(providers.ImageUrlProvider, 'download') as mock_download:
             mock_download.return_value = os.path.join(self.wallpaper_dir, "downloaded.jpg")
             
             handler = WallpaperHandler(mock_config)
             result = handler.get_wallpaper_path()
             
             self.assertEqual(result, os.path.join(self.wallpaper_dir, "downloaded.jpg"))
-            mock_download.assert_called_once_with('https://example.com/images')
+            mock_download.assert_called_once_with()
+            self.assertEqual(handler.get_provider().url, 'https://example.com/images/photo.jpg')
 
     def test_get_wallpaper_path_file(self):
         """Test getting wallpaper path from a specific file"""
@@ -324,6 +324,42 @@ class TestWallpaperHandler(unittest.TestCase):
         
         self.assertFalse(result)
 
+    @patch('platform.system', return_value="Windows")
+    @patch('ctypes.windll.user32.SystemParametersInfoW')
+    def test_set_wallpaper_uses_rendered_copy(self, mock_system_parameters, mock_platform):
+        """Test that the wallpaper is pre-rendered for the screen and fit mode"""
+        self.mock_screen_size.return_value = (1920, 1080)
+        rendered = os.path.join(self.test_dir, "rendered.jpg")
+
+        handler = WallpaperHandler(self.mock_config)
+        with patch.object(handler._render_cache, 'render', return_value=rendered) as mock_render:
+            self.assertTrue(handler.set_wallpaper(self.test_files[0]))
+
+        mock_render.assert_called_once_with(self.test_files[0], (1920, 1080), "fill")
+        mock_system_parameters.assert_called_once_with(20, 0, rendered, 3)
+
+    def test_smart_crop_setting(self):
+        """Test that fill renderings crop around the detail unless smart_crop is off"""
+        handler = WallpaperHandler(self.mock_config)
+        self.assertTrue(handler._render_cache.smart_crop)
+
+        settings = {'download_folder': self.wallpaper_dir, 'smart_crop': False}
+        self.mock_config.get.side_effect = lambda key, default=None: settings.get(key, default)
+        handler = WallpaperHandler(self.mock_config)
+        self.assertFalse(handler._render_cache.smart_crop)
+
+    @patch('platform.system', return_value="Windows")
+    @patch('ctypes.windll.user32.SystemParametersInfoW')
+    def test_set_wallpaper_falls_back_to_original(self, mock_system_parameters, mock_platform):
+        """Test that an image that cannot be rendered is set as it is"""
+        self.mock_screen_size.return_value = (1920, 1080)
+
+        handler = WallpaperHandler(self.mock_config)
+        with patch.object(handler._render_cache, 'render', return_value=None):
+            self.assertTrue(handler.set_wallpaper(self.test_files[0]))
+
+        mock_system_parameters.assert_called_once_with(20, 0, self.test_files[0], 3)
+
     def test_set_wallpaper_invalid_path(self):
         """Test setting wallpaper with an invalid file path"""
         handler = WallpaperHandler(self.mock_config)
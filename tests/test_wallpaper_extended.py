@@ -2,7 +2,8 @@ import os
 import shutil
 import tempfile
 from unittest.mock import patch, MagicMock
-from src.wallpaper import set_wallpaper, save_current_wallpaper, get_next_filename, get_current_wallpaper
+from src.wallpaper import (set_wallpaper, save_current_wallpaper, get_next_filename, get_current_wallpaper,
+                           read_metadata, store_saved_wallpaper)
 
 class TestWallpaperExtended:
     def setup_method(self):
@@ -83,3 +84,36 @@ class TestWallpaperExtended:
         # Should have created a saved file
         assert result is not None
         assert os.path.exists(result)
+
+    def test_store_saved_wallpaper_writes_metadata(self):
+        test_file = os.path.join(self.temp_dir, 'download.jpg')
+        with open(test_file, 'w') as f:
+            f.write('test content')
+
+        def transcode(source, target, *args):
+            shutil.copy2(source, target)
+            return True
+
+        with patch('src.wallpaper.config.SAVED_FORMAT', 'webp'), \
+                patch('src.wallpaper.saved_max_size', return_value=None), \
+                patch('src.wallpaper.transcoder.transcode', side_effect=transcode):
+            result = store_saved_wallpaper(test_file, os.path.join(self.temp_dir, 'wallpaper-001.jpg'),
+                                           entry={'image_url': 'https://example.com/a.jpg'})
+
+        assert result == os.path.join(self.temp_dir, 'wallpaper-001.webp')
+        metadata = read_metadata(result)
+        assert metadata['Source URL'] == 'https://example.com/a.jpg'
+        assert metadata['Stored as'].startswith('webp')
+
+    def test_store_saved_wallpaper_keeps_original_without_source_url(self):
+        test_file = os.path.join(self.temp_dir, 'local.jpg')
+        with open(test_file, 'w') as f:
+            f.write('test content')
+
+        with patch('src.wallpaper.config.SAVED_FORMAT', 'webp'), \
+                patch('src.wallpaper.transcoder.transcode') as mock_transcode:
+            result = store_saved_wallpaper(test_file, os.path.join(self.temp_dir, 'wallpaper-001.jpg'))
+
+        mock_transcode.assert_not_called()
+        assert result == os.path.join(self.temp_dir, 'wallpaper-001.jpg')
+        assert read_metadata(result) == {}